@@ -0,0 +1,69 @@
+"""
+Benchmark for the client identity cache in get_current_client
+
+Resolves the same bearer token repeatedly through get_current_client, once
+with the cache disabled (one clients lookup per request, as before) and once
+with it enabled, and reports the per-request cost of authentication.
+
+Usage:
+    python benchmarks/bench_auth_cache.py [--requests 5000] [--rounds 3]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import tempfile
+import time
+import uuid
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.database import Base
+from src.models.models import Client
+from src.routes.auth import create_access_token, get_current_client
+from src.services.client_cache import client_identity_cache
+
+async def run(name, ttl_seconds, session_factory, token, requests, rounds):
+    client_identity_cache.ttl_seconds = ttl_seconds
+    timings = []
+    for _ in range(rounds):
+        client_identity_cache.clear()
+        started = time.perf_counter()
+        for _ in range(requests):
+            # One session per request, like the get_async_db dependency
+            async with session_factory() as db:
+                await get_current_client(token, db)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"{name:>8}: {best / requests * 1e6:8.1f} us/request  ({requests / best:,.0f} requests/s)")
+    return best
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        client_id = str(uuid.uuid4())
+        async with session_factory() as db:
+            db.add(Client(id=client_id, name="bench", device_info={}))
+            await db.commit()
+        token = create_access_token({"sub": client_id})
+
+        print(f"Authenticating {args.requests} requests, best of {args.rounds} rounds")
+        uncached = await run("uncached", 0, session_factory, token, args.requests, args.rounds)
+        cached = await run("cached", 30, session_factory, token, args.requests, args.rounds)
+        print(f"saving: {(uncached - cached) / args.requests * 1e6:.1f} us/request, speedup: {uncached / cached:.1f}x")
+        print(f"cache: {client_identity_cache.stats()}")
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
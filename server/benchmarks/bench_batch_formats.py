@@ -0,0 +1,69 @@
+"""
+Benchmark for location batch payload formats
+
+Compares payload size and server-side decode time (body bytes to insert
+rows) of the JSON batch (LocationBatchCreate) and the compact binary batch
+(services/binary_codec.py).
+
+Usage:
+    python benchmarks/bench_batch_formats.py [--points 10000] [--rounds 5]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from src.models.schemas import LocationBatchCreate
+from src.services.binary_codec import encode_location_batch, decode_location_batch
+from src.services.ingest_service import location_rows
+
+def make_points(count: int):
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "latitude": 37.7749 + i * 1e-5,
+            "longitude": -122.4194 + i * 1e-5,
+            "accuracy": 5.0,
+            "altitude": 10.0 if i % 2 else None,
+            "speed": 1.5,
+            "timestamp": start + timedelta(seconds=60 * i)
+        }
+        for i in range(count)
+    ]
+
+def best_of(rounds, func):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    client_id = str(uuid.uuid4())
+    points = make_points(args.points)
+    json_body = json.dumps({"locations": points}, default=lambda value: value.isoformat() + "Z").encode()
+    binary_body = encode_location_batch(points)
+
+    json_time = best_of(args.rounds, lambda: location_rows(
+        client_id, LocationBatchCreate.model_validate_json(json_body).locations
+    ))
+    binary_time = best_of(args.rounds, lambda: decode_location_batch(binary_body, client_id))
+
+    print(f"{args.points} points, best of {args.rounds} rounds")
+    print(f"  json: {len(json_body):>10,} bytes  decode {json_time * 1000:8.1f} ms")
+    print(f"binary: {len(binary_body):>10,} bytes  decode {binary_time * 1000:8.1f} ms")
+    print(f"size ratio: {len(json_body) / len(binary_body):.1f}x, decode speedup: {json_time / binary_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
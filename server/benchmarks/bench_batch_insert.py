@@ -0,0 +1,99 @@
+"""
+Benchmark for POST /api/locations/batch ingest paths
+
+Compares the original ORM path (one Location object per point, add_all, then a
+second commit for the audit row) with the Core executemany bulk path used by
+create_batch_locations.
+
+Usage:
+    python benchmarks/bench_batch_insert.py [--points 10000] [--rounds 5]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.database import Base
+from src.models.models import Client, Location
+from src.models.schemas import LocationCreate
+from src.services.logging_service import log_client_action
+from src.services.ingest_service import location_rows, bulk_insert_locations
+
+def make_batch(count: int):
+    start = datetime(2024, 1, 1)
+    return [
+        LocationCreate(
+            latitude=37.7749 + i * 1e-5,
+            longitude=-122.4194 + i * 1e-5,
+            accuracy=5.0,
+            altitude=10.0,
+            speed=1.5,
+            timestamp=start + timedelta(seconds=i)
+        )
+        for i in range(count)
+    ]
+
+async def orm_path(db, client_id, batch):
+    db_locations = []
+    for location in batch:
+        db_locations.append(Location(
+            client_id=client_id,
+            latitude=location.latitude,
+            longitude=location.longitude,
+            accuracy=location.accuracy,
+            altitude=location.altitude,
+            speed=location.speed,
+            timestamp=location.timestamp
+        ))
+    db.add_all(db_locations)
+    await db.commit()
+    await log_client_action(db, client_id, "location_batch_submit", {"count": len(batch)})
+
+async def bulk_path(db, client_id, batch):
+    await bulk_insert_locations(db, client_id, location_rows(client_id, batch))
+
+async def run(name, func, session_factory, client_id, batch, rounds):
+    timings = []
+    for _ in range(rounds):
+        async with session_factory() as db:
+            started = time.perf_counter()
+            await func(db, client_id, batch)
+            timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"{name:>6}: best {best * 1000:8.1f} ms  ({len(batch) / best:,.0f} points/s)")
+    return best
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        client_id = str(uuid.uuid4())
+        async with session_factory() as db:
+            db.add(Client(id=client_id, name="bench", device_info="{}"))
+            await db.commit()
+
+        batch = make_batch(args.points)
+        print(f"Inserting {args.points} points, best of {args.rounds} rounds")
+        orm = await run("orm", orm_path, session_factory, client_id, batch, args.rounds)
+        bulk = await run("bulk", bulk_path, session_factory, client_id, batch, args.rounds)
+        print(f"speedup: {orm / bulk:.1f}x")
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""
+Benchmark for the location read paths
+
+Compares loading full Location entities through the ORM with selecting only
+the needed columns as Core rows, as GET /api/locations/{client_id} (pages of
+1000 LocationResponse) and GET /api/routes/{client_id} (longitude, latitude
+and timestamp of a long range) do, and reports rows per second. Seeds a
+SQLite database with --rows locations spread over --clients clients; pass
+--database to keep the seeded file and reuse it on later runs.
+
+Usage:
+    python benchmarks/bench_read_paths.py [--rows 10000000] [--clients 100] [--database PATH] [--rounds 3]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.database import Base
+from src.models.models import Client, Location
+from src.models.schemas import LocationResponse
+
+SEED_CHUNK = 50000
+PAGE_SIZE = 1000
+PAGES = 50
+ROUTE_ROWS = 100000
+START = datetime(2024, 1, 1)
+
+LOCATION_RESPONSE_COLUMNS = (
+    Location.id, Location.latitude, Location.longitude, Location.accuracy,
+    Location.altitude, Location.speed, Location.timestamp, Location.created_at
+)
+
+def seed(path: str, rows: int, clients: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.scalar(select(func.count()).select_from(Location.__table__))
+        client_ids = conn.scalars(select(Client.id)).all()
+        if existing >= rows and client_ids:
+            return client_ids
+
+        client_ids = [str(uuid.uuid4()) for _ in range(clients)]
+        conn.execute(insert(Client.__table__), [
+            {"id": client_id, "name": "bench", "device_info": "{}"} for client_id in client_ids
+        ])
+    per_client = rows // clients
+    print(f"Seeding {per_client * clients:,} locations...")
+    for client_id in client_ids:
+        for start in range(0, per_client, SEED_CHUNK):
+            with engine.begin() as conn:
+                conn.execute(insert(Location.__table__), [
+                    {
+                        "client_id": client_id,
+                        "latitude": 37.7749 + i * 1e-6,
+                        "longitude": -122.4194 + i * 1e-6,
+                        "accuracy": 5.0,
+                        "speed": 1.5,
+                        "timestamp": START + timedelta(seconds=i),
+                        "created_at": START,
+                    }
+                    for i in range(start, min(start + SEED_CHUNK, per_client))
+                ])
+    engine.dispose()
+    return client_ids
+
+async def pages_orm(db, client_id, ends):
+    count = 0
+    for end in ends:
+        result = await db.execute(
+            select(Location).where(Location.client_id == client_id, Location.timestamp <= end)
+            .order_by(Location.timestamp.desc(), Location.id.desc()).limit(PAGE_SIZE)
+        )
+        page = [
+            LocationResponse(
+                id=loc.id, latitude=loc.latitude, longitude=loc.longitude, accuracy=loc.accuracy,
+                altitude=loc.altitude, speed=loc.speed, timestamp=loc.timestamp, created_at=loc.created_at
+            )
+            for loc in result.scalars().all()
+        ]
+        count += len(page)
+        db.expunge_all()
+    return count
+
+async def pages_core(db, client_id, ends):
+    count = 0
+    for end in ends:
+        result = await db.execute(
+            select(*LOCATION_RESPONSE_COLUMNS).where(Location.client_id == client_id, Location.timestamp <= end)
+            .order_by(Location.timestamp.desc(), Location.id.desc()).limit(PAGE_SIZE)
+        )
+        page = [LocationResponse(**row._mapping) for row in result.all()]
+        count += len(page)
+    return count
+
+async def route_orm(db, client_id, end):
+    result = await db.execute(
+        select(Location).where(Location.client_id == client_id, Location.timestamp <= end).order_by(Location.timestamp)
+    )
+    locations = result.scalars().all()
+    coordinates = [[loc.longitude, loc.latitude] for loc in locations]
+    db.expunge_all()
+    return len(coordinates)
+
+async def route_core(db, client_id, end):
+    result = await db.execute(
+        select(Location.longitude, Location.latitude, Location.timestamp)
+        .where(Location.client_id == client_id, Location.timestamp <= end).order_by(Location.timestamp)
+    )
+    coordinates = [[longitude, latitude] for longitude, latitude, _ in result.all()]
+    return len(coordinates)
+
+async def measure(session_factory, rounds, func, *args):
+    best = None
+    for _ in range(rounds):
+        async with session_factory() as db:
+            started = time.perf_counter()
+            rows = await func(db, *args)
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return rows / best
+
+async def run(path: str, client_ids, rows: int, rounds: int):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    per_client = rows // len(client_ids)
+    client_id = random.Random(1).choice(client_ids)
+    ends = [START + timedelta(seconds=random.Random(i).randrange(PAGE_SIZE, per_client)) for i in range(PAGES)]
+    route_end = START + timedelta(seconds=min(ROUTE_ROWS, per_client) - 1)
+
+    print(f"{rows:,} rows, best of {rounds} rounds")
+    for name, orm, core, args in (
+        (f"pages of {PAGE_SIZE}", pages_orm, pages_core, (client_id, ends)),
+        (f"route of {min(ROUTE_ROWS, per_client):,}", route_orm, route_core, (client_id, route_end)),
+    ):
+        orm_rate = await measure(session_factory, rounds, orm, *args)
+        core_rate = await measure(session_factory, rounds, core, *args)
+        print(f"{name:>16}: ORM {orm_rate:12,.0f} rows/s  columns {core_rate:12,.0f} rows/s  speedup {core_rate / orm_rate:.1f}x")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.database or os.path.join(tmp, "bench.db")
+        client_ids = seed(path, args.rows, args.clients)
+        asyncio.run(run(path, client_ids, args.rows, args.rounds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark for route simplification
+
+Generates a synthetic GPS track (turns, stops with jitter, measurement
+noise) and compares the old stride sampling with Douglas-Peucker and
+Visvalingam-Whyatt (services/route_simplify.py) at the same point count.
+Reports simplification time, the time to serialize the resulting GeoJSON
+coordinates, and shape fidelity as the mean and maximum distance of the
+original points from the simplified line.
+
+Usage:
+    python benchmarks/bench_route_simplify.py [--points 1000000] [--tolerance 5] [--rounds 3]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.services.route_simplify import project, douglas_peucker, visvalingam_whyatt
+
+def make_track(count: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    # Heading drifts slowly with occasional sharp turns
+    turns = rng.normal(0, 0.02, count) + np.where(rng.random(count) < 0.001, rng.normal(0, 1.2, count), 0)
+    heading = np.cumsum(turns)
+    # Walking to driving speeds, with stops of a few minutes
+    speed = np.repeat(rng.uniform(1, 20, count // 600 + 1), 600)[:count]
+    speed[(np.arange(count) // 300) % 7 == 0] = 0
+    step = speed * 1.0
+    x = np.cumsum(step * np.cos(heading)) + rng.normal(0, 2, count)
+    y = np.cumsum(step * np.sin(heading)) + rng.normal(0, 2, count)
+    latitudes = 37.7749 + np.degrees(y / 6371008.8)
+    longitudes = -122.4194 + np.degrees(x / (6371008.8 * np.cos(np.radians(37.7749))))
+    return latitudes, longitudes
+
+def stride(count: int, target: int) -> np.ndarray:
+    # The previous implementation: every len // target-th point
+    return np.arange(0, count, max(count // target, 1))
+
+def deviation(points: np.ndarray, kept: np.ndarray):
+    """Mean and maximum distance of every original point from the simplified line"""
+    segment = np.clip(np.searchsorted(kept, np.arange(len(points)), side="right") - 1, 0, len(kept) - 2)
+    start = points[kept[segment]]
+    end = points[kept[segment + 1]]
+    direction = end - start
+    length_squared = np.einsum("ij,ij->i", direction, direction)
+    t = np.clip(np.einsum("ij,ij->i", points - start, direction) / np.where(length_squared == 0, 1, length_squared), 0, 1)
+    offset = points - start - direction * t[:, None]
+    distances = np.hypot(offset[:, 0], offset[:, 1])
+    # Points after the last kept one (stride sampling) lie off the line entirely
+    tail = np.arange(len(points)) > kept[-1]
+    distances[tail] = np.hypot(*(points[tail] - points[kept[-1]]).T)
+    return distances.mean(), distances.max()
+
+def best_of(rounds, func):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=1000000)
+    parser.add_argument("--tolerance", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    latitudes, longitudes = make_track(args.points)
+    points = project(latitudes, longitudes)
+
+    def serialize(kept: np.ndarray):
+        return json.dumps(np.column_stack((longitudes[kept], latitudes[kept])).tolist())
+
+    full_time, body = best_of(args.rounds, lambda: serialize(np.arange(args.points)))
+    print(f"{args.points:,} points, tolerance {args.tolerance} m, best of {args.rounds} rounds")
+    print(f"unsimplified: serialize {full_time * 1000:8.1f} ms  {len(body):>12,} bytes")
+
+    dp_time, dp_kept = best_of(args.rounds, lambda: douglas_peucker(points, args.tolerance))
+    target = len(dp_kept)
+    results = [
+        ("stride", *best_of(args.rounds, lambda: stride(args.points, target))),
+        ("dp", dp_time, dp_kept),
+        ("vw", *best_of(args.rounds, lambda: visvalingam_whyatt(points, max_points=target))),
+    ]
+    for name, elapsed, kept in results:
+        serialize_time, body = best_of(args.rounds, lambda: serialize(kept))
+        mean_error, max_error = deviation(points, kept)
+        print(
+            f"{name:>12}: {len(kept):>8,} points  simplify {elapsed * 1000:8.1f} ms  "
+            f"serialize {serialize_time * 1000:6.1f} ms  {len(body):>10,} bytes  "
+            f"error mean {mean_error:7.1f} m  max {max_error:8.1f} m"
+        )
+
+if __name__ == "__main__":
+    main()
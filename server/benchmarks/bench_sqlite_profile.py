@@ -0,0 +1,127 @@
+"""
+Benchmark for the SQLite performance profile in src/database.py
+
+Runs concurrent writer threads (single-point inserts, one commit each, like
+POST /api/locations) and reader threads (latest 100 points of a client, like
+GET /api/locations/{client_id}) against a fresh database, once with SQLite
+defaults and once with the pragma profile, and reports operations per second.
+
+Usage:
+    python benchmarks/bench_sqlite_profile.py [--seconds 5] [--writers 2] [--readers 4]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+
+from src.database import Base, SQLITE_PRAGMAS, apply_sqlite_pragmas
+from src.models.models import Client, Location
+
+SEED_POINTS = 50000
+
+def seed(engine, client_ids):
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Client.__table__), [
+            {"id": client_id, "name": "bench", "device_info": "{}"} for client_id in client_ids
+        ])
+        conn.execute(insert(Location.__table__), [
+            {
+                "client_id": client_ids[i % len(client_ids)],
+                "latitude": 37.7749,
+                "longitude": -122.4194,
+                "accuracy": 5.0,
+                "timestamp": start + timedelta(seconds=i),
+            }
+            for i in range(SEED_POINTS)
+        ])
+
+def writer(engine, client_id, stop, counters):
+    table = Location.__table__
+    while not stop.is_set():
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(table).values(
+                    client_id=client_id,
+                    latitude=37.7749,
+                    longitude=-122.4194,
+                    accuracy=5.0,
+                    timestamp=datetime.utcnow()
+                ))
+            counters["writes"] += 1
+        except OperationalError:
+            counters["errors"] += 1
+
+def reader(engine, client_id, stop, counters):
+    table = Location.__table__
+    query = select(table).where(table.c.client_id == client_id).order_by(table.c.timestamp.desc()).limit(100)
+    while not stop.is_set():
+        try:
+            with engine.connect() as conn:
+                conn.execute(query).all()
+            counters["reads"] += 1
+        except OperationalError:
+            counters["errors"] += 1
+
+def run(name, pragmas, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            connect_args={"check_same_thread": False},
+            pool_size=args.writers + args.readers
+        )
+        apply_sqlite_pragmas(engine, pragmas)
+        Base.metadata.create_all(bind=engine)
+
+        client_ids = [str(uuid.uuid4()) for _ in range(10)]
+        seed(engine, client_ids)
+
+        stop = threading.Event()
+        counters = {"writes": 0, "reads": 0, "errors": 0}
+        threads = [
+            threading.Thread(target=writer, args=(engine, client_ids[i % 10], stop, counters))
+            for i in range(args.writers)
+        ] + [
+            threading.Thread(target=reader, args=(engine, client_ids[i % 10], stop, counters))
+            for i in range(args.readers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    print(
+        f"{name:>8}: {counters['writes'] / args.seconds:9,.0f} writes/s "
+        f"{counters['reads'] / args.seconds:9,.0f} reads/s "
+        f"{counters['errors']:6d} errors"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    if not SQLITE_PRAGMAS:
+        print("SQLITE_PERFORMANCE_PROFILE is disabled; both runs would be identical")
+        return
+
+    print(f"Profile: {SQLITE_PRAGMAS}")
+    run("default", {}, args)
+    run("profile", SQLITE_PRAGMAS, args)
+
+if __name__ == "__main__":
+    main()
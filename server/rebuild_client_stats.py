@@ -0,0 +1,17 @@
+import asyncio
+
+from src.database import AsyncSessionLocal, async_engine
+from src.services.client_stats import rebuild_location_stats, rebuild_log_stats
+from src.services.log_partitions import client_log_source
+
+# Recompute client_stats from locations and client_logs, e.g. after upgrading
+# an existing database or restoring a backup
+async def main():
+    async with AsyncSessionLocal() as db:
+        await rebuild_location_stats(db)
+        await rebuild_log_stats(db, await client_log_source(db))
+        await db.commit()
+    await async_engine.dispose()
+
+asyncio.run(main())
+print("Client stats rebuilt successfully")
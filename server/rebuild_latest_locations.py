@@ -0,0 +1,15 @@
+import asyncio
+
+from src.database import AsyncSessionLocal, async_engine
+from src.services.latest_locations import rebuild_latest_locations
+
+# Repopulate client_latest_location from locations, e.g. after upgrading
+# an existing database or restoring a backup
+async def main():
+    async with AsyncSessionLocal() as db:
+        await rebuild_latest_locations(db)
+        await db.commit()
+    await async_engine.dispose()
+
+asyncio.run(main())
+print("Latest locations rebuilt successfully")
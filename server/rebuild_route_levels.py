@@ -0,0 +1,33 @@
+import asyncio
+
+from sqlalchemy import select, func
+
+from src.database import AsyncSessionLocal, async_engine
+from src.models.models import Location
+from src.services.route_levels import mark_route_buckets, RouteLevelBuilder
+
+# Rebuild route_levels for every client and day from locations, e.g. after
+# upgrading an existing database or changing ROUTE_LEVEL_TOLERANCES_M
+async def main():
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(Location.client_id, func.min(Location.timestamp), func.max(Location.timestamp))
+            .group_by(Location.client_id, func.date(Location.timestamp))
+        )
+        # The database may group by local dates; the first and last location
+        # of a group cover every UTC day it overlaps
+        async for batch in result.partitions(1000):
+            await mark_route_buckets(db, [
+                (client_id, timestamp) for client_id, first, last in batch for timestamp in (first, last)
+            ])
+        await db.commit()
+
+    builder = RouteLevelBuilder()
+    rebuilt = 0
+    while processed := await builder.flush():
+        rebuilt += processed
+    await async_engine.dispose()
+    print(f"Rebuilt route levels for {rebuilt} client days")
+
+asyncio.run(main())
+print("Route levels rebuilt successfully")
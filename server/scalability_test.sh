@@ -15,6 +15,14 @@ UPDATES_PER_CLIENT=20
 # Delay between updates (in seconds)
 UPDATE_DELAY=2
 
+# Payload format: "json" sends one location per request, "binary" sends
+# BATCH_SIZE locations per request in the compact binary batch format
+PAYLOAD_FORMAT=${PAYLOAD_FORMAT:-json}
+BATCH_SIZE=${BATCH_SIZE:-50}
+
+# Server directory, for the reference encoder in src/services/binary_codec.py
+SERVER_DIR=$(cd "$(dirname "$0")" && pwd)
+
 # Function to register a new client
 register_client() {
     local client_num=$1
@@ -90,6 +98,56 @@ send_location() {
     fi
 }
 
+# Function to write a binary batch of BATCH_SIZE locations to stdout
+# Same movement as send_location, one point per second up to now
+encode_binary_batch() {
+    local update_num=$1
+    
+    python3 - "$SERVER_DIR" "$BATCH_SIZE" "$update_num" <<'EOF'
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, sys.argv[1])
+from src.services.binary_codec import encode_location_batch
+
+count, update_num = int(sys.argv[2]), int(sys.argv[3])
+now = datetime.utcnow()
+sys.stdout.buffer.write(encode_location_batch(
+    {
+        "latitude": 37.7749 + random.uniform(-0.01, 0.01) + update_num * 0.0001,
+        "longitude": -122.4194 + random.uniform(-0.01, 0.01) + update_num * 0.0001,
+        "accuracy": float(random.randint(5, 20)),
+        "timestamp": now - timedelta(seconds=count - index)
+    }
+    for index in range(count)
+))
+EOF
+}
+
+# Function to send a batch of locations in the binary format
+send_binary_batch() {
+    local client_num=$1
+    local update_num=$2
+    
+    # Read client credentials
+    IFS=',' read -r client_id access_token < "scale_client_${client_num}.txt"
+    
+    echo "Sending binary batch for client $client_num (update $update_num): $BATCH_SIZE locations"
+    
+    response=$(encode_binary_batch $update_num | curl -s -X POST "$SERVER_URL/api/locations/batch/binary" \
+        -H "Content-Type: application/octet-stream" \
+        -H "Authorization: Bearer $access_token" \
+        --data-binary @-)
+    
+    # Check if response contains an error
+    if [[ $response == *"error"* || $response == *"detail"* ]]; then
+        echo "Error response: $response"
+    else
+        echo "Batch upload successful"
+    fi
+}
+
 echo "Starting scalability test with $NUM_CLIENTS clients, $UPDATES_PER_CLIENT updates each"
 
 # Register all clients
@@ -105,7 +163,11 @@ for ((update=1; update<=UPDATES_PER_CLIENT; update++)); do
     echo "===== Update round $update of $UPDATES_PER_CLIENT ====="
     
     for ((client=1; client<=NUM_CLIENTS; client++)); do
-        send_location $client $update
+        if [[ $PAYLOAD_FORMAT == "binary" ]]; then
+            send_binary_batch $client $update
+        else
+            send_location $client $update
+        fi
         
         # Small random delay between client updates (0-1 seconds)
         sleep $(echo "scale=3; $RANDOM/32767" | bc)
@@ -117,3 +179,6 @@ done
 
 echo "Scalability test completed"
 echo "Total updates sent: $((NUM_CLIENTS * UPDATES_PER_CLIENT))"
+if [[ $PAYLOAD_FORMAT == "binary" ]]; then
+    echo "Total locations sent: $((NUM_CLIENTS * UPDATES_PER_CLIENT * BATCH_SIZE))"
+fi
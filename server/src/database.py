@@ -1,7 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from typing import Dict, Any
 import os
 
 # Load environment variables
@@ -9,26 +13,128 @@ load_dotenv()
 
 # Database connection settings
 DATABASE_URL = os.getenv(
-    "DATABASE_URL", 
+    "DATABASE_URL",
     "sqlite:///./goodemployers.db"
 )
 
+# Async drivers used by the request handlers, keyed by backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Swap the driver of a synchronous database URL for its asyncio counterpart"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for database URL '{url}'")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# SQLite performance profile, applied to every new connection.
+# WAL lets readers proceed while a write is in progress; synchronous=NORMAL is
+# durable across application crashes in WAL mode and only fsyncs at checkpoints.
+SQLITE_PERFORMANCE_PROFILE = os.getenv("SQLITE_PERFORMANCE_PROFILE", "1") == "1"
+SQLITE_PRAGMAS: Dict[str, str] = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", str(-64 * 1024)),  # Negative values are KiB
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+} if SQLITE_PERFORMANCE_PROFILE else {}
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: Dict[str, str] = SQLITE_PRAGMAS):
+    """Register a connect hook that sets the given pragmas on each new SQLite connection"""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+# PostgreSQL connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Seconds
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """Build create_engine keyword arguments for the backend and driver of url"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+
+    if backend == "sqlite":
+        if parsed.get_driver_name() == "pysqlite":
+            return {"connect_args": {"check_same_thread": False}}  # Needed for SQLite
+        return {}
+
+    if backend == "postgresql":
+        # Timestamps are bound as aware UTC by UTCDateTime; the session time zone is left alone
+        if parsed.get_driver_name() == "asyncpg":
+            connect_args = {"server_settings": {
+                "statement_timeout": str(DB_STATEMENT_TIMEOUT_MS),
+            }}
+        else:
+            connect_args = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "connect_args": connect_args,
+        }
+
+    return {}
+
 # Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+
+# Create async engine used by the API
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+
+apply_sqlite_pragmas(engine)
+apply_sqlite_pragmas(async_engine.sync_engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create AsyncSessionLocal class; objects stay usable after commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create Base class
 Base = declarative_base()
 
-# Dependency to get DB session
+def dialect_insert(db, table):
+    """
+    Return an INSERT for table that supports on_conflict_do_nothing/do_update
+
+    Args:
+        db: Session, AsyncSession or engine bound to the target database
+        table: Table to insert into
+    """
+    dialect = (getattr(db, "bind", None) or db).dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+# Dependency to get DB session (scripts and synchronous code)
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+# Dependency to get async DB session (request handlers)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -7,16 +7,46 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+from src.database import async_engine, AsyncSessionLocal
+from src.services.ingest_queue import ingest_queue, INGEST_MODE
+from src.services.client_cache import client_identity_cache
+from src.services.activity_tracker import activity_tracker
+from src.services.maintenance import maintenance_sweeper
+from src.services.logging_service import audit_writer
+from src.services.fleet_state import fleet_state
+from src.services.route_levels import route_level_builder
+
+# Start and stop background workers with the application
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncSessionLocal() as db:
+        await fleet_state.seed(db)
+    await audit_writer.start()
+    if INGEST_MODE == "queued":
+        await ingest_queue.start()
+    await activity_tracker.start()
+    await maintenance_sweeper.start()
+    await route_level_builder.start()
+    yield
+    await route_level_builder.stop()
+    await maintenance_sweeper.stop()
+    await ingest_queue.stop()
+    await activity_tracker.stop()
+    await audit_writer.stop()
+    await async_engine.dispose()
+
 # Create FastAPI app
 app = FastAPI(
     title="GoodEmployers API",
     description="API for tracking and visualizing GPS coordinates from multiple clients",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -29,7 +59,7 @@ app.add_middleware(
 )
 
 # Import routes
-from src.routes import auth, locations, clients, routes, logs
+from src.routes import auth, locations, clients, routes, logs, fleet
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -37,6 +67,7 @@ app.include_router(locations.router, prefix="/api/locations", tags=["Locations"]
 app.include_router(clients.router, prefix="/api/clients", tags=["Clients"])
 app.include_router(routes.router, prefix="/api/routes", tags=["Routes"])
 app.include_router(logs.router, prefix="/api/logs", tags=["Logs"])
+app.include_router(fleet.router, prefix="/api/fleet", tags=["Fleet"])
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="src/static"), name="static")
@@ -57,4 +88,8 @@ async def map_page(request: Request):
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "auth_cache": client_identity_cache.stats(),
+        "last_sweep": maintenance_sweeper.last_report
+    }
@@ -1,38 +1,102 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Float, BigInteger, func, Index, Double
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Float, BigInteger, Integer, JSON, func, Index, Double, TypeDecorator, DDL, Identity, LargeBinary, event
+from sqlalchemy.dialects.postgresql import JSONB, TIMESTAMP, UUID
 from sqlalchemy.dialects.sqlite import BLOB
 from sqlalchemy.orm import relationship
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from src.database import Base
 
+# SQLite only autoincrements INTEGER PRIMARY KEY (rowid alias), not BIGINT
+BigIntPK = BigInteger().with_variant(Integer, "sqlite")
+
+class UUIDString(TypeDecorator):
+    """UUID held as a string; String(36) in SQLite, native uuid in PostgreSQL"""
+    impl = String(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(UUID(as_uuid=False))
+        return dialect.type_descriptor(String(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != "postgresql":
+            return value
+        try:
+            return str(uuid.UUID(str(value)))
+        except ValueError:
+            # Malformed ids from URLs match no rows instead of failing the cast
+            return str(uuid.UUID(int=0))
+
+class UTCDateTime(TypeDecorator):
+    """
+    Naive UTC datetime; DateTime in SQLite, native timestamptz in PostgreSQL
+
+    The application works with naive UTC values throughout. asyncpg binds a
+    naive datetime to timestamptz in the host's local time zone, so values
+    are bound to PostgreSQL as aware UTC and read back as naive UTC on every
+    backend. Aware values are converted to UTC first.
+    """
+    impl = DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(TIMESTAMP(timezone=True))
+        return dialect.type_descriptor(DateTime())
+
+    def process_bind_param(self, value, dialect):
+        if not isinstance(value, datetime):
+            return value
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        if dialect.name == "postgresql":
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+# Portable column type that uses native jsonb on PostgreSQL
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 class Client(Base):
     __tablename__ = "clients"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDString, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String(255), nullable=False)
-    device_info = Column(String, nullable=True)  # Store JSON as string in SQLite
-    created_at = Column(DateTime, default=datetime.utcnow)
-    last_active = Column(DateTime, default=datetime.utcnow)
+    device_info = Column(JSONDocument, nullable=True)  # JSON text in SQLite, jsonb in PostgreSQL
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    last_active = Column(UTCDateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
     
     # Relationships
     locations = relationship("Location", back_populates="client", cascade="all, delete-orphan")
     logs = relationship("ClientLog", back_populates="client", cascade="all, delete-orphan")
     refresh_tokens = relationship("RefreshToken", back_populates="client", cascade="all, delete-orphan")
+    
+    # Create indexes for efficient querying
+    __table_args__ = (
+        # list_clients orders and seeks by most recent activity, or by registration time
+        Index('idx_clients_last_active', last_active, id),
+        Index('idx_clients_created_at', created_at, id),
+    )
 
 class Location(Base):
     __tablename__ = "locations"
     
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    client_id = Column(String(36), ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
+    client_id = Column(UUIDString, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
     # Store latitude and longitude as separate columns instead of using PostGIS
     latitude = Column(Double, nullable=False)
     longitude = Column(Double, nullable=False)
     accuracy = Column(Float, nullable=False)
     altitude = Column(Float, nullable=True)
     speed = Column(Float, nullable=True)
-    timestamp = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(UTCDateTime, nullable=False)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
     
     # Relationships
     client = relationship("Client", back_populates="locations")
@@ -41,17 +105,19 @@ class Location(Base):
     __table_args__ = (
         Index('idx_locations_client_id', client_id),
         Index('idx_locations_timestamp', timestamp),
-        Index('idx_locations_client_timestamp', client_id, timestamp),
+        # Unique so retried uploads are dropped by INSERT ... ON CONFLICT DO NOTHING
+        Index('idx_locations_client_timestamp', client_id, timestamp, unique=True),
     )
 
 class ClientLog(Base):
     __tablename__ = "client_logs"
     
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    client_id = Column(String(36), ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    id = Column(BigIntPK, Identity(), primary_key=True)  # Generated on PostgreSQL, per month table on SQLite
+    client_id = Column(UUIDString, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
     action = Column(String(50), nullable=False)
-    details = Column(String, nullable=True)  # Store JSON as string in SQLite
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    details = Column(JSONDocument, nullable=True)  # JSON text in SQLite, jsonb in PostgreSQL
+    # Part of the key because PostgreSQL partitions on it (see services/log_partitions.py)
+    timestamp = Column(UTCDateTime, primary_key=True, default=datetime.utcnow)
     
     # Relationships
     client = relationship("Client", back_populates="logs")
@@ -62,16 +128,24 @@ class ClientLog(Base):
         Index('idx_client_logs_action', action),
         Index('idx_client_logs_timestamp', timestamp),
         Index('idx_client_logs_client_timestamp', client_id, timestamp),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
 
+# Rows outside the monthly PostgreSQL partitions land in a default partition
+event.listen(
+    ClientLog.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS client_logs_default PARTITION OF client_logs DEFAULT").execute_if(dialect="postgresql")
+)
+
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
     
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    client_id = Column(String(36), ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
+    client_id = Column(UUIDString, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
     token = Column(String(255), nullable=False, unique=True)
-    expires_at = Column(DateTime, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(UTCDateTime, nullable=False)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
     
     # Relationships
     client = relationship("Client", back_populates="refresh_tokens")
@@ -82,3 +156,62 @@ class RefreshToken(Base):
         Index('idx_refresh_tokens_client_id', client_id),
         Index('idx_refresh_tokens_expires_at', expires_at),
     )
+
+class ClientStats(Base):
+    __tablename__ = "client_stats"
+    
+    # Maintained on ingest by services/client_stats.py; rebuild with rebuild_client_stats.py
+    client_id = Column(UUIDString, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    location_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    first_location_at = Column(UTCDateTime, nullable=True)
+    last_location_at = Column(UTCDateTime, nullable=True)
+    log_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    first_log_at = Column(UTCDateTime, nullable=True)
+    last_log_at = Column(UTCDateTime, nullable=True)
+
+class ClientLatestLocation(Base):
+    __tablename__ = "client_latest_location"
+    
+    # Newest location per client, upserted on ingest; rebuild with rebuild_latest_locations.py
+    client_id = Column(UUIDString, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    location_id = Column(BigInteger, nullable=False)
+    latitude = Column(Double, nullable=False)
+    longitude = Column(Double, nullable=False)
+    accuracy = Column(Float, nullable=False)
+    altitude = Column(Float, nullable=True)
+    speed = Column(Float, nullable=True)
+    timestamp = Column(UTCDateTime, nullable=False)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+
+class RouteLevel(Base):
+    __tablename__ = "route_levels"
+    
+    # One simplified version of a client's track for one UTC day; see services/route_levels.py
+    client_id = Column(UUIDString, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    bucket_start = Column(UTCDateTime, primary_key=True)
+    level = Column(Integer, primary_key=True)
+    point_count = Column(Integer, nullable=False)
+    source_point_count = Column(Integer, nullable=False)
+    points = Column(LargeBinary, nullable=False)  # float64 (longitude, latitude, epoch microseconds) triples
+    built_at = Column(UTCDateTime, default=datetime.utcnow)
+
+class RouteLevelDirty(Base):
+    __tablename__ = "route_levels_dirty"
+    
+    # Days whose route levels are out of date; generation grows with each new batch
+    client_id = Column(UUIDString, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    bucket_start = Column(UTCDateTime, primary_key=True)
+    generation = Column(Integer, nullable=False, default=1)
+
+class IngestIdempotencyKey(Base):
+    __tablename__ = "ingest_idempotency_keys"
+    
+    client_id = Column(UUIDString, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    response = Column(JSONDocument, nullable=False)  # Response returned on replay
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    
+    # Create indexes for efficient querying
+    __table_args__ = (
+        Index('idx_ingest_idempotency_keys_created_at', created_at),
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 from uuid import UUID
@@ -48,6 +48,24 @@ class LocationCreate(BaseModel):
 class LocationBatchCreate(BaseModel):
     locations: List[LocationCreate]
 
+class LocationColumnarBatchCreate(BaseModel):
+    """Batch as parallel arrays; index i of every array describes point i"""
+    latitudes: List[float]
+    longitudes: List[float]
+    accuracies: List[float]
+    timestamps: List[int]  # Epoch milliseconds, UTC
+    altitudes: Optional[List[Optional[float]]] = None
+    speeds: Optional[List[Optional[float]]] = None
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        count = len(self.latitudes)
+        for name in ("longitudes", "accuracies", "timestamps", "altitudes", "speeds"):
+            values = getattr(self, name)
+            if values is not None and len(values) != count:
+                raise ValueError(f"{name} has {len(values)} items, expected {count}")
+        return self
+
 class LocationResponse(BaseModel):
     id: int
     latitude: float
@@ -58,9 +76,31 @@ class LocationResponse(BaseModel):
     timestamp: datetime
     created_at: datetime
 
+class ClientLatestLocationResponse(LocationResponse):
+    client_id: UUID
+
+class FleetLatestResponse(BaseModel):
+    total_count: int
+    locations: List[ClientLatestLocationResponse]
+
+class FleetClientState(BaseModel):
+    client_id: UUID
+    name: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    accuracy: Optional[float] = None
+    speed: Optional[float] = None
+    timestamp: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+
+class FleetSnapshotResponse(BaseModel):
+    total_count: int
+    clients: List[FleetClientState]
+
 class LocationsResponse(BaseModel):
     total_count: int
     locations: List[LocationResponse]
+    next_cursor: Optional[str] = None  # Pass as cursor to fetch the next page
 
 class ClientLogCreate(BaseModel):
     action: str
@@ -76,10 +116,24 @@ class ClientLogResponse(BaseModel):
 class ClientLogsResponse(BaseModel):
     total_count: int
     logs: List[ClientLogResponse]
+    next_cursor: Optional[str] = None  # Pass as cursor to fetch the next page
+
+class LogActionCount(BaseModel):
+    bucket_start: datetime
+    action: str
+    count: int
+
+class LogAggregateResponse(BaseModel):
+    client_id: Optional[UUID] = None
+    bucket: str
+    start_time: datetime
+    end_time: datetime
+    counts: List[LogActionCount]
 
 class ClientsResponse(BaseModel):
     total_count: int
     clients: List[ClientResponse]
+    next_cursor: Optional[str] = None  # Pass as cursor to fetch the next page
 
 class RoutePoint(BaseModel):
     latitude: float
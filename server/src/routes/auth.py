@@ -1,17 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import uuid
 import os
-import json
 
-from src.database import get_db
+from src.database import get_async_db
 from src.models.models import Client, RefreshToken
 from src.models.schemas import ClientCreate, TokenResponse, TokenRefresh
 from src.services.logging_service import log_client_action
+from src.services.client_cache import ClientIdentity, client_identity_cache
+from src.services.activity_tracker import activity_tracker
+from src.services.fleet_state import fleet_state
 
 # Router
 router = APIRouter()
@@ -22,6 +25,9 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 30
 
+# Clients allowed to read fleet-wide data (comma-separated client ids)
+ADMIN_CLIENT_IDS = {value.strip() for value in os.getenv("ADMIN_CLIENT_IDS", "").split(",") if value.strip()}
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -39,9 +45,9 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def create_refresh_token(db: Session, client_id: str):
+async def create_refresh_token(db: AsyncSession, client_id: str):
     # Delete any existing refresh tokens for this client
-    db.query(RefreshToken).filter(RefreshToken.client_id == client_id).delete()
+    await db.execute(delete(RefreshToken).where(RefreshToken.client_id == client_id))
     
     # Create new refresh token
     token_value = str(uuid.uuid4())
@@ -54,13 +60,12 @@ def create_refresh_token(db: Session, client_id: str):
     )
     
     db.add(refresh_token)
-    db.commit()
-    db.refresh(refresh_token)
+    await db.commit()
     
     return token_value, REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60  # Expires in seconds
 
 # Authentication dependency
-async def get_current_client(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_client(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -75,33 +80,53 @@ async def get_current_client(token: str = Depends(oauth2_scheme), db: Session =
     except JWTError:
         raise credentials_exception
         
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if client is None or not client.is_active:
+    # Resolve the client from the identity cache, falling back to the database
+    identity = client_identity_cache.get(client_id)
+    if identity is None:
+        client = await db.get(Client, client_id)
+        if client is None:
+            raise credentials_exception
+        identity = ClientIdentity(id=client.id, name=client.name, is_active=client.is_active)
+        client_identity_cache.put(identity)
+
+    if not identity.is_active:
         raise credentials_exception
+
+    # Recorded in memory, written to clients.last_active in the background
+    activity_tracker.touch(identity.id)
         
-    return client
+    return identity
+
+async def get_admin_client(current_client: ClientIdentity = Depends(get_current_client)):
+    """Authenticated client that may read other clients' data, listed in ADMIN_CLIENT_IDS"""
+    if current_client.id not in ADMIN_CLIENT_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access fleet-wide data"
+        )
+    return current_client
 
 # Endpoints
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-async def register_client(client_data: ClientCreate, db: Session = Depends(get_db)):
+async def register_client(client_data: ClientCreate, db: AsyncSession = Depends(get_async_db)):
     # Create new client
     client_id = str(uuid.uuid4())
     client = Client(
         id=client_id,
         name=client_data.name,
-        device_info=json.dumps(client_data.device_info.dict())  # Convert to JSON string for SQLite
+        device_info=client_data.device_info.dict()
     )
     
     db.add(client)
-    db.commit()
-    db.refresh(client)
+    await db.commit()
+    fleet_state.add_client(client.id, client.name)
     
     # Log client registration
-    log_client_action(db, client.id, "register", {"name": client.name})
+    await log_client_action(db, client.id, "register", {"name": client.name})
     
     # Create tokens
     access_token = create_access_token({"sub": client.id})
-    refresh_token, expires_in = create_refresh_token(db, client.id)
+    refresh_token, expires_in = await create_refresh_token(db, client.id)
     
     return {
         "access_token": access_token,
@@ -111,21 +136,24 @@ async def register_client(client_data: ClientCreate, db: Session = Depends(get_d
     }
 
 @router.post("/login", response_model=TokenResponse)
-async def login_client(client_id: str, db: Session = Depends(get_db)):
+async def login_client(client_id: str, db: AsyncSession = Depends(get_async_db)):
     # Find client
-    client = db.query(Client).filter(Client.id == client_id, Client.is_active == True).first()
+    result = await db.execute(select(Client).where(Client.id == client_id, Client.is_active == True))
+    client = result.scalars().first()
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Client not found or inactive"
         )
     
+    activity_tracker.touch(client.id)
+
     # Log client login
-    log_client_action(db, client.id, "login", {})
+    await log_client_action(db, client.id, "login", {})
     
     # Create tokens
     access_token = create_access_token({"sub": client.id})
-    refresh_token, expires_in = create_refresh_token(db, client.id)
+    refresh_token, expires_in = await create_refresh_token(db, client.id)
     
     return {
         "access_token": access_token,
@@ -135,12 +163,13 @@ async def login_client(client_id: str, db: Session = Depends(get_db)):
     }
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_token_endpoint(token_data: TokenRefresh, db: Session = Depends(get_db)):
+async def refresh_token_endpoint(token_data: TokenRefresh, db: AsyncSession = Depends(get_async_db)):
     # Find refresh token
-    token_record = db.query(RefreshToken).filter(
+    result = await db.execute(select(RefreshToken).where(
         RefreshToken.token == token_data.refresh_token,
         RefreshToken.expires_at > datetime.utcnow()
-    ).first()
+    ))
+    token_record = result.scalars().first()
     
     if not token_record:
         raise HTTPException(
@@ -149,10 +178,11 @@ async def refresh_token_endpoint(token_data: TokenRefresh, db: Session = Depends
         )
     
     # Check if client is active
-    client = db.query(Client).filter(
+    result = await db.execute(select(Client).where(
         Client.id == token_record.client_id,
         Client.is_active == True
-    ).first()
+    ))
+    client = result.scalars().first()
     
     if not client:
         raise HTTPException(
@@ -160,12 +190,14 @@ async def refresh_token_endpoint(token_data: TokenRefresh, db: Session = Depends
             detail="Client not found or inactive"
         )
     
+    activity_tracker.touch(client.id)
+
     # Log token refresh
-    log_client_action(db, client.id, "token_refresh", {})
+    await log_client_action(db, client.id, "token_refresh", {})
     
     # Create new tokens
     access_token = create_access_token({"sub": client.id})
-    refresh_token, expires_in = create_refresh_token(db, client.id)
+    refresh_token, expires_in = await create_refresh_token(db, client.id)
     
     return {
         "access_token": access_token,
@@ -1,14 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-import json
 
-from src.database import get_db
+from src.database import get_async_db
 from src.models.models import Client
 from src.models.schemas import ClientResponse, ClientDetail, ClientUpdate, ClientsResponse
 from src.routes.auth import get_current_client
+from src.services.client_cache import ClientIdentity, client_identity_cache
 from src.services.logging_service import log_client_action
+from src.services.client_stats import get_client_stats
+from src.services.pagination import encode_cursor, decode_page_cursor, before_cursor, InvalidCursorError
+from src.services.fleet_state import fleet_state
 
 # Router
 router = APIRouter()
@@ -17,22 +21,40 @@ router = APIRouter()
 @router.get("", response_model=ClientsResponse)
 async def list_clients(
     active_only: bool = True,
+    order: str = Query("last_active", pattern="^(last_active|registered)$"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
-    # Build query
-    query = db.query(Client)
+    try:
+        position = decode_page_cursor(cursor, offset)
+    except InvalidCursorError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+    # Build filters
+    filters = []
     
     if active_only:
-        query = query.filter(Client.is_active == True)
+        filters.append(Client.is_active == True)
     
     # Get total count
-    total_count = query.count()
-    
-    # Get paginated results
-    clients = query.order_by(Client.last_active.desc()).offset(offset).limit(limit).all()
+    total_count = await db.scalar(select(func.count()).select_from(Client).where(*filters))
+    
+    # Get paginated results, seeking past the cursor when one is given. last_active moves
+    # as clients report, so a walk in that order may skip or repeat clients; registration
+    # order never changes
+    sort_column = Client.created_at if order == "registered" else Client.last_active
+    page_filters = filters + [before_cursor(sort_column, Client.id, position)] if position else filters
+    result = await db.execute(
+        select(Client).where(*page_filters)
+        .order_by(sort_column.desc(), Client.id.desc()).offset(offset).limit(limit)
+    )
+    clients = result.scalars().all()
     
     # Convert clients for response
     client_responses = []
@@ -47,17 +69,18 @@ async def list_clients(
     
     return ClientsResponse(
         total_count=total_count,
-        clients=client_responses
+        clients=client_responses,
+        next_cursor=encode_cursor(getattr(clients[-1], sort_column.key), clients[-1].id) if len(clients) == limit else None
     )
 
 @router.get("/{client_id}", response_model=ClientDetail)
 async def get_client(
     client_id: str,
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,11 +95,11 @@ async def get_client(
             detail="Not authorized to access this client's details"
         )
     
-    # Count locations
-    location_count = db.query(Client).join(Client.locations).filter(Client.id == client_id).count()
+    # Location count is maintained on ingest
+    stats = await get_client_stats(db, client_id)
+    location_count = stats.location_count if stats else 0
     
-    # Parse device_info JSON
-    device_info = json.loads(client.device_info) if client.device_info else {}
+    device_info = client.device_info or {}
     
     return ClientDetail(
         id=client.id,
@@ -92,11 +115,11 @@ async def get_client(
 async def update_client(
     client_id: str,
     client_data: ClientUpdate,
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -115,13 +138,15 @@ async def update_client(
         client.name = client_data.name
     
     if client_data.device_info is not None:
-        client.device_info = json.dumps(client_data.device_info.dict())
+        client.device_info = client_data.device_info.dict()
     
-    db.commit()
-    db.refresh(client)
+    await db.commit()
+    client_identity_cache.invalidate(client_id)
+    if client.is_active:
+        fleet_state.add_client(client_id, client.name)
     
     # Log client update
-    log_client_action(db, client.id, "client_update", {
+    await log_client_action(db, client.id, "client_update", {
         "updated_fields": [k for k, v in client_data.dict(exclude_unset=True).items() if v is not None]
     })
     
@@ -134,11 +159,11 @@ async def update_client(
 @router.delete("/{client_id}", response_model=dict)
 async def deactivate_client(
     client_id: str,
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -154,10 +179,12 @@ async def deactivate_client(
     
     # Deactivate client (soft delete)
     client.is_active = False
-    db.commit()
+    await db.commit()
+    client_identity_cache.invalidate(client_id)
+    fleet_state.remove_client(client_id)
     
     # Log client deactivation
-    log_client_action(db, client.id, "client_deactivate", {})
+    await log_client_action(db, client.id, "client_deactivate", {})
     
     return {
         "id": client.id,
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Header
+from typing import Optional
+
+from src.models.schemas import FleetClientState, FleetSnapshotResponse
+from src.routes.auth import get_admin_client
+from src.services.client_cache import ClientIdentity
+from src.services.fleet_state import fleet_state
+
+# Router
+router = APIRouter()
+
+def parse_bbox(bbox: Optional[str]):
+    if bbox is None:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bbox must be min_lon,min_lat,max_lon,max_lat"
+        )
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bbox minimums must not exceed its maximums"
+        )
+    return min_lon, min_lat, max_lon, max_lat
+
+# Endpoints
+@router.get("/snapshot", response_model=FleetSnapshotResponse)
+async def get_fleet_snapshot(
+    response: Response,
+    bbox: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_client: ClientIdentity = Depends(get_admin_client)
+):
+    # Served from the in-memory fleet state; no database access. Admin clients only
+    bounds = parse_bbox(bbox)
+    etag = fleet_state.etag
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    entries = fleet_state.snapshot(bounds)
+    return FleetSnapshotResponse(
+        total_count=len(entries),
+        clients=[
+            FleetClientState(
+                client_id=entry.client_id,
+                name=entry.name,
+                latitude=entry.latitude,
+                longitude=entry.longitude,
+                accuracy=entry.accuracy,
+                speed=entry.speed,
+                timestamp=entry.timestamp,
+                last_seen=entry.last_seen
+            )
+            for entry in entries
+        ]
+    )
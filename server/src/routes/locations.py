@@ -1,88 +1,241 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, Header
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
-import json
+import math
 
-from src.database import get_db
+from src.database import get_async_db
 from src.models.models import Location, Client
-from src.models.schemas import LocationCreate, LocationResponse, LocationsResponse, LocationBatchCreate
-from src.routes.auth import get_current_client
+from src.models.schemas import LocationCreate, LocationResponse, LocationsResponse, LocationBatchCreate, LocationColumnarBatchCreate, ClientLatestLocationResponse, FleetLatestResponse
+from src.routes.auth import get_current_client, get_admin_client
+from src.services.client_cache import ClientIdentity
 from src.services.logging_service import log_client_action
+from src.services.ingest_service import (
+    location_rows, insert_location, bulk_insert_locations, get_idempotent_response,
+    iter_ndjson_lines, stream_insert_locations
+)
+from src.services.columnar_batch import columnar_location_rows
+from src.services.binary_codec import decode_location_batch, BinaryFormatError
+from src.services.client_stats import get_client_stats, estimate_count
+from src.services.latest_locations import get_latest_location as get_stored_latest_location, get_fleet_latest_locations
+from src.services.pagination import encode_cursor, decode_page_cursor, before_cursor, InvalidCursorError
+from src.services.rate_limiter import TokenBucketLimiter, single_ingest_limiter, batch_ingest_limiter, RATE_LIMIT_ENABLED
+from src.services.ingest_queue import ingest_queue, QueueFullError, INGEST_DURABILITY
+from src.services.fast_json import fast_response
 
 # Router
 router = APIRouter()
 
+# Columns of a LocationResponse; list endpoints select these instead of Location entities
+LOCATION_RESPONSE_COLUMNS = (
+    Location.id, Location.latitude, Location.longitude, Location.accuracy,
+    Location.altitude, Location.speed, Location.timestamp, Location.created_at
+)
+
+# Rate limiting
+def rate_limited(limiter: TokenBucketLimiter):
+    """Dependency enforcing a per-client token bucket; answers 429 with Retry-After when empty"""
+    async def check_rate_limit(current_client: ClientIdentity = Depends(get_current_client)):
+        if not RATE_LIMIT_ENABLED:
+            return
+        retry_after = limiter.acquire(current_client.id)
+        if retry_after:
+            # A bucket that never refills (rate 0) has no time to retry after
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(math.ceil(retry_after))} if math.isfinite(retry_after) else None
+            )
+    return Depends(check_rate_limit)
+
 # Endpoints
-@router.post("", response_model=dict, status_code=status.HTTP_201_CREATED)
+@router.post("", response_model=dict, status_code=status.HTTP_201_CREATED,
+             dependencies=[rate_limited(single_ingest_limiter)])
 async def create_location(
     location: LocationCreate,
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
-    # Create new location with separate latitude and longitude fields
-    db_location = Location(
-        client_id=current_client.id,
-        latitude=location.latitude,
-        longitude=location.longitude,
-        accuracy=location.accuracy,
-        altitude=location.altitude,
-        speed=location.speed,
-        timestamp=location.timestamp
-    )
+    # Hand the point to the write-behind queue when group commit is enabled
+    if ingest_queue.running:
+        try:
+            future = ingest_queue.enqueue(location_rows(current_client.id, [location])[0])
+        except QueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Ingest queue is full, retry later"
+            )
+        
+        if INGEST_DURABILITY == "enqueue":
+            response.status_code = status.HTTP_202_ACCEPTED
+            return {
+                "id": None,
+                "received_at": datetime.now().isoformat()
+            }
+        
+        try:
+            location_id, created = await future
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Failed to store location, retry later"
+            )
+        
+        return {
+            "id": location_id,
+            "duplicate": not created,
+            "received_at": datetime.now().isoformat()
+        }
     
-    db.add(db_location)
-    db.commit()
-    db.refresh(db_location)
+    # Insert the location unless this timestamp was already stored (client retry)
+    location_id, created = await insert_location(db, location_rows(current_client.id, [location])[0])
     
-    # Log location submission
-    log_client_action(db, current_client.id, "location_submit", {
-        "location_id": db_location.id,
-        "timestamp": location.timestamp.isoformat()
-    })
+    # Log location submission in the same transaction
+    if created:
+        await log_client_action(db, current_client.id, "location_submit", {
+            "location_id": location_id,
+            "timestamp": location.timestamp.isoformat()
+        }, commit=False)
+    await db.commit()
     
     return {
-        "id": db_location.id,
+        "id": location_id,
+        "duplicate": not created,
         "received_at": datetime.now().isoformat()
     }
 
-@router.post("/batch", response_model=dict, status_code=status.HTTP_201_CREATED)
+@router.post("/batch", response_model=dict, status_code=status.HTTP_201_CREATED,
+             dependencies=[rate_limited(batch_ingest_limiter)])
 async def create_batch_locations(
     batch: LocationBatchCreate,
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
-    # Create locations
-    db_locations = []
-    for location in batch.locations:
-        # Create new location with separate latitude and longitude fields
-        db_location = Location(
-            client_id=current_client.id,
-            latitude=location.latitude,
-            longitude=location.longitude,
-            accuracy=location.accuracy,
-            altitude=location.altitude,
-            speed=location.speed,
-            timestamp=location.timestamp
+    # Replay the original response for a retried batch
+    replay = await get_idempotent_response(db, current_client.id, idempotency_key)
+    if replay is not None:
+        return replay
+    
+    # Bulk insert locations and the batch audit row in one transaction
+    rows = location_rows(current_client.id, batch.locations)
+    return await bulk_insert_locations(db, current_client.id, rows, idempotency_key=idempotency_key)
+
+@router.post("/batch/columnar", response_model=dict, status_code=status.HTTP_201_CREATED,
+             dependencies=[rate_limited(batch_ingest_limiter)])
+async def create_columnar_batch_locations(
+    batch: LocationColumnarBatchCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
+):
+    """
+    Ingest a batch sent as parallel arrays (timestamps in epoch milliseconds).
+
+    Points failing validation are skipped and reported by index; the rest are stored.
+    """
+    # Replay the original response for a retried batch
+    replay = await get_idempotent_response(db, current_client.id, idempotency_key)
+    if replay is not None:
+        return replay
+    
+    try:
+        rows, rejected_count, errors = columnar_location_rows(current_client.id, batch)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
         )
-        
-        db_locations.append(db_location)
     
-    db.add_all(db_locations)
-    db.commit()
+    # Bulk insert locations and the batch audit row in one transaction
+    return await bulk_insert_locations(
+        db, current_client.id, rows,
+        idempotency_key=idempotency_key,
+        response_extra={"rejected_count": rejected_count, "errors": errors}
+    )
+
+@router.post("/batch/binary", response_model=dict, status_code=status.HTTP_201_CREATED,
+             dependencies=[rate_limited(batch_ingest_limiter)])
+async def create_binary_batch_locations(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
+):
+    """
+    Ingest a batch in the compact binary format (see services/binary_codec.py).
+
+    Send the encoded batch as the raw body with Content-Type application/octet-stream.
+    """
+    # Replay the original response for a retried batch
+    replay = await get_idempotent_response(db, current_client.id, idempotency_key)
+    if replay is not None:
+        return replay
     
-    # Log batch location submission
-    log_client_action(db, current_client.id, "location_batch_submit", {
-        "count": len(batch.locations),
-        "timestamp": datetime.now().isoformat()
-    })
+    try:
+        rows = decode_location_batch(await request.body(), current_client.id)
+    except BinaryFormatError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    
+    # Bulk insert locations and the batch audit row in one transaction
+    return await bulk_insert_locations(db, current_client.id, rows, idempotency_key=idempotency_key)
+
+@router.post("/stream", response_model=dict, status_code=status.HTTP_201_CREATED,
+             dependencies=[rate_limited(batch_ingest_limiter)])
+async def create_stream_locations(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
+):
+    """
+    Ingest newline-delimited JSON locations (one LocationCreate per line).
+
+    The body may be gzip-compressed (Content-Encoding: gzip). It is parsed
+    incrementally and written in fixed-size chunks, so memory stays flat
+    regardless of upload size.
+    """
+    gzip = request.headers.get("content-encoding", "").lower() == "gzip"
+    lines = iter_ndjson_lines(request.stream(), gzip=gzip)
+    result = await stream_insert_locations(db, current_client.id, lines)
+    
+    if result["stream_error"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": result["stream_error"],
+                "accepted_count": result["accepted_count"],
+                "rejected_count": result["rejected_count"]
+            }
+        )
     
     return {
-        "received_count": len(batch.locations),
+        "accepted_count": result["accepted_count"],
+        "new_count": result["new_count"],
+        "duplicate_count": result["duplicate_count"],
+        "rejected_count": result["rejected_count"],
+        "errors": result["errors"],
         "received_at": datetime.now().isoformat()
     }
 
+@router.get("/latest", response_model=FleetLatestResponse)
+async def get_fleet_latest(
+    active_only: bool = True,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_admin_client)
+):
+    # Where every client is now, read from the materialized latest locations; admin clients only
+    latest = await get_fleet_latest_locations(db, active_only)
+    return FleetLatestResponse(
+        total_count=len(latest),
+        locations=[ClientLatestLocationResponse(**row._mapping) for row in latest]
+    )
+
 @router.get("/{client_id}", response_model=LocationsResponse)
 async def get_client_locations(
     client_id: str,
@@ -90,11 +243,21 @@ async def get_client_locations(
     end_time: Optional[datetime] = None,
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    cursor: Optional[str] = None,
+    approximate_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
+    try:
+        position = decode_page_cursor(cursor, offset)
+    except InvalidCursorError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -109,48 +272,49 @@ async def get_client_locations(
             detail="Not authorized to access this client's locations"
         )
     
-    # Build query
-    query = db.query(Location).filter(Location.client_id == client_id)
+    # Build filters
+    filters = [Location.client_id == client_id]
     
     if start_time:
-        query = query.filter(Location.timestamp >= start_time)
+        filters.append(Location.timestamp >= start_time)
     
     if end_time:
-        query = query.filter(Location.timestamp <= end_time)
-    
-    # Get total count
-    total_count = query.count()
-    
-    # Get paginated results
-    locations = query.order_by(Location.timestamp.desc()).offset(offset).limit(limit).all()
-    
-    # Convert to response model
-    location_responses = []
-    for loc in locations:
-        location_responses.append(LocationResponse(
-            id=loc.id,
-            latitude=loc.latitude,
-            longitude=loc.longitude,
-            accuracy=loc.accuracy,
-            altitude=loc.altitude,
-            speed=loc.speed,
-            timestamp=loc.timestamp,
-            created_at=loc.created_at
-        ))
-    
-    return LocationsResponse(
-        total_count=total_count,
-        locations=location_responses
+        filters.append(Location.timestamp <= end_time)
+    
+    # Get total count from the client stats when unfiltered or an estimate is enough
+    if (start_time or end_time) and not approximate_total:
+        total_count = await db.scalar(select(func.count()).select_from(Location).where(*filters))
+    else:
+        stats = await get_client_stats(db, client_id)
+        total_count = estimate_count(
+            stats.location_count, stats.first_location_at, stats.last_location_at, start_time, end_time
+        ) if stats else 0
+    
+    # Get paginated results, seeking past the cursor when one is given
+    page_filters = filters + [before_cursor(Location.timestamp, Location.id, position)] if position else filters
+    result = await db.execute(
+        select(*LOCATION_RESPONSE_COLUMNS).where(*page_filters)
+        .order_by(Location.timestamp.desc(), Location.id.desc()).offset(offset).limit(limit)
     )
+    locations = result.all()
+    
+    # Convert rows to the response model directly; no ORM entities are built
+    location_responses = [LocationResponse(**row._mapping) for row in locations]
+    
+    return fast_response(LocationsResponse(
+        total_count=total_count,
+        locations=location_responses,
+        next_cursor=encode_cursor(locations[-1].timestamp, locations[-1].id) if len(locations) == limit else None
+    ))
 
 @router.get("/{client_id}/latest", response_model=LocationResponse)
 async def get_latest_location(
     client_id: str,
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -166,9 +330,7 @@ async def get_latest_location(
         )
     
     # Get latest location
-    location = db.query(Location).filter(
-        Location.client_id == client_id
-    ).order_by(Location.timestamp.desc()).first()
+    location = await get_stored_latest_location(db, client_id)
     
     if not location:
         raise HTTPException(
@@ -176,13 +338,4 @@ async def get_latest_location(
             detail="No locations found for this client"
         )
     
-    return LocationResponse(
-        id=location.id,
-        latitude=location.latitude,
-        longitude=location.longitude,
-        accuracy=location.accuracy,
-        altitude=location.altitude,
-        speed=location.speed,
-        timestamp=location.timestamp,
-        created_at=location.created_at
-    )
+    return LocationResponse(**location._mapping)
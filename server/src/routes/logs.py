@@ -1,18 +1,105 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime
-import json
+from datetime import datetime, timedelta
 
-from src.database import get_db
-from src.models.models import ClientLog, Client
-from src.models.schemas import ClientLogResponse, ClientLogsResponse
-from src.routes.auth import get_current_client
+from src.database import get_async_db
+from src.models.models import Client
+from src.models.schemas import ClientLogResponse, ClientLogsResponse, LogActionCount, LogAggregateResponse
+from src.routes.auth import get_current_client, get_admin_client
+from src.services.client_cache import ClientIdentity
+from src.services.log_partitions import client_log_source
+from src.services.log_aggregates import aggregate_client_logs, TooManyBucketsError
+from src.services.client_stats import get_client_stats, estimate_count
+from src.services.pagination import encode_cursor, decode_page_cursor, before_cursor, InvalidCursorError
+from src.services.fast_json import fast_response
 
 # Router
 router = APIRouter()
 
+# Default time range per bucket size when start_time is omitted
+DEFAULT_AGGREGATE_SPANS = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30),
+}
+
+async def build_aggregate_response(
+    db: AsyncSession,
+    client_id: Optional[str],
+    bucket: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    action: Optional[str]
+) -> LogAggregateResponse:
+    end_time = end_time or datetime.utcnow()
+    start_time = start_time or end_time - DEFAULT_AGGREGATE_SPANS[bucket]
+    if start_time > end_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_time must not be after end_time"
+        )
+
+    try:
+        range_start, range_end, rows = await aggregate_client_logs(db, client_id, bucket, start_time, end_time, action)
+    except TooManyBucketsError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+    return LogAggregateResponse(
+        client_id=client_id,
+        bucket=bucket,
+        start_time=range_start,
+        end_time=range_end,
+        counts=[
+            LogActionCount(bucket_start=bucket_start, action=row_action, count=count)
+            for bucket_start, row_action, count in rows
+        ]
+    )
+
 # Endpoints
+@router.get("/aggregate", response_model=LogAggregateResponse)
+async def get_fleet_log_aggregate(
+    bucket: str = Query("hour", pattern="^(minute|hour|day)$"),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    action: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_admin_client)
+):
+    # Counts per action per bucket across all clients; admin clients only
+    return await build_aggregate_response(db, None, bucket, start_time, end_time, action)
+
+@router.get("/{client_id}/aggregate", response_model=LogAggregateResponse)
+async def get_client_log_aggregate(
+    client_id: str,
+    bucket: str = Query("hour", pattern="^(minute|hour|day)$"),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    action: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
+):
+    # Check if client exists
+    client = await db.get(Client, client_id)
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Client not found"
+        )
+    
+    # Check permissions (only allow access to own logs unless admin)
+    if current_client.id != client_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this client's logs"
+        )
+    
+    return await build_aggregate_response(db, client_id, bucket, start_time, end_time, action)
+
 @router.get("/{client_id}", response_model=ClientLogsResponse)
 async def get_client_logs(
     client_id: str,
@@ -21,11 +108,21 @@ async def get_client_logs(
     action: Optional[str] = None,
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    cursor: Optional[str] = None,
+    approximate_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
+    try:
+        position = decode_page_cursor(cursor, offset)
+    except InvalidCursorError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,37 +137,61 @@ async def get_client_logs(
             detail="Not authorized to access this client's logs"
         )
     
-    # Build query
-    query = db.query(ClientLog).filter(ClientLog.client_id == client_id)
+    # Build filters
+    def build_filters(logs_table):
+        filters = [logs_table.c.client_id == client_id]
+        
+        if start_time:
+            filters.append(logs_table.c.timestamp >= start_time)
+        
+        if end_time:
+            filters.append(logs_table.c.timestamp <= end_time)
+        
+        if action:
+            filters.append(logs_table.c.action == action)
+        
+        return filters
     
-    if start_time:
-        query = query.filter(ClientLog.timestamp >= start_time)
-    
-    if end_time:
-        query = query.filter(ClientLog.timestamp <= end_time)
-    
-    if action:
-        query = query.filter(ClientLog.action == action)
+    def build_page(logs_table):
+        filters = build_filters(logs_table)
+        if position:
+            filters.append(before_cursor(logs_table.c.timestamp, logs_table.c.id, position))
+        return (
+            select(logs_table).where(*filters)
+            .order_by(logs_table.c.timestamp.desc(), logs_table.c.id.desc())
+        )
     
-    # Get total count
-    total_count = query.count()
+    # Get total count from the client stats when unfiltered or an estimate is enough,
+    # otherwise count only the partitions that overlap the requested time range
+    if action or ((start_time or end_time) and not approximate_total):
+        logs_table = await client_log_source(db, start_time, end_time)
+        total_count = await db.scalar(select(func.count()).select_from(logs_table).where(*build_filters(logs_table)))
+    else:
+        stats = await get_client_stats(db, client_id)
+        total_count = estimate_count(
+            stats.log_count, stats.first_log_at, stats.last_log_at, start_time, end_time
+        ) if stats else 0
     
-    # Get paginated results
-    logs = query.order_by(ClientLog.timestamp.desc()).offset(offset).limit(limit).all()
+    # Get paginated results, seeking past the cursor when one is given
+    page_table = await client_log_source(
+        db, start_time, end_time, branch=lambda table: build_page(table).limit(offset + limit)
+    )
+    result = await db.execute(build_page(page_table).offset(offset).limit(limit))
+    logs = result.all()
     
-    # Convert JSON strings to dictionaries for response
+    # Convert to response model
     log_responses = []
     for log in logs:
-        details = json.loads(log.details) if log.details else None
         log_responses.append(ClientLogResponse(
             id=log.id,
             client_id=log.client_id,
             action=log.action,
-            details=details,
+            details=log.details,
             timestamp=log.timestamp
         ))
     
-    return ClientLogsResponse(
+    return fast_response(ClientLogsResponse(
         total_count=total_count,
-        logs=log_responses
-    )
+        logs=log_responses,
+        next_cursor=encode_cursor(logs[-1].timestamp, logs[-1].id) if len(logs) == limit else None
+    ))
@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
-from fastapi.responses import JSONResponse, HTMLResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from datetime import datetime
-import json
+import numpy as np
 from fastapi.templating import Jinja2Templates
 
-from src.database import get_db
+from src.database import get_async_db
 from src.models.models import Location, Client
 from src.models.schemas import RouteResponse, RoutePoint, GeoJSONResponse, GeoJSONFeature, GeoJSONLineString
 from src.routes.auth import get_current_client
+from src.services.client_cache import ClientIdentity
+from src.services.route_simplify import simplify_route, ROUTE_SIMPLIFY_MAX_POINTS
+from src.services.route_stream import open_route_stream
+from src.services.route_levels import read_route_level, timestamps as level_timestamps
+from src.services.fast_json import fast_response
 
 # Router
 router = APIRouter()
@@ -18,18 +24,22 @@ router = APIRouter()
 templates = Jinja2Templates(directory="src/templates")
 
 # Endpoints
-@router.get("/{client_id}", response_model=GeoJSONResponse)
+@router.get("/{client_id}", response_model=Union[GeoJSONResponse, RouteResponse])
 async def get_route_data(
     client_id: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-    simplify: bool = True,
-    format: str = Query("geojson", regex="^(geojson|json)$"),
-    db: Session = Depends(get_db),
-    current_client: Client = Depends(get_current_client)
+    simplify: str = Query("true", pattern="(?i)^(true|false|yes|no|on|off|1|0|dp|vw)$"),
+    tolerance_m: Optional[float] = Query(None, ge=0),
+    max_points: Optional[int] = Query(None, ge=2),
+    zoom: Optional[int] = Query(None, ge=0, le=24),
+    format: str = Query("geojson", pattern="^(geojson|json)$"),
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_client: ClientIdentity = Depends(get_current_client)
 ):
     # Check if client exists
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -44,38 +54,89 @@ async def get_route_data(
             detail="Not authorized to access this client's routes"
         )
     
-    # Build query
-    query = db.query(Location).filter(Location.client_id == client_id)
+    # Stream every point of long ranges instead of loading them all
+    if stream:
+        if format != "geojson":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Streaming is only available for format=geojson"
+            )
+        body = await open_route_stream(client_id, start_time, end_time)
+        if body is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No locations found for this client in the specified time range"
+            )
+        return StreamingResponse(body, media_type="application/json")
     
-    if start_time:
-        query = query.filter(Location.timestamp >= start_time)
-    
-    if end_time:
-        query = query.filter(Location.timestamp <= end_time)
+    simplify = simplify.lower()
     
-    # Order by timestamp
-    query = query.order_by(Location.timestamp)
+    # Keep default responses bounded, as if the budget had been requested
+    if simplify not in ("false", "no", "off", "0") and tolerance_m is None and max_points is None and zoom is None:
+        max_points = ROUTE_SIMPLIFY_MAX_POINTS
     
-    # Get locations
-    locations = query.all()
+    # Range filters shared by the point count and the raw query
+    filters = [Location.client_id == client_id]
+    if start_time:
+        filters.append(Location.timestamp >= start_time)
+    if end_time:
+        filters.append(Location.timestamp <= end_time)
     
-    if not locations:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No locations found for this client in the specified time range"
-        )
+    # Serve zoomed out views and point budgets from the precomputed route levels
+    level = None
+    use_levels = (zoom is not None or max_points is not None) and simplify in ("true", "yes", "on", "1", "dp") and tolerance_m is None
+    if use_levels and zoom is None:
+        # A budget the raw range already fits is served from the raw locations; counting
+        # stops at max_points + 1 rows, so long ranges cost no more than short ones
+        in_budget = select(Location.id).where(*filters).limit(max_points + 1).subquery()
+        use_levels = await db.scalar(select(func.count()).select_from(in_budget)) > max_points
+    if use_levels:
+        level = await read_route_level(db, client_id, start_time, end_time, zoom=zoom, max_points=max_points)
     
-    # Simplify route if requested
-    if simplify and len(locations) > 100:
-        # Simple downsampling for demonstration
-        # In a real app, you might use Douglas-Peucker or other algorithms
-        step = len(locations) // 100
-        locations = locations[::step]
+    if level is not None:
+        level_tolerance, points, original_count = level
+        if max_points is not None and len(points) > max_points:
+            points = points[simplify_route(points[:, 1], points[:, 0], max_points=max_points)]
+        longitudes = points[:, 0].tolist()
+        latitudes = points[:, 1].tolist()
+        timestamps = level_timestamps(points)
+    else:
+        level_tolerance = None
+        
+        # Build query; only the columns a route needs, as plain rows
+        query = select(Location.longitude, Location.latitude, Location.timestamp).where(*filters)
+        
+        # Order by timestamp
+        query = query.order_by(Location.timestamp)
+        
+        # Get locations
+        result = await db.execute(query)
+        rows = result.all()
+        
+        if not rows:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No locations found for this client in the specified time range"
+            )
+        
+        longitudes, latitudes, timestamps = zip(*rows)
+        
+        # Simplify route if requested; boolean values keep working, true meaning dp
+        original_count = len(rows)
+        if simplify not in ("false", "no", "off", "0") and len(rows) > 2:
+            kept = simplify_route(
+                np.array(latitudes, dtype=np.float64),
+                np.array(longitudes, dtype=np.float64),
+                method="vw" if simplify == "vw" else "dp",
+                tolerance_m=tolerance_m,
+                max_points=max_points
+            ).tolist()
+            longitudes = [longitudes[index] for index in kept]
+            latitudes = [latitudes[index] for index in kept]
+            timestamps = [timestamps[index] for index in kept]
     
     # Extract coordinates
-    coordinates = []
-    for loc in locations:
-        coordinates.append([loc.longitude, loc.latitude])  # [longitude, latitude]
+    coordinates = [[longitude, latitude] for longitude, latitude in zip(longitudes, latitudes)]  # [longitude, latitude]
     
     # Create GeoJSON response
     if format == "geojson":
@@ -83,26 +144,25 @@ async def get_route_data(
             geometry=GeoJSONLineString(coordinates=coordinates),
             properties={
                 "client_id": str(client_id),
-                "start_time": locations[0].timestamp.isoformat() if locations else None,
-                "end_time": locations[-1].timestamp.isoformat() if locations else None,
-                "point_count": len(locations)
+                "start_time": timestamps[0].isoformat(),
+                "end_time": timestamps[-1].isoformat(),
+                "point_count": len(coordinates),
+                "original_point_count": original_count,
+                "level_tolerance_m": level_tolerance
             }
         )
         
-        return GeoJSONResponse(features=[feature])
+        return fast_response(GeoJSONResponse(features=[feature]))
     else:
         # JSON format
-        route_points = []
-        for loc in locations:
-            route_points.append(RoutePoint(
-                latitude=loc.latitude,
-                longitude=loc.longitude,
-                timestamp=loc.timestamp
-            ))
+        route_points = [
+            RoutePoint(latitude=latitude, longitude=longitude, timestamp=timestamp)
+            for longitude, latitude, timestamp in zip(longitudes, latitudes, timestamps)
+        ]
         
-        return RouteResponse(
+        return fast_response(RouteResponse(
             client_id=client_id,
-            start_time=locations[0].timestamp if locations else None,
-            end_time=locations[-1].timestamp if locations else None,
+            start_time=timestamps[0],
+            end_time=timestamps[-1],
             points=route_points
-        )
+        ))
@@ -0,0 +1,97 @@
+from sqlalchemy import update, bindparam, or_
+from typing import Dict, Optional
+from datetime import datetime
+import asyncio
+import logging
+import os
+
+from src.database import AsyncSessionLocal
+from src.models.models import Client
+
+logger = logging.getLogger(__name__)
+
+# How often coalesced last_active values are written to the clients table
+ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_SECONDS", "5"))
+
+class ClientActivityTracker:
+    """
+    Coalesces client activity into periodic last_active updates
+
+    touch() only records the time in an in-memory map, so authenticated
+    requests and ingest do not write to clients. A background task writes the
+    latest time per client with one executemany UPDATE every flush_interval
+    seconds; stop() writes whatever is still pending. last_active never moves
+    backwards, so flushes from several server workers can interleave safely.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, flush_interval: float = ACTIVITY_FLUSH_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._last_seen: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def touch(self, client_id: str, when: datetime = None):
+        self._last_seen[client_id] = when or datetime.utcnow()
+
+    async def start(self):
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and write everything still pending"""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush client activity")
+
+    async def flush(self) -> int:
+        """
+        Write pending last_active values
+
+        Returns:
+            Number of clients written
+        """
+        if not self._last_seen:
+            return 0
+        pending, self._last_seen = self._last_seen, {}
+
+        table = Client.__table__
+        statement = update(table).where(
+            table.c.id == bindparam("client_id"),
+            or_(table.c.last_active.is_(None), table.c.last_active < bindparam("seen_at"))
+        ).values(last_active=bindparam("seen_at"))
+
+        async with self.session_factory() as db:
+            try:
+                await db.execute(statement, [
+                    {"client_id": client_id, "seen_at": seen_at}
+                    for client_id, seen_at in pending.items()
+                ])
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                # Keep the values for the next flush unless newer ones arrived meanwhile
+                for client_id, seen_at in pending.items():
+                    self._last_seen.setdefault(client_id, seen_at)
+                raise
+        return len(pending)
+
+# Shared tracker, started from the application lifespan
+activity_tracker = ClientActivityTracker()
@@ -0,0 +1,172 @@
+"""
+Compact binary location batch format (version 1)
+
+All values are little-endian. A batch is a fixed header followed by columns:
+
+    header      magic "GELB", version u8, flags u8 (0), reserved u16 (0),
+                count u32, base timestamp i64 (epoch milliseconds, UTC)
+    deltas      count x i32   milliseconds since the previous point
+                              (the first point is relative to the base)
+    latitudes   count x i32   degrees x 1e7
+    longitudes  count x i32   degrees x 1e7
+    accuracies  count x f32   meters
+    altitude    ceil(count / 8) bytes   presence bitmap, bit i = point i
+    speed       ceil(count / 8) bytes   presence bitmap
+    altitudes   f32 per set altitude bit, in point order
+    speeds      f32 per set speed bit, in point order
+
+A point costs 16 bytes plus 4 bytes per optional value, against roughly
+130 bytes for the equivalent JSON object.
+"""
+
+from typing import Dict, Any, Iterable, List, Tuple
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+import struct
+
+from src.services.columnar_batch import MIN_TIMESTAMP_MS, MAX_TIMESTAMP_MS
+
+MAGIC = b"GELB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHIq")
+COORDINATE_SCALE = 10_000_000
+MAX_BATCH_POINTS = 1_000_000
+
+EPOCH = datetime(1970, 1, 1)
+
+class BinaryFormatError(ValueError):
+    """Raised when a binary batch is malformed or contains invalid points"""
+
+def _epoch_ms(timestamp: datetime) -> int:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return (timestamp - EPOCH) // timedelta(milliseconds=1)
+
+def _pack_bitmap(flags: List[bool]) -> bytes:
+    bitmap = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            bitmap[index >> 3] |= 1 << (index & 7)
+    return bytes(bitmap)
+
+def _unpack_bitmap(bitmap: bytes, count: int) -> List[bool]:
+    return [bool(bitmap[index >> 3] & (1 << (index & 7))) for index in range(count)]
+
+def encode_location_batch(locations: Iterable[Dict[str, Any]]) -> bytes:
+    """
+    Reference encoder for the binary batch format
+
+    Args:
+        locations: Dictionaries with latitude, longitude, accuracy, timestamp
+            (datetime) and optional altitude and speed
+
+    Returns:
+        Encoded batch
+    """
+    locations = list(locations)
+    count = len(locations)
+    times = [_epoch_ms(location["timestamp"]) for location in locations]
+    base = times[0] if times else 0
+    deltas = [later - earlier for earlier, later in zip([base] + times, times)]
+    altitudes = [location.get("altitude") for location in locations]
+    speeds = [location.get("speed") for location in locations]
+    present_altitudes = [value for value in altitudes if value is not None]
+    present_speeds = [value for value in speeds if value is not None]
+
+    return b"".join([
+        HEADER.pack(MAGIC, VERSION, 0, 0, count, base),
+        struct.pack(f"<{count}i", *deltas),
+        struct.pack(f"<{count}i", *(round(location["latitude"] * COORDINATE_SCALE) for location in locations)),
+        struct.pack(f"<{count}i", *(round(location["longitude"] * COORDINATE_SCALE) for location in locations)),
+        struct.pack(f"<{count}f", *(location["accuracy"] for location in locations)),
+        _pack_bitmap([value is not None for value in altitudes]),
+        _pack_bitmap([value is not None for value in speeds]),
+        struct.pack(f"<{len(present_altitudes)}f", *present_altitudes),
+        struct.pack(f"<{len(present_speeds)}f", *present_speeds),
+    ])
+
+def _read(data: bytes, offset: int, fmt: str, count: int) -> Tuple[tuple, int]:
+    size = struct.calcsize(f"<{count}{fmt}")
+    if offset + size > len(data):
+        raise BinaryFormatError("Batch is truncated")
+    return struct.unpack_from(f"<{count}{fmt}", data, offset), offset + size
+
+def decode_location_batch(data: bytes, client_id: str) -> List[Dict[str, Any]]:
+    """
+    Decode a binary batch straight into location rows for bulk insert
+
+    Applies the same range checks as LocationCreate; any invalid point
+    rejects the whole batch, as with the JSON batch endpoint.
+
+    Args:
+        data: Encoded batch
+        client_id: UUID of the client the rows belong to
+
+    Returns:
+        Parameter dictionaries as produced by ingest_service.location_rows()
+
+    Raises:
+        BinaryFormatError: The batch is malformed or a point is out of range
+    """
+    if len(data) < HEADER.size:
+        raise BinaryFormatError("Batch is truncated")
+    magic, version, _, _, count, base = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise BinaryFormatError("Not a binary location batch")
+    if version != VERSION:
+        raise BinaryFormatError(f"Unsupported batch version {version}")
+    if count > MAX_BATCH_POINTS:
+        raise BinaryFormatError(f"Batch exceeds {MAX_BATCH_POINTS} points")
+
+    offset = HEADER.size
+    deltas, offset = _read(data, offset, "i", count)
+    latitudes, offset = _read(data, offset, "i", count)
+    longitudes, offset = _read(data, offset, "i", count)
+    accuracies, offset = _read(data, offset, "f", count)
+    bitmap_size = (count + 7) // 8
+    altitude_bitmap, offset = _read(data, offset, "B", bitmap_size)
+    speed_bitmap, offset = _read(data, offset, "B", bitmap_size)
+    has_altitude = _unpack_bitmap(altitude_bitmap, count)
+    has_speed = _unpack_bitmap(speed_bitmap, count)
+    altitude_values, offset = _read(data, offset, "f", sum(has_altitude))
+    speed_values, offset = _read(data, offset, "f", sum(has_speed))
+    if offset != len(data):
+        raise BinaryFormatError("Unexpected trailing bytes")
+
+    lat_limit = 90 * COORDINATE_SCALE
+    lon_limit = 180 * COORDINATE_SCALE
+    if count and not -lat_limit <= min(latitudes) <= max(latitudes) <= lat_limit:
+        index = next(i for i, value in enumerate(latitudes) if not -lat_limit <= value <= lat_limit)
+        raise BinaryFormatError(f"Point {index}: latitude out of range")
+    if count and not -lon_limit <= min(longitudes) <= max(longitudes) <= lon_limit:
+        index = next(i for i, value in enumerate(longitudes) if not -lon_limit <= value <= lon_limit)
+        raise BinaryFormatError(f"Point {index}: longitude out of range")
+    if not all(accuracy > 0 for accuracy in accuracies):
+        index = next(i for i, value in enumerate(accuracies) if not value > 0)
+        raise BinaryFormatError(f"Point {index}: accuracy must be greater than 0")
+
+    times = [base + offset_ms for offset_ms in accumulate(deltas)]
+    if count and not MIN_TIMESTAMP_MS <= min(times) <= max(times) <= MAX_TIMESTAMP_MS:
+        index = next(i for i, value in enumerate(times) if not MIN_TIMESTAMP_MS <= value <= MAX_TIMESTAMP_MS)
+        raise BinaryFormatError(f"Point {index}: timestamp out of range")
+
+    altitude_iter = iter(altitude_values)
+    speed_iter = iter(speed_values)
+    altitudes = [next(altitude_iter) if present else None for present in has_altitude]
+    speeds = [next(speed_iter) if present else None for present in has_speed]
+    timestamps = [EPOCH + timedelta(milliseconds=time_ms) for time_ms in times]
+    created_at = datetime.utcnow()
+    return [
+        {
+            "client_id": client_id,
+            "latitude": latitude / COORDINATE_SCALE,
+            "longitude": longitude / COORDINATE_SCALE,
+            "accuracy": accuracy,
+            "altitude": altitude,
+            "speed": speed,
+            "timestamp": timestamp,
+            "created_at": created_at,
+        }
+        for latitude, longitude, accuracy, altitude, speed, timestamp
+        in zip(latitudes, longitudes, accuracies, altitudes, speeds, timestamps)
+    ]
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+import os
+import time
+
+# Authentication cache settings; a TTL of 0 disables the cache
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+@dataclass(frozen=True)
+class ClientIdentity:
+    """Authenticated client as seen by request handlers"""
+    id: str
+    name: str
+    is_active: bool
+
+class ClientIdentityCache:
+    """
+    In-process LRU cache of resolved client identities with a TTL
+
+    Lets get_current_client skip the clients lookup for repeat requests.
+    Entries expire after ttl_seconds and the least recently used entry is
+    evicted above max_entries. Endpoints that change a client must call
+    invalidate(); other server workers see the change once their entry expires.
+    """
+
+    def __init__(self, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, ClientIdentity]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, client_id: str) -> Optional[ClientIdentity]:
+        entry = self._entries.get(client_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[client_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(client_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, identity: ClientIdentity):
+        if not self.enabled:
+            return
+        self._entries[identity.id] = (time.monotonic() + self.ttl_seconds, identity)
+        self._entries.move_to_end(identity.id)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, client_id: str):
+        self._entries.pop(client_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Shared cache used by get_current_client
+client_identity_cache = ClientIdentityCache()
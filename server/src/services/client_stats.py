@@ -0,0 +1,182 @@
+from sqlalchemy import select, func, case, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from datetime import datetime
+import calendar
+
+from src.database import dialect_insert
+from src.models.models import ClientStats, Location
+
+def _summarize(points: Iterable[Tuple[str, datetime]]) -> List[Dict[str, Any]]:
+    summary: Dict[str, List] = {}
+    for client_id, timestamp in points:
+        entry = summary.get(client_id)
+        if entry is None:
+            summary[client_id] = [1, timestamp, timestamp]
+        else:
+            entry[0] += 1
+            entry[1] = min(entry[1], timestamp)
+            entry[2] = max(entry[2], timestamp)
+    # Fixed order so concurrent writers lock stats rows in the same sequence
+    return [
+        {"client_id": client_id, "count": count, "first": first, "last": last}
+        for client_id, (count, first, last) in sorted(summary.items())
+    ]
+
+async def _record(db: AsyncSession, kind: str, points: Iterable[Tuple[str, datetime]]):
+    rows = _summarize(points)
+    if not rows:
+        return
+
+    table = ClientStats.__table__
+    count_column = table.c[f"{kind}_count"]
+    first_column = table.c[f"first_{kind}_at"]
+    last_column = table.c[f"last_{kind}_at"]
+    statement = dialect_insert(db, table)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.client_id],
+        set_={
+            count_column.name: count_column + excluded[count_column.name],
+            first_column.name: case(
+                (or_(first_column.is_(None), excluded[first_column.name] < first_column), excluded[first_column.name]),
+                else_=first_column
+            ),
+            last_column.name: case(
+                (or_(last_column.is_(None), excluded[last_column.name] > last_column), excluded[last_column.name]),
+                else_=last_column
+            ),
+        }
+    )
+    await db.execute(statement, [
+        {
+            "client_id": row["client_id"],
+            count_column.name: row["count"],
+            first_column.name: row["first"],
+            last_column.name: row["last"],
+        }
+        for row in rows
+    ])
+
+async def record_locations(db: AsyncSession, points: Iterable[Tuple[str, datetime]]):
+    """
+    Add newly inserted locations to the client stats, inside the caller's transaction
+
+    Args:
+        db: Database session
+        points: (client_id, timestamp) of each inserted location
+    """
+    await _record(db, "location", points)
+
+async def record_logs(db: AsyncSession, points: Iterable[Tuple[str, datetime]]):
+    """
+    Add newly inserted client log rows to the client stats, inside the caller's transaction
+
+    Args:
+        db: Database session
+        points: (client_id, timestamp) of each inserted log row
+    """
+    await _record(db, "log", points)
+
+async def get_client_stats(db: AsyncSession, client_id: str) -> Optional[ClientStats]:
+    return await db.get(ClientStats, client_id)
+
+def _epoch_seconds(timestamp: datetime) -> float:
+    # Naive timestamps are UTC throughout the application
+    if timestamp.tzinfo is None:
+        return calendar.timegm(timestamp.timetuple()) + timestamp.microsecond / 1e6
+    return timestamp.timestamp()
+
+def estimate_count(
+    count: int,
+    first: Optional[datetime],
+    last: Optional[datetime],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> int:
+    """
+    Estimate how many of count rows between first and last fall in a time range
+
+    Assumes rows are spread evenly over [first, last]; used for opt-in
+    approximate totals instead of counting the filtered rows.
+    """
+    if not count or first is None or last is None:
+        return 0
+    first_seconds = _epoch_seconds(first)
+    last_seconds = _epoch_seconds(last)
+    low = max(first_seconds, _epoch_seconds(start_time)) if start_time else first_seconds
+    high = min(last_seconds, _epoch_seconds(end_time)) if end_time else last_seconds
+    if high < low:
+        return 0
+    if last_seconds <= first_seconds:
+        return count
+    return round(count * (high - low) / (last_seconds - first_seconds))
+
+async def rebuild_location_stats(db: AsyncSession):
+    """Recompute the location columns of all client stats from locations; caller commits"""
+    table = ClientStats.__table__
+    await db.execute(table.update().values(location_count=0, first_location_at=None, last_location_at=None))
+    totals = (await db.execute(
+        select(Location.client_id, func.count(), func.min(Location.timestamp), func.max(Location.timestamp))
+        .group_by(Location.client_id)
+    )).all()
+    await _write_totals(db, "location", totals)
+
+async def rebuild_log_stats(db: AsyncSession, logs_table):
+    """
+    Recompute the log columns of all client stats; caller commits
+
+    Args:
+        db: Database session
+        logs_table: Selectable over all client log partitions
+    """
+    table = ClientStats.__table__
+    await db.execute(table.update().values(log_count=0, first_log_at=None, last_log_at=None))
+    totals = (await db.execute(
+        select(logs_table.c.client_id, func.count(), func.min(logs_table.c.timestamp), func.max(logs_table.c.timestamp))
+        .group_by(logs_table.c.client_id)
+    )).all()
+    await _write_totals(db, "log", totals)
+
+async def remove_logs(db: AsyncSession, logs_table, removed: Iterable[Tuple[str, int]]):
+    """
+    Take deleted client log rows out of the client stats; caller commits
+
+    Subtracts each client's removed rows from its log count and recomputes
+    first and last log timestamps of those clients only, from the rows that
+    remain, so the cost follows the clients affected instead of the whole log.
+
+    Args:
+        db: Database session
+        logs_table: Selectable over the remaining client log partitions
+        removed: (client_id, number of rows removed) per client
+    """
+    table = ClientStats.__table__
+    for client_id, count in sorted(removed, key=lambda total: str(total[0])):
+        first, last = (await db.execute(
+            select(func.min(logs_table.c.timestamp), func.max(logs_table.c.timestamp))
+            .where(logs_table.c.client_id == client_id)
+        )).one()
+        await db.execute(table.update().where(table.c.client_id == client_id).values(
+            log_count=case((table.c.log_count > count, table.c.log_count - count), else_=0),
+            first_log_at=first,
+            last_log_at=last
+        ))
+
+async def _write_totals(db: AsyncSession, kind: str, totals):
+    if not totals:
+        return
+    table = ClientStats.__table__
+    statement = dialect_insert(db, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.client_id],
+        set_={
+            f"{kind}_count": statement.excluded[f"{kind}_count"],
+            f"first_{kind}_at": statement.excluded[f"first_{kind}_at"],
+            f"last_{kind}_at": statement.excluded[f"last_{kind}_at"],
+        }
+    )
+    await db.execute(statement, [
+        {"client_id": client_id, f"{kind}_count": count, f"first_{kind}_at": first, f"last_{kind}_at": last}
+        for client_id, count, first, last in sorted(totals, key=lambda total: str(total[0]))
+    ])
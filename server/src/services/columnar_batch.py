@@ -0,0 +1,92 @@
+from typing import Dict, Any, List, Tuple
+from datetime import datetime
+import numpy as np
+
+from src.models.schemas import LocationColumnarBatchCreate
+
+# Epoch-millisecond bounds that still convert to a Python datetime
+MIN_TIMESTAMP_MS = -62135596800000  # 0001-01-01
+MAX_TIMESTAMP_MS = 253402300799999  # 9999-12-31
+MAX_REPORTED_ERRORS = 100
+
+def _column_errors(invalid: np.ndarray, field: str, message: str) -> List[Dict[str, Any]]:
+    return [
+        {"index": int(index), "field": field, "error": message}
+        for index in np.flatnonzero(invalid)[:MAX_REPORTED_ERRORS]
+    ]
+
+def columnar_location_rows(
+    client_id: str,
+    batch: LocationColumnarBatchCreate
+) -> Tuple[List[Dict[str, Any]], int, List[Dict[str, Any]]]:
+    """
+    Validate a columnar batch with one vectorized check per column and build insert rows
+
+    Applies the same range checks as LocationCreate's Field constraints. Points
+    failing any check are dropped; the rest are returned ready for bulk insert.
+
+    Args:
+        client_id: UUID of the client
+        batch: Columnar batch payload
+
+    Returns:
+        Tuple of (rows, rejected_count, errors), where errors lists the first
+        failing indices per column
+
+    Raises:
+        ValueError: A timestamp does not fit in 64 bits
+    """
+    latitudes = np.asarray(batch.latitudes, dtype=np.float64)
+    longitudes = np.asarray(batch.longitudes, dtype=np.float64)
+    accuracies = np.asarray(batch.accuracies, dtype=np.float64)
+    try:
+        timestamps = np.asarray(batch.timestamps, dtype=np.int64)
+    except OverflowError:
+        raise ValueError("timestamps must fit in a signed 64-bit integer")
+
+    # Comparisons with NaN are False, so NaN fails every check
+    checks = [
+        (~((latitudes >= -90) & (latitudes <= 90)), "latitudes", "must be between -90 and 90"),
+        (~((longitudes >= -180) & (longitudes <= 180)), "longitudes", "must be between -180 and 180"),
+        (~(accuracies > 0), "accuracies", "must be greater than 0"),
+        (~((timestamps >= MIN_TIMESTAMP_MS) & (timestamps <= MAX_TIMESTAMP_MS)), "timestamps", "out of range"),
+    ]
+
+    invalid = np.zeros(len(latitudes), dtype=bool)
+    errors = []
+    for column_invalid, field, message in checks:
+        invalid |= column_invalid
+        errors.extend(_column_errors(column_invalid, field, message))
+
+    valid = ~invalid
+    rejected = int(invalid.sum())
+
+    altitudes = batch.altitudes if batch.altitudes is not None else [None] * len(latitudes)
+    speeds = batch.speeds if batch.speeds is not None else [None] * len(latitudes)
+    if rejected:
+        kept = np.flatnonzero(valid).tolist()
+        altitudes = [altitudes[index] for index in kept]
+        speeds = [speeds[index] for index in kept]
+
+    created_at = datetime.utcnow()
+    rows = [
+        {
+            "client_id": client_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "accuracy": accuracy,
+            "altitude": altitude,
+            "speed": speed,
+            "timestamp": timestamp,
+            "created_at": created_at,
+        }
+        for latitude, longitude, accuracy, altitude, speed, timestamp in zip(
+            latitudes[valid].tolist(),
+            longitudes[valid].tolist(),
+            accuracies[valid].tolist(),
+            altitudes,
+            speeds,
+            timestamps[valid].astype("datetime64[ms]").tolist()
+        )
+    ]
+    return rows, rejected, errors
@@ -0,0 +1,65 @@
+"""
+Fast JSON encoding for large response models
+
+FastAPI validates an endpoint's return value against its response_model
+again, converts it with jsonable_encoder and encodes it with the json
+module. For models the endpoint has just built itself that is redundant.
+fast_response() returns the model as an already encoded Response instead,
+which FastAPI passes through untouched: the model is dumped once by
+pydantic and encoded with orjson, which also formats datetimes and UUIDs.
+
+The bytes are identical to the standard path. orjson and the json module
+only disagree on when floats use exponent notation (json writes 1e-05 and
+1e+16, orjson 0.00001 and 1e16); bodies that may contain such a number,
+or that orjson cannot encode, are encoded the standard way instead.
+"""
+
+from fastapi import Response
+from pydantic import BaseModel
+from typing import Union
+import json
+import os
+
+import orjson
+
+# Set to false to serialize every response through FastAPI's standard path
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() in ("1", "true", "yes")
+
+# Digits are mapped to 0 before looking for the number forms on which orjson
+# and json.dumps disagree; a match inside a string only costs the slower path
+_DIGITS = bytes.maketrans(b"0123456789", b"0000000000")
+
+def _may_differ(body: bytes) -> bool:
+    """Whether body may contain a float that json.dumps writes differently"""
+    return b"0.0000" in body or b"0e" in body.translate(_DIGITS)
+
+def encode_model(model: BaseModel) -> bytes:
+    """Encode a model exactly like FastAPI's JSONResponse would"""
+    try:
+        body = orjson.dumps(model.model_dump(), option=orjson.OPT_UTC_Z)
+    except TypeError:
+        # A type orjson does not handle, or an integer beyond 64 bits
+        body = None
+    if body is None or _may_differ(body):
+        body = json.dumps(
+            model.model_dump(mode="json"), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+    return body
+
+class ModelResponse(Response):
+    """JSON response rendered from a trusted pydantic model without validating it again"""
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return encode_model(content)
+
+def fast_response(model: BaseModel) -> Union[ModelResponse, BaseModel]:
+    """
+    Return a model built by the endpoint itself, skipping response_model validation
+
+    The endpoint keeps its response_model for the OpenAPI schema. Only use
+    this for models constructed from already validated data.
+    """
+    if not FAST_JSON_RESPONSES:
+        return model
+    return ModelResponse(model)
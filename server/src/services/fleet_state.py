@@ -0,0 +1,136 @@
+from sqlalchemy import select, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from dataclasses import dataclass, replace
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
+import uuid
+
+from src.models.models import Client, ClientLatestLocation
+
+@dataclass(frozen=True)
+class FleetEntry:
+    """Live state of one active client; position fields are None until it reports a location"""
+    client_id: str
+    name: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    accuracy: Optional[float] = None
+    speed: Optional[float] = None
+    timestamp: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+
+class FleetState:
+    """
+    In-process map of every active client and its latest position
+
+    Seeded from clients and client_latest_location at startup, then kept
+    current by ingest and by the client endpoints, so fleet snapshots never
+    touch the database. Ingest stages position updates on the session and
+    they are applied only once that transaction commits. version changes
+    whenever the fleet does and backs the snapshot ETag. Each server worker
+    holds its own copy and only sees ingest handled by that worker.
+    """
+
+    def __init__(self):
+        self.version = 0
+        # Distinguishes versions of different processes and restarts
+        self.epoch = uuid.uuid4().hex[:8]
+        self._entries: Dict[str, FleetEntry] = {}
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.epoch}-{self.version}"'
+
+    async def seed(self, db: AsyncSession):
+        """Replace the state with the active clients and their stored latest locations"""
+        result = await db.execute(
+            select(
+                Client.id, Client.name,
+                ClientLatestLocation.latitude, ClientLatestLocation.longitude,
+                ClientLatestLocation.accuracy, ClientLatestLocation.speed,
+                ClientLatestLocation.timestamp, ClientLatestLocation.created_at
+            )
+            .outerjoin(ClientLatestLocation, ClientLatestLocation.client_id == Client.id)
+            .where(Client.is_active == True)
+        )
+        self._entries = {}
+        for client_id, name, latitude, longitude, accuracy, speed, timestamp, created_at in result.all():
+            self._entries[str(client_id)] = FleetEntry(
+                str(client_id), name, latitude, longitude, accuracy, speed,
+                _naive_utc(timestamp), _naive_utc(created_at)
+            )
+        self.version += 1
+
+    def add_client(self, client_id: str, name: str):
+        entry = self._entries.get(client_id)
+        self._entries[client_id] = FleetEntry(client_id, name) if entry is None else replace(entry, name=name)
+        self.version += 1
+
+    def remove_client(self, client_id: str):
+        if self._entries.pop(client_id, None) is not None:
+            self.version += 1
+
+    def apply(self, rows: Iterable[Dict[str, Any]]):
+        """
+        Move clients to newly stored locations
+
+        Rows older than the client's current position only refresh last_seen.
+        Clients that are not active in the state are ignored.
+        """
+        changed = False
+        for row in rows:
+            entry = self._entries.get(row["client_id"])
+            if entry is None:
+                continue
+            if entry.timestamp is None or row["timestamp"] > entry.timestamp:
+                entry = replace(
+                    entry,
+                    latitude=row["latitude"],
+                    longitude=row["longitude"],
+                    accuracy=row["accuracy"],
+                    speed=row.get("speed"),
+                    timestamp=row["timestamp"],
+                )
+            self._entries[entry.client_id] = replace(entry, last_seen=row.get("created_at") or datetime.utcnow())
+            changed = True
+        if changed:
+            self.version += 1
+
+    def stage(self, db: AsyncSession, rows: Iterable[Dict[str, Any]]):
+        """Apply rows once the transaction of db commits; dropped on rollback"""
+        db.sync_session.info.setdefault("fleet_state_rows", []).extend(rows)
+
+    def snapshot(self, bbox: Optional[Tuple[float, float, float, float]] = None) -> List[FleetEntry]:
+        """
+        Current entries, optionally only those positioned inside
+        bbox = (min longitude, min latitude, max longitude, max latitude)
+        """
+        if bbox is None:
+            return list(self._entries.values())
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return [
+            entry for entry in self._entries.values()
+            if entry.latitude is not None
+            and min_lat <= entry.latitude <= max_lat
+            and min_lon <= entry.longitude <= max_lon
+        ]
+
+def _naive_utc(timestamp: Optional[datetime]) -> Optional[datetime]:
+    # Stored values are naive UTC; callers may pass aware ones
+    if timestamp is not None and timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+# Shared state, seeded from the application lifespan
+fleet_state = FleetState()
+
+@event.listens_for(Session, "after_commit")
+def _apply_staged_rows(session):
+    rows = session.info.pop("fleet_state_rows", None)
+    if rows:
+        fleet_state.apply(rows)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_staged_rows(session):
+    session.info.pop("fleet_state_rows", None)
@@ -0,0 +1,219 @@
+from sqlalchemy import select, tuple_
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import logging
+import os
+
+from src.database import AsyncSessionLocal, dialect_insert
+from src.models.models import Location
+from src.services.ingest_service import to_naive_utc
+from src.services.logging_service import log_client_actions
+from src.services.client_stats import record_locations
+from src.services.latest_locations import record_latest_locations
+from src.services.route_levels import mark_route_buckets
+
+logger = logging.getLogger(__name__)
+
+# Ingest settings
+# INGEST_MODE: "direct" commits every point in the request, "queued" hands it to the write-behind queue
+INGEST_MODE = os.getenv("INGEST_MODE", "direct")
+# INGEST_DURABILITY: "flush" acknowledges after the point is committed, "enqueue" as soon as it is queued
+INGEST_DURABILITY = os.getenv("INGEST_DURABILITY", "flush")
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "200"))
+INGEST_FLUSH_MAX_ROWS = int(os.getenv("INGEST_FLUSH_MAX_ROWS", "1000"))
+INGEST_QUEUE_MAX_ROWS = int(os.getenv("INGEST_QUEUE_MAX_ROWS", "100000"))
+
+class QueueFullError(Exception):
+    """Raised when the write-behind queue is over its row limit"""
+
+class LocationIngestQueue:
+    """
+    Write-behind queue that group-commits single-point submissions
+
+    Points are buffered in memory and flushed by a background task every
+    flush_interval_ms milliseconds or as soon as max_rows points are pending,
+    whichever comes first. Each flush writes the points and their audit rows in
+    one transaction. enqueue() returns a future that resolves to
+    (location id, newly inserted) once the flush containing the point has
+    committed; retried points resolve to the id already stored. stop() lets
+    the worker finish its current flush and then flushes everything still
+    pending, so every future is resolved or failed.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        flush_interval_ms: int = INGEST_FLUSH_INTERVAL_MS,
+        max_rows: int = INGEST_FLUSH_MAX_ROWS,
+        max_pending: int = INGEST_QUEUE_MAX_ROWS
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and flush everything still pending"""
+        if self.running:
+            # Cancelling could interrupt a flush and lose its points; let the worker finish it instead
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+        self._task = None
+        try:
+            while self._pending:
+                await self._flush()
+        finally:
+            self._fail_pending(RuntimeError("Ingest queue stopped"))
+
+    def _fail_pending(self, exc: Exception):
+        """Fail the futures of points that will not be written, so no request waits forever"""
+        entries, self._pending = self._pending, []
+        for _, future in entries:
+            if not future.done():
+                future.set_exception(exc)
+                future.exception()
+        if entries:
+            logger.error("Dropped %d queued locations", len(entries))
+
+    def enqueue(self, row: Dict[str, Any]) -> asyncio.Future:
+        """
+        Queue a location row for the next flush
+
+        Args:
+            row: Parameter dictionary as produced by ingest_service.location_rows()
+
+        Returns:
+            Future resolving to (location id, newly inserted)
+        """
+        if len(self._pending) >= self.max_pending:
+            raise QueueFullError("Ingest queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_rows:
+            self._wakeup.set()
+        return future
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending and not self._stopping:
+                await self._flush()
+
+    async def _flush(self):
+        entries = self._pending[:self.max_rows]
+        del self._pending[:self.max_rows]
+        rows = [row for row, _ in entries]
+
+        try:
+            results = await self._write(rows)
+        except BaseException as exc:
+            if not isinstance(exc, Exception):
+                # Cancelled mid-write; keep the points for stop(), retries resolve to the stored ids
+                self._pending[:0] = entries
+                raise
+            logger.exception("Failed to flush %d queued locations", len(rows))
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(exc)
+                    # Nobody awaits the future in "enqueue" durability mode
+                    future.exception()
+            return
+
+        for (_, future), result in zip(entries, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> List[Tuple[int, bool]]:
+        """
+        Insert one flush worth of rows and their audit rows in a single transaction
+
+        Rows whose (client_id, timestamp) is already stored are skipped and
+        resolved to the existing id.
+
+        Returns:
+            (location id, newly inserted) per row, in input order
+        """
+        table = Location.__table__
+        async with self.session_factory() as db:
+            try:
+                result = await db.execute(
+                    dialect_insert(db, table).on_conflict_do_nothing(
+                        index_elements=[table.c.client_id, table.c.timestamp]
+                    ).returning(table.c.id, table.c.client_id, table.c.timestamp),
+                    rows
+                )
+                inserted = {
+                    (str(client_id), to_naive_utc(timestamp)): location_id
+                    for location_id, client_id, timestamp in result.all()
+                }
+                await record_locations(db, inserted.keys())
+                await mark_route_buckets(db, inserted.keys())
+
+                keys = [(row["client_id"], row["timestamp"]) for row in rows]
+                missing = [key for key in keys if key not in inserted]
+                existing = {}
+                if missing:
+                    lookup = await db.execute(
+                        select(table.c.id, table.c.client_id, table.c.timestamp).where(
+                            tuple_(table.c.client_id, table.c.timestamp).in_(missing)
+                        )
+                    )
+                    existing = {
+                        (str(client_id), to_naive_utc(timestamp)): location_id
+                        for location_id, client_id, timestamp in lookup.all()
+                    }
+
+                results = []
+                for key in keys:
+                    # Only the first occurrence of a newly inserted key counts as new
+                    location_id = inserted.pop(key, None)
+                    if location_id is not None:
+                        existing[key] = location_id
+                        results.append((location_id, True))
+                    else:
+                        results.append((existing.get(key), False))
+
+                await record_latest_locations(db, [
+                    (location_id, row)
+                    for row, (location_id, created) in zip(rows, results)
+                    if created
+                ])
+
+                await log_client_actions(db, [
+                    (row["client_id"], "location_submit", {
+                        "location_id": location_id,
+                        "timestamp": row["timestamp"].isoformat()
+                    })
+                    for row, (location_id, created) in zip(rows, results)
+                    if created
+                ])
+
+                await db.commit()
+                return results
+            except Exception:
+                await db.rollback()
+                raise
+
+# Shared queue, started from the application lifespan when INGEST_MODE=queued
+ingest_queue = LocationIngestQueue()
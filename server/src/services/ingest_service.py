@@ -0,0 +1,337 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from typing import Dict, Any, Iterable, List, AsyncIterator, Iterator, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import os
+import zlib
+
+from src.database import dialect_insert
+from src.models.models import Location, IngestIdempotencyKey
+from src.models.schemas import LocationCreate
+from src.services.logging_service import log_client_action
+from src.services.client_stats import record_locations
+from src.services.latest_locations import record_latest_locations
+from src.services.route_levels import mark_route_buckets
+
+# Rows per executemany call; keeps parameter lists bounded for very large batches
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "5000"))
+
+# How long a batch idempotency key is honoured
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+
+# Streaming NDJSON ingest limits
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+STREAM_MAX_REPORTED_ERRORS = 20
+INFLATE_PIECE_BYTES = 65536
+
+class LineTooLongError(Exception):
+    """Raised when an NDJSON line exceeds STREAM_MAX_LINE_BYTES"""
+
+def to_naive_utc(timestamp: datetime) -> datetime:
+    """Normalise a timestamp to naive UTC, the form stored in the database"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def location_rows(client_id: str, locations: Iterable[LocationCreate]) -> List[Dict[str, Any]]:
+    """
+    Convert validated locations into plain parameter dictionaries for Core inserts
+
+    Timestamps are normalised to naive UTC so that the same instant sent with
+    different offsets deduplicates to one row.
+
+    Args:
+        client_id: UUID of the client
+        locations: Validated location payloads
+    """
+    created_at = datetime.utcnow()
+    return [
+        {
+            "client_id": client_id,
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "accuracy": location.accuracy,
+            "altitude": location.altitude,
+            "speed": location.speed,
+            "timestamp": to_naive_utc(location.timestamp),
+            "created_at": created_at,
+        }
+        for location in locations
+    ]
+
+async def insert_locations_ignore_duplicates(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insert location rows, skipping any whose (client_id, timestamp) is already stored
+
+    Runs inside the caller's transaction.
+
+    Args:
+        db: Database session
+        rows: Parameter dictionaries as produced by location_rows()
+
+    Returns:
+        Number of rows actually inserted
+    """
+    if not rows:
+        return 0
+    table = Location.__table__
+    statement = dialect_insert(db, table).on_conflict_do_nothing(
+        index_elements=[table.c.client_id, table.c.timestamp]
+    ).returning(table.c.id, table.c.client_id, table.c.timestamp)
+    inserted = {
+        (str(client_id), to_naive_utc(timestamp)): location_id
+        for location_id, client_id, timestamp in (await db.execute(statement, rows)).all()
+    }
+    await record_locations(db, inserted.keys())
+    await mark_route_buckets(db, inserted.keys())
+    await record_latest_locations(db, [
+        (inserted[key], row) for row in rows
+        if (key := (row["client_id"], row["timestamp"])) in inserted
+    ])
+    return len(inserted)
+
+async def insert_location(db: AsyncSession, row: Dict[str, Any]) -> Tuple[int, bool]:
+    """
+    Insert a single location row unless the client already stored that timestamp
+
+    Runs inside the caller's transaction.
+
+    Args:
+        db: Database session
+        row: Parameter dictionary as produced by location_rows()
+
+    Returns:
+        Tuple of (location id, whether the row was newly inserted)
+    """
+    table = Location.__table__
+    location_id = await db.scalar(
+        dialect_insert(db, table).on_conflict_do_nothing(
+            index_elements=[table.c.client_id, table.c.timestamp]
+        ).returning(table.c.id),
+        row
+    )
+    if location_id is not None:
+        await record_locations(db, [(row["client_id"], row["timestamp"])])
+        await mark_route_buckets(db, [(row["client_id"], row["timestamp"])])
+        await record_latest_locations(db, [(location_id, row)])
+        return location_id, True
+
+    existing_id = await db.scalar(select(table.c.id).where(
+        table.c.client_id == row["client_id"],
+        table.c.timestamp == row["timestamp"]
+    ))
+    return existing_id, False
+
+async def get_idempotent_response(db: AsyncSession, client_id: str, key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Return the stored response of an earlier request with the same idempotency key
+
+    Args:
+        db: Database session
+        client_id: UUID of the client
+        key: Value of the Idempotency-Key header (optional)
+    """
+    if not key:
+        return None
+    cutoff = datetime.utcnow() - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    return await db.scalar(select(IngestIdempotencyKey.response).where(
+        IngestIdempotencyKey.client_id == client_id,
+        IngestIdempotencyKey.key == key,
+        IngestIdempotencyKey.created_at >= cutoff
+    ))
+
+async def bulk_insert_locations(
+    db: AsyncSession,
+    client_id: str,
+    rows: List[Dict[str, Any]],
+    action: str = "location_batch_submit",
+    idempotency_key: Optional[str] = None,
+    response_extra: Optional[Dict[str, Any]] = None,
+    chunk_size: int = BULK_INSERT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Insert location rows with Core executemany and write the audit row in the same transaction
+
+    Bypasses the ORM unit of work entirely: no Location objects are created and
+    the whole batch costs a single commit. Points already stored for the same
+    (client_id, timestamp) are skipped and counted as duplicates.
+
+    Args:
+        db: Database session
+        client_id: UUID of the client
+        rows: Parameter dictionaries as produced by location_rows()
+        action: Audit log action to record
+        idempotency_key: Store the response under this key for replays (optional)
+        response_extra: Additional fields to include in the response
+        chunk_size: Maximum rows per executemany call
+
+    Returns:
+        Response with received, new and duplicate counts
+    """
+    try:
+        new_count = 0
+        for start in range(0, len(rows), chunk_size):
+            new_count += await insert_locations_ignore_duplicates(db, rows[start:start + chunk_size])
+
+        response = {
+            "received_count": len(rows),
+            "new_count": new_count,
+            "duplicate_count": len(rows) - new_count,
+            **(response_extra or {}),
+            "received_at": datetime.now().isoformat()
+        }
+
+        await log_client_action(db, client_id, action, {
+            "count": len(rows),
+            "new_count": new_count,
+            "timestamp": response["received_at"]
+        }, commit=False)
+
+        if idempotency_key:
+            # A concurrent request with the same key may have stored it first
+            await db.execute(
+                dialect_insert(db, IngestIdempotencyKey.__table__).on_conflict_do_nothing(),
+                {"client_id": client_id, "key": idempotency_key, "response": response, "created_at": datetime.utcnow()}
+            )
+
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    return response
+
+def _inflate(decompressor, data: bytes) -> Iterator[bytes]:
+    """Decompress data in bounded pieces so a small gzip chunk cannot expand into one huge buffer"""
+    piece = decompressor.decompress(data, INFLATE_PIECE_BYTES)
+    while True:
+        yield piece
+        if not decompressor.unconsumed_tail:
+            break
+        piece = decompressor.decompress(decompressor.unconsumed_tail, INFLATE_PIECE_BYTES)
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    gzip: bool = False,
+    max_line_bytes: int = STREAM_MAX_LINE_BYTES
+) -> AsyncIterator[bytes]:
+    """
+    Split a streamed request body into newline-delimited JSON lines
+
+    Only the current partial line is buffered, so memory does not grow with
+    the size of the upload.
+
+    Args:
+        chunks: Raw body chunks, e.g. Request.stream()
+        gzip: Body is gzip-compressed
+        max_line_bytes: Longest accepted line
+
+    Raises:
+        LineTooLongError: A line exceeds max_line_bytes
+        zlib.error: The body is not valid gzip
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzip else None
+    buffer = b""
+
+    async for chunk in chunks:
+        pieces = _inflate(decompressor, chunk) if decompressor else (chunk,)
+        for piece in pieces:
+            buffer += piece
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if len(line) > max_line_bytes:
+                    raise LineTooLongError(f"Line exceeds {max_line_bytes} bytes")
+                if line.strip():
+                    yield line
+            if len(buffer) > max_line_bytes:
+                raise LineTooLongError(f"Line exceeds {max_line_bytes} bytes")
+
+    if decompressor:
+        buffer += decompressor.flush()
+        if not decompressor.eof:
+            raise zlib.error("Truncated gzip stream")
+    if buffer.strip():
+        yield buffer
+
+async def stream_insert_locations(
+    db: AsyncSession,
+    client_id: str,
+    lines: AsyncIterator[bytes],
+    chunk_size: int = BULK_INSERT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Validate NDJSON location lines and insert them in fixed-size chunks
+
+    Each chunk is committed on its own, so peak memory is bounded by chunk_size
+    regardless of upload size. Invalid lines are counted and skipped; the first
+    few are reported back with their line numbers.
+
+    Args:
+        db: Database session
+        client_id: UUID of the client
+        lines: One JSON-encoded LocationCreate per item
+        chunk_size: Rows validated and inserted per transaction
+
+    Returns:
+        Dictionary with accepted_count, new_count, duplicate_count,
+        rejected_count, errors and stream_error,
+        which is set when the body could not be read to the end
+    """
+    accepted = 0
+    rejected = 0
+    errors: List[Dict[str, Any]] = []
+    rows: List[Dict[str, Any]] = []
+
+    new = 0
+
+    async def flush():
+        nonlocal new
+        new += await insert_locations_ignore_duplicates(db, rows)
+        await db.commit()
+        rows.clear()
+
+    line_number = 0
+    stream_error = None
+    try:
+        async for line in lines:
+            line_number += 1
+            try:
+                location = LocationCreate.model_validate_json(line)
+            except ValidationError as exc:
+                rejected += 1
+                if len(errors) < STREAM_MAX_REPORTED_ERRORS:
+                    errors.append({
+                        "line": line_number,
+                        "error": "; ".join(
+                            f"{'.'.join(str(part) for part in error['loc']) or 'line'}: {error['msg']}"
+                            for error in exc.errors()
+                        )
+                    })
+                continue
+
+            rows.extend(location_rows(client_id, [location]))
+            accepted += 1
+            if len(rows) >= chunk_size:
+                await flush()
+    except (LineTooLongError, zlib.error) as exc:
+        # Keep what was validated so far and report where the body broke off
+        stream_error = f"Line {line_number + 1}: {exc}"
+
+    if rows:
+        await flush()
+    await log_client_action(db, client_id, "location_stream_submit", {
+        "accepted_count": accepted,
+        "new_count": new,
+        "rejected_count": rejected,
+        "timestamp": datetime.now().isoformat()
+    })
+
+    return {
+        "accepted_count": accepted,
+        "new_count": new,
+        "duplicate_count": accepted - new,
+        "rejected_count": rejected,
+        "errors": errors,
+        "stream_error": stream_error
+    }
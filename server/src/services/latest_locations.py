@@ -0,0 +1,81 @@
+from sqlalchemy import select, delete, func, insert, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from src.database import dialect_insert
+from src.models.models import ClientLatestLocation, Client, Location
+from src.services.fleet_state import fleet_state
+
+LATEST_COLUMNS = ("latitude", "longitude", "accuracy", "altitude", "speed", "timestamp", "created_at")
+
+async def record_latest_locations(db: AsyncSession, located_rows: Iterable[Tuple[int, Dict[str, Any]]]):
+    """
+    Move each client's latest location forward to its newest inserted row
+
+    Runs inside the caller's transaction. The stored row is only replaced
+    when the incoming timestamp is newer, so late or out-of-order uploads
+    leave it alone. The in-memory fleet state follows once the transaction
+    commits.
+
+    Args:
+        db: Database session
+        located_rows: (location id, row) for each inserted location, rows as
+            produced by ingest_service.location_rows()
+    """
+    newest: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    for location_id, row in located_rows:
+        current = newest.get(row["client_id"])
+        if current is None or row["timestamp"] > current[1]["timestamp"]:
+            newest[row["client_id"]] = (location_id, row)
+    if not newest:
+        return
+    fleet_state.stage(db, [row for _, row in newest.values()])
+
+    table = ClientLatestLocation.__table__
+    statement = dialect_insert(db, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.client_id],
+        set_={"location_id": statement.excluded.location_id, **{
+            column: statement.excluded[column] for column in LATEST_COLUMNS
+        }},
+        where=statement.excluded.timestamp > table.c.timestamp
+    )
+    # Fixed order so concurrent writers lock rows in the same sequence
+    await db.execute(statement, [
+        {"client_id": client_id, "location_id": location_id, **{column: row.get(column) for column in LATEST_COLUMNS}}
+        for client_id, (location_id, row) in sorted(newest.items())
+    ])
+
+# Columns of a LocationResponse, plus client_id for fleet listings
+RESPONSE_COLUMNS = (
+    ClientLatestLocation.location_id.label("id"),
+    *(getattr(ClientLatestLocation, column) for column in LATEST_COLUMNS),
+)
+
+async def get_latest_location(db: AsyncSession, client_id: str) -> Optional[Row]:
+    """Latest location of a client as a row with the LocationResponse fields"""
+    result = await db.execute(select(*RESPONSE_COLUMNS).where(ClientLatestLocation.client_id == client_id))
+    return result.first()
+
+async def get_fleet_latest_locations(db: AsyncSession, active_only: bool = True) -> List[Row]:
+    """Latest location of every client, newest first, as rows with client_id and the LocationResponse fields"""
+    query = select(ClientLatestLocation.client_id, *RESPONSE_COLUMNS)
+    if active_only:
+        query = query.join(Client, Client.id == ClientLatestLocation.client_id).where(Client.is_active == True)
+    result = await db.execute(query.order_by(ClientLatestLocation.timestamp.desc()))
+    return result.all()
+
+async def rebuild_latest_locations(db: AsyncSession):
+    """Repopulate client_latest_location from locations; caller commits"""
+    table = ClientLatestLocation.__table__
+    newest = (
+        select(Location.client_id, func.max(Location.timestamp).label("timestamp"))
+        .group_by(Location.client_id)
+        .subquery()
+    )
+    await db.execute(delete(table))
+    await db.execute(insert(table).from_select(
+        ["client_id", "location_id", *LATEST_COLUMNS],
+        select(Location.client_id, Location.id, *(getattr(Location, column) for column in LATEST_COLUMNS))
+        .join(newest, (Location.client_id == newest.c.client_id) & (Location.timestamp == newest.c.timestamp))
+    ))
@@ -0,0 +1,178 @@
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import os
+
+from src.services.ingest_service import to_naive_utc
+from src.services.log_partitions import client_log_source
+
+# Aggregation settings
+LOG_AGGREGATE_MAX_BUCKETS = int(os.getenv("LOG_AGGREGATE_MAX_BUCKETS", "10000"))
+LOG_AGGREGATE_CACHE_ENTRIES = int(os.getenv("LOG_AGGREGATE_CACHE_ENTRIES", "1000"))
+# A bucket is closed once it ended this long ago; covers buffered audit writes
+LOG_AGGREGATE_CLOSE_DELAY = timedelta(seconds=60)
+
+BUCKET_SIZES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+SQLITE_BUCKET_FORMATS = {
+    "minute": "%Y-%m-%d %H:%M:00",
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+class TooManyBucketsError(ValueError):
+    """Raised when a time range spans more than LOG_AGGREGATE_MAX_BUCKETS buckets"""
+
+def floor_bucket(timestamp: datetime, bucket: str) -> datetime:
+    size = BUCKET_SIZES[bucket]
+    return EPOCH + (timestamp - EPOCH) // size * size
+
+class ClosedBucketCache:
+    """
+    LRU cache of per-action counts for buckets that can no longer change
+
+    Each entry covers a contiguous range of buckets [start, end) for one
+    (client, bucket size, action filter) and holds the non-zero counts in
+    it. A dashboard that keeps refreshing a sliding window only queries the
+    buckets after the cached range. Entries keep at most
+    LOG_AGGREGATE_MAX_BUCKETS buckets, dropping the oldest.
+    """
+
+    def __init__(self, max_entries: int = LOG_AGGREGATE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def extend(self, key: tuple, bucket: str, start: datetime, end: datetime, counts: Dict[datetime, Dict[str, int]]):
+        """Record the counts of closed buckets [start, end), appending to a contiguous entry"""
+        if self.max_entries <= 0:
+            return
+        entry = self._entries.get(key)
+        if entry is None or entry["end"] != start:
+            entry = {"start": start, "end": start, "counts": {}}
+            self._entries[key] = entry
+        entry["counts"].update(counts)
+        entry["end"] = end
+        self._entries.move_to_end(key)
+
+        oldest = end - BUCKET_SIZES[bucket] * LOG_AGGREGATE_MAX_BUCKETS
+        if entry["start"] < oldest:
+            entry["start"] = oldest
+            entry["counts"] = {bucket_start: value for bucket_start, value in entry["counts"].items() if bucket_start >= oldest}
+
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+# Shared cache; cleared when log partitions are dropped
+closed_bucket_cache = ClosedBucketCache()
+
+async def _count_by_bucket(
+    db: AsyncSession,
+    client_id: Optional[str],
+    bucket: str,
+    start: datetime,
+    end: datetime,
+    action: Optional[str]
+) -> Dict[datetime, Dict[str, int]]:
+    logs_table = await client_log_source(db, start, end - timedelta(microseconds=1))
+    if db.bind.dialect.name == "sqlite":
+        bucket_start = func.strftime(SQLITE_BUCKET_FORMATS[bucket], logs_table.c.timestamp)
+    else:
+        # Truncate in UTC whatever the session time zone is
+        bucket_start = func.date_trunc(bucket, func.timezone("UTC", logs_table.c.timestamp))
+
+    filters = [logs_table.c.timestamp >= start, logs_table.c.timestamp < end]
+    if client_id:
+        filters.append(logs_table.c.client_id == client_id)
+    if action:
+        filters.append(logs_table.c.action == action)
+
+    result = await db.execute(
+        select(bucket_start.label("bucket_start"), logs_table.c.action, func.count())
+        .where(*filters)
+        .group_by(bucket_start, logs_table.c.action)
+    )
+
+    counts: Dict[datetime, Dict[str, int]] = {}
+    for value, row_action, count in result.all():
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        counts.setdefault(to_naive_utc(value), {})[row_action] = count
+    return counts
+
+async def aggregate_client_logs(
+    db: AsyncSession,
+    client_id: Optional[str],
+    bucket: str,
+    start_time: datetime,
+    end_time: datetime,
+    action: Optional[str] = None
+) -> Tuple[datetime, datetime, List[Tuple[datetime, str, int]]]:
+    """
+    Count client log rows per action per time bucket
+
+    The range is widened to whole buckets. Counts of closed buckets are
+    served from closed_bucket_cache when possible.
+
+    Args:
+        db: Database session
+        client_id: UUID of the client, or None for the whole fleet
+        bucket: "minute", "hour" or "day"
+        start_time: Start of the range
+        end_time: End of the range
+        action: Only count this action (optional)
+
+    Returns:
+        (range start, range end, [(bucket start, action, count)]) ordered by bucket and action
+
+    Raises:
+        TooManyBucketsError: The range spans more than LOG_AGGREGATE_MAX_BUCKETS buckets
+    """
+    size = BUCKET_SIZES[bucket]
+    start = floor_bucket(to_naive_utc(start_time), bucket)
+    end = floor_bucket(to_naive_utc(end_time), bucket) + size
+    if (end - start) / size > LOG_AGGREGATE_MAX_BUCKETS:
+        raise TooManyBucketsError(f"Time range spans more than {LOG_AGGREGATE_MAX_BUCKETS} buckets")
+
+    key = (client_id, bucket, action)
+    counts: Dict[datetime, Dict[str, int]] = {}
+    query_start = start
+    entry = closed_bucket_cache.get(key)
+    if entry is not None and entry["start"] <= start < entry["end"]:
+        query_start = min(entry["end"], end)
+        counts.update({
+            bucket_start: value for bucket_start, value in entry["counts"].items()
+            if start <= bucket_start < query_start
+        })
+
+    if query_start < end:
+        fresh = await _count_by_bucket(db, client_id, bucket, query_start, end, action)
+        counts.update(fresh)
+        closed_until = min(end, floor_bucket(datetime.utcnow() - LOG_AGGREGATE_CLOSE_DELAY, bucket))
+        if closed_until > query_start:
+            closed_bucket_cache.extend(key, bucket, query_start, closed_until, {
+                bucket_start: value for bucket_start, value in fresh.items() if bucket_start < closed_until
+            })
+
+    rows = [
+        (bucket_start, row_action, count)
+        for bucket_start in sorted(counts)
+        for row_action, count in sorted(counts[bucket_start].items())
+    ]
+    return start, end, rows
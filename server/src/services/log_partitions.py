@@ -0,0 +1,281 @@
+"""
+Monthly time partitions for the client_logs audit table
+
+PostgreSQL uses native declarative partitioning: client_logs is partitioned
+by RANGE (timestamp) with one client_logs_YYYY_MM partition per month plus
+client_logs_default for anything outside them. Inserts and queries go through
+the parent table and the planner prunes partitions by timestamp.
+
+SQLite has no partitioning, so each month is a separate client_logs_YYYY_MM
+table in the same database, created on first write. Each month table starts
+its ids at month_index << 32, keeping ids unique and increasing across
+months. Queries read the union of the month tables that overlap the
+requested time range, plus client_logs itself, which holds rows written
+before partitioning.
+
+In both cases retention drops whole month tables instead of deleting rows.
+"""
+
+from sqlalchemy import Table, Column, Integer, String, Index, MetaData, select, insert, union_all, text, func
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import FromClause, Select
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from datetime import datetime, timezone
+import logging
+import os
+import re
+
+from src.models.models import ClientLog, UUIDString, UTCDateTime, JSONDocument
+from src.services.client_stats import record_logs, remove_logs
+
+logger = logging.getLogger(__name__)
+
+# Months of audit log to keep; 0 keeps everything
+CLIENT_LOG_RETENTION_MONTHS = int(os.getenv("CLIENT_LOG_RETENTION_MONTHS", "0"))
+# Months ahead of the current one that PostgreSQL partitions are created for
+CLIENT_LOG_PARTITIONS_AHEAD = 1
+
+PARTITION_NAME = re.compile(r"^client_logs_(\d{4})_(\d{2})$")
+SQLITE_ID_BITS = 32
+
+# SQLite month tables, and the ones known to exist per database
+partition_metadata = MetaData()
+_created_partitions = set()
+
+def _dialect(db: AsyncSession) -> str:
+    return db.bind.dialect.name
+
+def month_start(timestamp: datetime) -> datetime:
+    """First instant (naive UTC) of the month containing timestamp"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return datetime(timestamp.year, timestamp.month, 1)
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: datetime) -> str:
+    return f"client_logs_{month.year:04d}_{month.month:02d}"
+
+def _sqlite_partition(name: str) -> Table:
+    table = partition_metadata.tables.get(name)
+    if table is None:
+        table = Table(
+            name, partition_metadata,
+            Column("id", Integer, primary_key=True),
+            Column("client_id", UUIDString, nullable=False),
+            Column("action", String(50), nullable=False),
+            Column("details", JSONDocument, nullable=True),
+            Column("timestamp", UTCDateTime, nullable=False),
+            Index(f"idx_{name}_action", "action"),
+            Index(f"idx_{name}_timestamp", "timestamp"),
+            Index(f"idx_{name}_client_timestamp", "client_id", "timestamp"),
+            sqlite_autoincrement=True
+        )
+    return table
+
+async def _ensure_sqlite_partition(db: AsyncSession, month: datetime) -> Table:
+    name = partition_name(month)
+    table = _sqlite_partition(name)
+    key = (str(db.bind.url), name)
+    if key in _created_partitions:
+        return table
+
+    def create(session):
+        connection = session.connection()
+        table.create(connection, checkfirst=True)
+        connection.execute(
+            text(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+            ),
+            {"name": name, "seq": (month.year * 12 + month.month - 1) << SQLITE_ID_BITS}
+        )
+
+    await db.run_sync(create)
+    _created_partitions.add(key)
+    return table
+
+async def insert_client_logs(db: AsyncSession, rows: List[Dict[str, Any]]):
+    """
+    Insert client log rows into their month partitions and count them in the
+    client stats, inside the caller's transaction
+
+    Args:
+        db: Database session
+        rows: Parameter dictionaries with client_id, action, details and timestamp
+    """
+    if not rows:
+        return
+    await record_logs(db, [(row["client_id"], row["timestamp"]) for row in rows])
+    if _dialect(db) != "sqlite":
+        await db.execute(insert(ClientLog.__table__), rows)
+        return
+
+    by_month: Dict[datetime, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_month.setdefault(month_start(row["timestamp"]), []).append(row)
+    for month, month_rows in by_month.items():
+        table = await _ensure_sqlite_partition(db, month)
+        try:
+            await db.execute(insert(table), month_rows)
+        except OperationalError:
+            # The table may have been dropped or its creation rolled back
+            _created_partitions.discard((str(db.bind.url), table.name))
+            raise
+
+async def list_partitions(db: AsyncSession) -> List[Tuple[datetime, str]]:
+    """
+    Existing month partitions
+
+    Returns:
+        (month start, table name) pairs, oldest first
+    """
+    if _dialect(db) == "sqlite":
+        names = await db.scalars(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'client_logs_%'"
+        ))
+    else:
+        names = await db.scalars(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE parent.relname = 'client_logs'"
+        ))
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((datetime(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+async def client_log_source(
+    db: AsyncSession,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    branch: Optional[Callable[[FromClause], Select]] = None
+) -> FromClause:
+    """
+    Selectable over the client log partitions that overlap a time range
+
+    Has the columns id, client_id, action, details and timestamp. Callers
+    still filter on timestamp themselves; this only leaves out partitions
+    that cannot contain matching rows.
+
+    Args:
+        db: Database session
+        start_time: Earliest timestamp of interest (optional)
+        end_time: Latest timestamp of interest (optional)
+        branch: Builds the query run against each SQLite month table, e.g.
+            filters, ORDER BY and LIMIT, so each month is read through its
+            own index before the union (optional). Callers must still apply
+            the same query to the returned selectable.
+    """
+    table = ClientLog.__table__
+    if _dialect(db) != "sqlite":
+        # Partition pruning is done by the planner
+        return table
+
+    first_month = month_start(start_time) if start_time else None
+    last_month = month_start(end_time) if end_time else None
+    columns = ("id", "client_id", "action", "details", "timestamp")
+    tables = [table] + [
+        _sqlite_partition(name) for month, name in await list_partitions(db)
+        if not ((first_month and month < first_month) or (last_month and month > last_month))
+    ]
+    if len(tables) == 1:
+        return table
+
+    branches = []
+    for source in tables:
+        if branch is not None:
+            source = branch(source).subquery()
+        branches.append(select(*(source.c[column] for column in columns)))
+    return union_all(*branches).subquery("client_logs")
+
+async def _is_partitioned(db: AsyncSession) -> bool:
+    return bool(await db.scalar(text(
+        "SELECT 1 FROM pg_partitioned_table "
+        "JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+        "WHERE pg_class.relname = 'client_logs'"
+    )))
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = CLIENT_LOG_PARTITIONS_AHEAD) -> int:
+    """
+    Create the partitions for the current month and the next months_ahead months
+
+    On PostgreSQL this must happen before rows for those months arrive;
+    a month whose rows already landed in client_logs_default is skipped
+    with a warning. Does nothing when client_logs predates partitioning.
+
+    Returns:
+        Number of partitions created
+    """
+    current = month_start(datetime.utcnow())
+    months = [add_months(current, offset) for offset in range(months_ahead + 1)]
+
+    if _dialect(db) == "sqlite":
+        for month in months:
+            await _ensure_sqlite_partition(db, month)
+        await db.commit()
+        return 0
+
+    if not await _is_partitioned(db):
+        return 0
+
+    existing = {name for _, name in await list_partitions(db)}
+    created = 0
+    for month in months:
+        name = partition_name(month)
+        if name in existing:
+            continue
+        try:
+            async with db.begin_nested():
+                await db.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF client_logs "
+                    f"FOR VALUES FROM ('{month.isoformat()}+00') TO ('{add_months(month, 1).isoformat()}+00')"
+                ))
+            created += 1
+        except DBAPIError:
+            logger.warning("Could not create client log partition %s", name, exc_info=True)
+    await db.commit()
+    return created
+
+async def drop_expired_partitions(db: AsyncSession, retention_months: int = CLIENT_LOG_RETENTION_MONTHS) -> int:
+    """
+    Drop month partitions that lie entirely before the retention window
+
+    Each drop commits on its own, together with taking the month's rows out
+    of the client stats.
+
+    Args:
+        db: Database session
+        retention_months: Months to keep, counting the current one; 0 keeps everything
+
+    Returns:
+        Number of partitions dropped
+    """
+    if retention_months <= 0:
+        return 0
+
+    cutoff = add_months(month_start(datetime.utcnow()), 1 - retention_months)
+    dropped = 0
+    for month, name in await list_partitions(db):
+        if month >= cutoff:
+            break
+        # Each month's rows leave the client stats in the same short transaction as the drop
+        partition = _sqlite_partition(name) if _dialect(db) == "sqlite" else ClientLog.__table__
+        removed = (await db.execute(
+            select(partition.c.client_id, func.count())
+            .where(partition.c.timestamp >= month, partition.c.timestamp < add_months(month, 1))
+            .group_by(partition.c.client_id)
+        )).all()
+        await db.execute(text(f"DROP TABLE {name}"))
+        _created_partitions.discard((str(db.bind.url), name))
+        await remove_logs(db, await client_log_source(db), removed)
+        await db.commit()
+        dropped += 1
+    return dropped
@@ -1,25 +1,159 @@
-from sqlalchemy.orm import Session
-from typing import Dict, Any
-import json
-from src.models.models import ClientLog
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import logging
+import os
 
-def log_client_action(db: Session, client_id: str, action: str, details: Dict[str, Any] = None):
+from src.database import AsyncSessionLocal
+from src.services.log_partitions import insert_client_logs
+
+logger = logging.getLogger(__name__)
+
+# Audit writer settings
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+AUDIT_FLUSH_MAX_ROWS = int(os.getenv("AUDIT_FLUSH_MAX_ROWS", "500"))
+AUDIT_BUFFER_MAX_ROWS = int(os.getenv("AUDIT_BUFFER_MAX_ROWS", "50000"))
+
+class AuditLogWriter:
+    """
+    Buffered writer for client log rows
+
+    Entries are kept in memory and written with one executemany insert every
+    flush_interval_ms milliseconds or as soon as max_rows are pending. Rows of
+    a failed or interrupted flush are put back for the next attempt. stop()
+    lets the worker finish its current flush and then writes everything still
+    buffered; entries buffered when the process dies are lost.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        flush_interval_ms: int = AUDIT_FLUSH_INTERVAL_MS,
+        max_rows: int = AUDIT_FLUSH_MAX_ROWS,
+        max_pending: int = AUDIT_BUFFER_MAX_ROWS
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and write everything still buffered"""
+        if self.running:
+            # Cancelling could interrupt a flush; let the worker finish it instead
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+        self._task = None
+        while self._pending:
+            if not await self._flush():
+                logger.error("Dropping %d audit log rows that could not be written", len(self._pending))
+                self._pending.clear()
+
+    def submit(self, client_id: str, action: str, details: Dict[str, Any] = None) -> bool:
+        """
+        Buffer a log row for the next flush
+
+        Returns:
+            False if the writer is not running or its buffer is full
+        """
+        if not self.running or len(self._pending) >= self.max_pending:
+            return False
+        self._pending.append({
+            "client_id": client_id,
+            "action": action,
+            "details": details or {},
+            "timestamp": datetime.utcnow()
+        })
+        if len(self._pending) >= self.max_rows:
+            self._wakeup.set()
+        return True
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending and not self._stopping:
+                if not await self._flush():
+                    break
+
+    async def _flush(self) -> bool:
+        rows = self._pending[:self.max_rows]
+        del self._pending[:self.max_rows]
+        try:
+            async with self.session_factory() as db:
+                await insert_client_logs(db, rows)
+                await db.commit()
+        except Exception:
+            logger.exception("Failed to write %d audit log rows", len(rows))
+            self._pending[:0] = rows
+            return False
+        except BaseException:
+            # Cancelled mid-write, e.g. at loop shutdown; keep the rows for stop()
+            self._pending[:0] = rows
+            raise
+        return True
+
+# Shared writer, started from the application lifespan
+audit_writer = AuditLogWriter()
+
+async def log_client_action(db: AsyncSession, client_id: str, action: str, details: Dict[str, Any] = None, commit: bool = True):
     """
     Log client actions to the database
-    
+
     Args:
         db: Database session
         client_id: UUID of the client
         action: Action type (e.g., "register", "login", "location_submit")
         details: Additional details about the action (optional)
+        commit: Write the row on its own; it is handed to the audit writer
+            when that is running, otherwise committed immediately. Pass False
+            to write the row as part of the caller's transaction
+    """
+    if commit and audit_writer.submit(client_id, action, details):
+        return None
+
+    await log_client_actions(db, [(client_id, action, details)])
+    if commit:
+        await db.commit()
+
+async def log_client_actions(db: AsyncSession, entries: List[Tuple[str, str, Dict[str, Any]]]):
+    """
+    Write several client log rows with one executemany, inside the caller's transaction
+
+    Args:
+        db: Database session
+        entries: (client_id, action, details) tuples
     """
-    log_entry = ClientLog(
-        client_id=client_id,
-        action=action,
-        details=json.dumps(details or {})  # Convert to JSON string for SQLite
-    )
-    
-    db.add(log_entry)
-    db.commit()
-    
-    return log_entry
+    if not entries:
+        return
+
+    timestamp = datetime.utcnow()
+    await insert_client_logs(db, [
+        {
+            "client_id": client_id,
+            "action": action,
+            "details": details or {},
+            "timestamp": timestamp
+        }
+        for client_id, action, details in entries
+    ])
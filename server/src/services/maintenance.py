@@ -0,0 +1,143 @@
+from sqlalchemy import select, delete, tuple_
+from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+
+from src.database import AsyncSessionLocal
+from src.models.models import RefreshToken, IngestIdempotencyKey
+from src.services.ingest_service import IDEMPOTENCY_KEY_TTL_HOURS
+from src.services.log_partitions import ensure_partitions, drop_expired_partitions
+from src.services.log_aggregates import closed_bucket_cache
+
+logger = logging.getLogger(__name__)
+
+# Sweeper settings
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SWEEP_INTERVAL_SECONDS", "3600"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "1000"))
+SWEEP_BATCH_PAUSE_MS = int(os.getenv("SWEEP_BATCH_PAUSE_MS", "50"))
+
+class MaintenanceSweeper:
+    """
+    Background task that deletes expired rows
+
+    Removes refresh tokens past expires_at and idempotency keys older than
+    IDEMPOTENCY_KEY_TTL_HOURS, creates upcoming client log partitions and
+    drops those past CLIENT_LOG_RETENTION_MONTHS. Each batch of at most batch_size rows is its own
+    short transaction, followed by a pause, so the write lock is never held
+    long enough to stall ingest. Runs once at startup and then every
+    interval seconds.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        interval: float = SWEEP_INTERVAL_SECONDS,
+        batch_size: int = SWEEP_BATCH_SIZE,
+        batch_pause_ms: int = SWEEP_BATCH_PAUSE_MS
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause_ms / 1000
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Maintenance sweep failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Sweep all expired rows
+
+        Returns:
+            Number of rows removed per table and when the sweep finished
+        """
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            partitions_created = await ensure_partitions(db)
+            partitions_dropped = await drop_expired_partitions(db)
+        if partitions_dropped:
+            closed_bucket_cache.clear()
+        report = {
+            "refresh_tokens": await self._sweep_refresh_tokens(now),
+            "idempotency_keys": await self._sweep_idempotency_keys(now - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)),
+            "log_partitions_created": partitions_created,
+            "log_partitions_dropped": partitions_dropped,
+            "finished_at": datetime.utcnow().isoformat()
+        }
+        self.last_report = report
+        logger.info(
+            "Maintenance sweep removed %d refresh tokens, %d idempotency keys and %d log partitions",
+            report["refresh_tokens"], report["idempotency_keys"], report["log_partitions_dropped"]
+        )
+        return report
+
+    async def _sweep_refresh_tokens(self, now: datetime) -> int:
+        expired = (
+            select(RefreshToken.id)
+            .where(RefreshToken.expires_at < now)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        removed = 0
+        while True:
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    delete(RefreshToken).where(RefreshToken.id.in_(expired)),
+                    execution_options={"synchronize_session": False}
+                )
+                await db.commit()
+            removed += result.rowcount
+            if result.rowcount < self.batch_size:
+                return removed
+            await asyncio.sleep(self.batch_pause)
+
+    async def _sweep_idempotency_keys(self, cutoff: datetime) -> int:
+        removed = 0
+        while True:
+            async with self.session_factory() as db:
+                keys = (await db.execute(
+                    select(IngestIdempotencyKey.client_id, IngestIdempotencyKey.key)
+                    .where(IngestIdempotencyKey.created_at < cutoff)
+                    .limit(self.batch_size)
+                )).all()
+                if keys:
+                    await db.execute(delete(IngestIdempotencyKey).where(
+                        tuple_(IngestIdempotencyKey.client_id, IngestIdempotencyKey.key).in_(
+                            [tuple(key) for key in keys]
+                        )
+                    ), execution_options={"synchronize_session": False})
+                    await db.commit()
+            removed += len(keys)
+            if len(keys) < self.batch_size:
+                return removed
+            await asyncio.sleep(self.batch_pause)
+
+# Shared sweeper, started from the application lifespan
+maintenance_sweeper = MaintenanceSweeper()
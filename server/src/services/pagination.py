@@ -0,0 +1,63 @@
+from sqlalchemy import tuple_, literal
+from sqlalchemy.sql import ColumnElement
+from typing import Any, Optional, Tuple
+from datetime import datetime
+import base64
+import binascii
+import json
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(timestamp: datetime, row_id: Any) -> str:
+    """
+    Opaque cursor pointing just after a row in (timestamp DESC, id DESC) order
+
+    Args:
+        timestamp: Sort timestamp of the last row on the page
+        row_id: Primary key of the last row on the page
+    """
+    payload = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Any]:
+    """
+    Decode a cursor produced by encode_cursor()
+
+    Raises:
+        InvalidCursorError: The cursor is malformed
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(payload)
+        return datetime.fromisoformat(timestamp), row_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise InvalidCursorError("Invalid cursor")
+
+def decode_page_cursor(cursor: Optional[str], offset: int) -> Optional[Tuple[datetime, Any]]:
+    """
+    Decode the cursor query parameter of a listing endpoint
+
+    Returns:
+        None when no cursor is given (offset pagination)
+
+    Raises:
+        InvalidCursorError: The cursor is malformed or combined with an offset
+    """
+    if cursor is None:
+        return None
+    if offset:
+        raise InvalidCursorError("cursor and offset cannot be combined")
+    return decode_cursor(cursor)
+
+def before_cursor(timestamp_column, id_column, cursor: Tuple[datetime, Any]) -> ColumnElement:
+    """
+    Keyset condition selecting the rows after cursor in (timestamp DESC, id DESC) order
+
+    Compares (timestamp, id) as a row value so the seek uses the composite
+    index on the timestamp column instead of skipping rows like OFFSET.
+    """
+    timestamp, row_id = cursor
+    return tuple_(timestamp_column, id_column) < tuple_(
+        literal(timestamp, timestamp_column.type), literal(row_id, id_column.type)
+    )
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from typing import Dict, Any, List
+import os
+import time
+
+# Rate limit settings; budgets refill continuously at PER_MINUTE / 60 tokens per second
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_SINGLE_PER_MINUTE = float(os.getenv("RATE_LIMIT_SINGLE_PER_MINUTE", "60"))
+RATE_LIMIT_SINGLE_BURST = int(os.getenv("RATE_LIMIT_SINGLE_BURST", "30"))
+RATE_LIMIT_BATCH_PER_MINUTE = float(os.getenv("RATE_LIMIT_BATCH_PER_MINUTE", "12"))
+RATE_LIMIT_BATCH_BURST = int(os.getenv("RATE_LIMIT_BATCH_BURST", "6"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+
+class TokenBucketLimiter:
+    """
+    In-process token bucket per client
+
+    Each client may spend up to burst tokens at once; tokens refill at
+    rate_per_minute. Buckets are kept in LRU order and the least recently
+    seen client is evicted once max_clients are tracked, which bounds memory.
+    An evicted client simply starts again with a full bucket.
+
+    Not thread-safe; meant to be called from the event loop.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def acquire(self, key: str, cost: float = 1) -> float:
+        """
+        Take cost tokens from the bucket of key
+
+        Returns:
+            0 if the request is allowed, otherwise seconds until enough tokens are available
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0
+        return (cost - bucket[0]) / self.rate if self.rate > 0 else float("inf")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tracked_clients": len(self._buckets)}
+
+# Shared limiters for single-point and batch ingest
+single_ingest_limiter = TokenBucketLimiter(RATE_LIMIT_SINGLE_PER_MINUTE, RATE_LIMIT_SINGLE_BURST)
+batch_ingest_limiter = TokenBucketLimiter(RATE_LIMIT_BATCH_PER_MINUTE, RATE_LIMIT_BATCH_BURST)
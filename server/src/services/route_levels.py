@@ -0,0 +1,357 @@
+"""
+Multi-resolution route pyramid
+
+Every client's track is cut into UTC day buckets, and each bucket keeps
+simplified copies of itself at increasing Douglas-Peucker tolerances
+(ROUTE_LEVEL_TOLERANCES_M) in route_levels, one row per level holding the
+kept points as a packed float64 array. A year-long route at a city-wide
+zoom then reads a few hundred small rows instead of every location.
+
+Ingest only marks the buckets it touched in route_levels_dirty, inside the
+same transaction. RouteLevelBuilder rebuilds marked buckets in the
+background; a bucket is unmarked only if no batch arrived while it was
+being rebuilt. Reads never serve stale levels: buckets that are still
+marked are simplified from their raw rows on the fly.
+
+Levels are built from each other, finest first, so a level can deviate
+from the raw track by the sum of its own and all finer tolerances, about
+1.3 times its tolerance with the default spacing.
+"""
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+from src.database import AsyncSessionLocal, dialect_insert
+from src.models.models import Location, RouteLevel, RouteLevelDirty
+from src.services.route_simplify import project, douglas_peucker
+
+logger = logging.getLogger(__name__)
+
+# Tolerance in metres of each level, finest first
+ROUTE_LEVEL_TOLERANCES_M = sorted(
+    float(value) for value in os.getenv("ROUTE_LEVEL_TOLERANCES_M", "5,20,100,500,2000").split(",") if value.strip()
+)
+
+# How often the builder looks for buckets marked by ingest
+ROUTE_LEVEL_INTERVAL_SECONDS = float(os.getenv("ROUTE_LEVEL_INTERVAL_SECONDS", "30"))
+
+# Marked buckets rebuilt per pass
+ROUTE_LEVEL_BATCH_SIZE = int(os.getenv("ROUTE_LEVEL_BATCH_SIZE", "100"))
+
+BUCKET = timedelta(days=1)
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Web Mercator ground resolution at zoom 0 for 256 pixel tiles, at the equator
+METERS_PER_PIXEL_ZOOM_0 = 156543.03392
+
+def _naive_utc(timestamp: datetime) -> datetime:
+    # Query parameters may carry a time zone; stored values are naive UTC
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def bucket_start(timestamp: datetime) -> datetime:
+    """Start of the UTC day bucket containing timestamp, as naive UTC"""
+    timestamp = _naive_utc(timestamp)
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+async def mark_route_buckets(db: AsyncSession, points: Iterable[Tuple[str, datetime]]):
+    """
+    Mark the day buckets of newly inserted locations for rebuilding, inside the caller's transaction
+
+    Args:
+        db: Database session
+        points: (client_id, timestamp) of each inserted location
+    """
+    # Fixed order so concurrent writers lock dirty rows in the same sequence
+    buckets = sorted({(client_id, bucket_start(timestamp)) for client_id, timestamp in points})
+    if not buckets:
+        return
+
+    table = RouteLevelDirty.__table__
+    statement = dialect_insert(db, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.client_id, table.c.bucket_start],
+        set_={"generation": table.c.generation + 1}
+    )
+    await db.execute(statement, [
+        {"client_id": client_id, "bucket_start": start, "generation": 1}
+        for client_id, start in buckets
+    ])
+
+def _pack(points: np.ndarray) -> bytes:
+    return np.ascontiguousarray(points, dtype="<f8").tobytes()
+
+def _unpack(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<f8").reshape(-1, 3)
+
+async def _raw_points(db: AsyncSession, client_id: str, start: datetime, end: datetime, inclusive_end: bool) -> np.ndarray:
+    """(n, 3) array of longitude, latitude and epoch microseconds of a client's locations in a range"""
+    result = await db.execute(
+        select(Location.longitude, Location.latitude, Location.timestamp).where(
+            Location.client_id == client_id,
+            Location.timestamp >= start,
+            Location.timestamp <= end if inclusive_end else Location.timestamp < end
+        ).order_by(Location.timestamp)
+    )
+    rows = result.all()
+    points = np.empty((len(rows), 3), dtype=np.float64)
+    for index, (longitude, latitude, timestamp) in enumerate(rows):
+        points[index] = (longitude, latitude, (_naive_utc(timestamp) - EPOCH) // MICROSECOND)
+    return points
+
+def _simplify(points: np.ndarray, tolerance: float) -> np.ndarray:
+    if len(points) <= 2:
+        return points
+    return points[douglas_peucker(project(points[:, 1], points[:, 0]), tolerance)]
+
+def build_levels(points: np.ndarray, tolerances: List[float] = ROUTE_LEVEL_TOLERANCES_M) -> List[np.ndarray]:
+    """Simplified copies of points for each tolerance, each built from the previous one"""
+    levels = []
+    for tolerance in tolerances:
+        points = _simplify(points, tolerance)
+        levels.append(points)
+    return levels
+
+async def rebuild_bucket(db: AsyncSession, client_id: str, start: datetime):
+    """Replace the levels of one client's day bucket from its raw locations, inside the caller's transaction"""
+    start = bucket_start(start)
+    points = await _raw_points(db, client_id, start, start + BUCKET, inclusive_end=False)
+    await db.execute(delete(RouteLevel).where(RouteLevel.client_id == client_id, RouteLevel.bucket_start == start))
+    if not len(points):
+        return
+    await db.execute(RouteLevel.__table__.insert(), [
+        {
+            "client_id": client_id,
+            "bucket_start": start,
+            "level": level,
+            "point_count": len(kept),
+            "source_point_count": len(points),
+            "points": _pack(kept),
+        }
+        for level, kept in enumerate(build_levels(points))
+    ])
+
+class RouteLevelBuilder:
+    """
+    Rebuilds the levels of day buckets marked by ingest
+
+    Each pass takes up to batch_size marked buckets, oldest day first, and
+    commits every bucket on its own. A bucket stays marked if ingest marked
+    it again while it was rebuilt, and is picked up by the next pass.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, interval: float = ROUTE_LEVEL_INTERVAL_SECONDS,
+                 batch_size: int = ROUTE_LEVEL_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker; marked buckets are rebuilt after the next start"""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # Keep going while there is a backlog
+                while await self.flush() >= self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("Failed to rebuild route levels")
+            await asyncio.sleep(self.interval)
+
+    async def flush(self) -> int:
+        """
+        Rebuild one batch of marked buckets
+
+        Returns:
+            Number of buckets processed
+        """
+        table = RouteLevelDirty.__table__
+        async with self.session_factory() as db:
+            marked = (await db.execute(
+                select(table.c.client_id, table.c.bucket_start, table.c.generation)
+                .order_by(table.c.bucket_start, table.c.client_id).limit(self.batch_size)
+            )).all()
+            await db.rollback()
+
+            for client_id, start, generation in marked:
+                try:
+                    await rebuild_bucket(db, client_id, start)
+                    await db.execute(delete(table).where(
+                        table.c.client_id == client_id,
+                        table.c.bucket_start == start,
+                        table.c.generation == generation
+                    ))
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+        return len(marked)
+
+# Shared builder, started from the application lifespan
+route_level_builder = RouteLevelBuilder()
+
+def choose_level(
+    level_counts: List[int],
+    zoom: Optional[int] = None,
+    max_points: Optional[int] = None,
+    tolerances: List[float] = ROUTE_LEVEL_TOLERANCES_M
+) -> int:
+    """
+    Pick the level to serve
+
+    With a zoom, the coarsest level whose tolerance stays within one pixel;
+    with max_points, the coarsest level that still has at least max_points
+    points, for the caller to simplify down to the budget.
+
+    Args:
+        level_counts: Number of points per level over the requested range
+        zoom: Web map zoom level (optional)
+        max_points: Point budget (optional)
+    """
+    level = 0
+    if zoom is not None:
+        meters_per_pixel = METERS_PER_PIXEL_ZOOM_0 / 2 ** zoom
+        level = max([index for index, tolerance in enumerate(tolerances) if tolerance <= meters_per_pixel], default=0)
+    if max_points is not None:
+        enough = [index for index, count in enumerate(level_counts) if count >= max_points]
+        level = max(level, max(enough, default=0))
+    return level
+
+async def read_route_level(
+    db: AsyncSession,
+    client_id: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    zoom: Optional[int] = None,
+    max_points: Optional[int] = None
+) -> Optional[Tuple[float, np.ndarray, int]]:
+    """
+    Read a client's route from the pyramid at the level chosen by zoom or max_points
+
+    Marked buckets are simplified from their raw rows at the chosen
+    tolerance, so the result reflects every committed location.
+
+    Returns:
+        Tuple of (tolerance in metres, (n, 3) array of longitude, latitude
+        and epoch microseconds, number of raw locations in the range), or
+        None when the range has no levels to serve from
+    """
+    start_time = _naive_utc(start_time) if start_time else None
+    end_time = _naive_utc(end_time) if end_time else None
+    in_range = []
+    if start_time:
+        in_range.append(RouteLevel.bucket_start >= bucket_start(start_time))
+    if end_time:
+        in_range.append(RouteLevel.bucket_start <= end_time)
+
+    summary = (await db.execute(
+        select(RouteLevel.bucket_start, RouteLevel.level, RouteLevel.point_count, RouteLevel.source_point_count)
+        .where(RouteLevel.client_id == client_id, *in_range)
+    )).all()
+    marked_query = select(RouteLevelDirty.bucket_start).where(RouteLevelDirty.client_id == client_id)
+    if start_time:
+        marked_query = marked_query.where(RouteLevelDirty.bucket_start >= bucket_start(start_time))
+    if end_time:
+        marked_query = marked_query.where(RouteLevelDirty.bucket_start <= end_time)
+    marked = {bucket_start(start) for start in (await db.scalars(marked_query)).all()}
+    if not summary and not marked:
+        return None
+
+    level_counts = [0] * len(ROUTE_LEVEL_TOLERANCES_M)
+    source_counts = {}
+    for start, level, point_count, source_point_count in summary:
+        start = bucket_start(start)
+        if start in marked or level >= len(level_counts):
+            continue
+        level_counts[level] += point_count
+        source_counts[start] = source_point_count
+    level = choose_level(level_counts, zoom, max_points)
+    tolerance = ROUTE_LEVEL_TOLERANCES_M[level]
+
+    pieces = {}
+    result = await db.execute(
+        select(RouteLevel.bucket_start, RouteLevel.points)
+        .where(RouteLevel.client_id == client_id, RouteLevel.level == level, *in_range)
+    )
+    for start, data in result.all():
+        start = bucket_start(start)
+        if start not in marked:
+            pieces[start] = _unpack(data)
+
+    # Raw locations counted exactly only for marked buckets and the partial buckets at either end
+    source_count = 0
+    for start in sorted(marked | source_counts.keys()):
+        lower = max(start, start_time) if start_time else start
+        upper = min(start + BUCKET, end_time) if end_time else start + BUCKET
+        partial = lower > start or upper < start + BUCKET
+        if start in marked:
+            raw = await _raw_points(db, client_id, lower, upper, inclusive_end=upper < start + BUCKET)
+            source_count += len(raw)
+            pieces[start] = _simplify(raw, tolerance)
+        elif partial:
+            source_count += await db.scalar(
+                select(func.count()).select_from(Location).where(
+                    Location.client_id == client_id,
+                    Location.timestamp >= lower,
+                    Location.timestamp <= upper if upper < start + BUCKET else Location.timestamp < upper
+                )
+            )
+        else:
+            source_count += source_counts[start]
+
+    points = np.concatenate([pieces[start] for start in sorted(pieces)]) if pieces else np.empty((0, 3))
+    if start_time:
+        points = points[points[:, 2] >= (start_time - EPOCH) // MICROSECOND]
+    if end_time:
+        points = points[points[:, 2] <= (end_time - EPOCH) // MICROSECOND]
+
+    # A range cutting into a bucket starts and ends at its own first and last location
+    range_query = select(Location.longitude, Location.latitude, Location.timestamp).where(Location.client_id == client_id)
+    if start_time:
+        range_query = range_query.where(Location.timestamp >= start_time)
+    if end_time:
+        range_query = range_query.where(Location.timestamp <= end_time)
+    first = (await db.execute(range_query.order_by(Location.timestamp).limit(1))).first()
+    last = (await db.execute(range_query.order_by(Location.timestamp.desc()).limit(1))).first()
+    if first is None:
+        return None
+    first, last = (
+        np.array([[longitude, latitude, (_naive_utc(timestamp) - EPOCH) // MICROSECOND]])
+        for longitude, latitude, timestamp in (first, last)
+    )
+    if not len(points) or points[0, 2] != first[0, 2]:
+        points = np.concatenate((first, points))
+    if points[-1, 2] != last[0, 2]:
+        points = np.concatenate((points, last))
+    return tolerance, points, source_count
+
+def timestamps(points: np.ndarray) -> List[datetime]:
+    """Timestamps of packed points as naive UTC datetimes"""
+    return [EPOCH + timedelta(microseconds=int(micros)) for micros in points[:, 2]]
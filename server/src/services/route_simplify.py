@@ -0,0 +1,204 @@
+"""
+Tolerance-based line simplification for routes
+
+Coordinates are projected to a local equirectangular plane in metres, which
+is accurate enough at route scale, and both algorithms work on NumPy arrays:
+
+- Ramer-Douglas-Peucker keeps the point farthest from the current chord
+  while that distance exceeds the tolerance. Under a point budget the
+  segments with the largest errors are split first, so the most
+  significant corners are kept.
+- Visvalingam-Whyatt drops the point that spans the smallest triangle with
+  its neighbours. Points that are local minima are removed together in
+  vectorized passes; each removal only changes its neighbours' areas, so
+  this matches one-at-a-time removal closely.
+
+Both return the indices of the kept points, always including the first and
+the last point.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+# Tolerance used when simplification is requested without tolerance_m or max_points
+ROUTE_SIMPLIFY_TOLERANCE_M = float(os.getenv("ROUTE_SIMPLIFY_TOLERANCE_M", "5"))
+
+# Point budget of route requests that give none of tolerance_m, max_points and zoom
+ROUTE_SIMPLIFY_MAX_POINTS = int(os.getenv("ROUTE_SIMPLIFY_MAX_POINTS", "200"))
+
+EARTH_RADIUS_M = 6371008.8
+
+def project(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """(n, 2) array of x, y in metres on a plane tangent at the mean latitude"""
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    # Unwrap so tracks crossing the antimeridian stay continuous
+    longitudes = np.unwrap(longitudes)
+    scale = np.cos(latitudes.mean()) if len(latitudes) else 1.0
+    return np.column_stack((longitudes * scale, latitudes)) * EARTH_RADIUS_M
+
+def _squared_segment_distances(x, y, start_x, start_y, direction_x, direction_y, inverse_length) -> np.ndarray:
+    """Squared distance from each point to its segment; all arguments are 1-D arrays"""
+    offset_x = x - start_x
+    offset_y = y - start_y
+    t = offset_x * direction_x
+    t += offset_y * direction_y
+    t *= inverse_length
+    np.clip(t, 0.0, 1.0, out=t)
+    offset_x -= t * direction_x
+    offset_y -= t * direction_y
+    offset_x *= offset_x
+    offset_y *= offset_y
+    offset_x += offset_y
+    return offset_x
+
+def douglas_peucker(points: np.ndarray, tolerance: float = 0.0, max_points: Optional[int] = None) -> np.ndarray:
+    """
+    Ramer-Douglas-Peucker simplification
+
+    All open segments are split at once, one level per pass, so the work per
+    pass is a handful of array operations over the points still undecided.
+    Under a point budget the level that would exceed it only splits its
+    segments with the largest errors.
+
+    Args:
+        points: (n, 2) projected coordinates
+        tolerance: Largest allowed distance in metres from a dropped point to the simplified line
+        max_points: Keep at most this many points (optional)
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    count = len(points)
+    if count <= 2:
+        return np.arange(count)
+    budget = count if max_points is None else max(max_points, 2)
+
+    # Separate coordinate arrays; gathers from them are much cheaper than row gathers
+    x = np.ascontiguousarray(points[:, 0])
+    y = np.ascontiguousarray(points[:, 1])
+    keep = np.zeros(count, dtype=bool)
+    keep[[0, count - 1]] = True
+    kept = 2
+    # Interior points of segments that may still be split
+    pending = np.arange(1, count - 1)
+
+    while len(pending) and kept < budget:
+        anchors = np.flatnonzero(keep)
+        if len(pending) > count // 8:
+            segment = np.cumsum(keep)[pending] - 1
+        else:
+            segment = np.searchsorted(anchors, pending) - 1
+        # Per-segment start, direction and inverse squared length, gathered per point
+        start_x = x[anchors]
+        start_y = y[anchors]
+        direction_x = np.diff(start_x)
+        direction_y = np.diff(start_y)
+        length_squared = direction_x * direction_x + direction_y * direction_y
+        inverse_length = np.divide(1.0, length_squared, out=np.zeros_like(length_squared), where=length_squared > 0)
+        distances = _squared_segment_distances(
+            x[pending], y[pending], start_x[segment], start_y[segment],
+            direction_x[segment], direction_y[segment], inverse_length[segment]
+        )
+
+        # Farthest point of each segment; pending is sorted, so segments are runs
+        starts = np.flatnonzero(np.concatenate(([True], segment[1:] != segment[:-1])))
+        largest = np.maximum.reduceat(distances, starts)
+        run = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(pending))))
+        at_largest = np.flatnonzero(distances == largest[run])
+        farthest = at_largest[np.concatenate(([True], run[at_largest][1:] != run[at_largest][:-1]))]
+
+        split = largest > tolerance * tolerance
+        if not split.any():
+            break
+        if kept + split.sum() > budget:
+            order = np.argsort(-largest, kind="stable")[:budget - kept]
+            split = np.zeros(len(starts), dtype=bool)
+            split[order] = True
+        keep[pending[farthest[split]]] = True
+        kept += int(split.sum())
+
+        # Segments within tolerance are final; drop their points
+        pending = pending[split[run] & ~keep[pending]]
+    return np.flatnonzero(keep)
+
+def _triangle_areas(points: np.ndarray) -> np.ndarray:
+    """Area of the triangle each interior point forms with its neighbours"""
+    previous, current, following = points[:-2], points[1:-1], points[2:]
+    return 0.5 * np.abs(
+        (current[:, 0] - previous[:, 0]) * (following[:, 1] - previous[:, 1])
+        - (following[:, 0] - previous[:, 0]) * (current[:, 1] - previous[:, 1])
+    )
+
+def visvalingam_whyatt(points: np.ndarray, tolerance: float = 0.0, max_points: Optional[int] = None) -> np.ndarray:
+    """
+    Visvalingam-Whyatt simplification
+
+    Args:
+        points: (n, 2) projected coordinates
+        tolerance: Drop points whose effective area is below tolerance ** 2 square metres
+        max_points: Keep at most this many points (optional)
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    indices = np.arange(len(points))
+    budget = len(points) if max_points is None else max(max_points, 2)
+    threshold = tolerance * tolerance
+
+    while len(indices) > 2:
+        areas = _triangle_areas(points[indices])
+        excess = len(indices) - budget
+        below = areas < threshold
+        if excess <= 0 and not below.any():
+            break
+
+        # Local minima; runs of equal minima are thinned to every other
+        # point so no two neighbours are removed in the same pass
+        padded = np.concatenate(([np.inf], areas, [np.inf]))
+        minima = (areas <= padded[:-2]) & (areas <= padded[2:])
+        if excess <= 0:
+            minima &= below
+        candidates = np.flatnonzero(minima)
+        run_starts = np.concatenate(([True], np.diff(candidates) != 1))
+        run_offsets = np.arange(len(candidates)) - np.maximum.accumulate(np.where(run_starts, np.arange(len(candidates)), 0))
+        candidates = candidates[run_offsets % 2 == 0]
+
+        if excess > 0:
+            # Over budget: besides everything below tolerance, remove only as
+            # many of the smallest remaining minima as needed
+            small = below[candidates]
+            others = candidates[~small]
+            others = others[np.argsort(areas[others], kind="stable")[:max(excess - int(small.sum()), 0)]]
+            candidates = np.concatenate((candidates[small], others))
+        drop = np.zeros(len(indices), dtype=bool)
+        drop[candidates + 1] = True
+        indices = indices[~drop]
+    return indices
+
+def simplify_route(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    method: str = "dp",
+    tolerance_m: Optional[float] = None,
+    max_points: Optional[int] = None
+) -> np.ndarray:
+    """
+    Indices of the points to keep when simplifying a route
+
+    Args:
+        latitudes: Latitudes in degrees, in route order
+        longitudes: Longitudes in degrees, in route order
+        method: "dp" (Douglas-Peucker) or "vw" (Visvalingam-Whyatt)
+        tolerance_m: Tolerance in metres; defaults to ROUTE_SIMPLIFY_TOLERANCE_M
+            unless max_points is given
+        max_points: Keep at most this many points (optional)
+    """
+    if tolerance_m is None:
+        tolerance_m = 0.0 if max_points is not None else ROUTE_SIMPLIFY_TOLERANCE_M
+    points = project(latitudes, longitudes)
+    if method == "vw":
+        return visvalingam_whyatt(points, tolerance_m, max_points)
+    return douglas_peucker(points, tolerance_m, max_points)
@@ -0,0 +1,83 @@
+from sqlalchemy import select
+from typing import AsyncIterator, Optional
+from datetime import datetime
+import json
+import os
+
+from src.database import AsyncSessionLocal
+from src.models.models import Location
+
+# Rows fetched from the database cursor per batch while streaming a route
+ROUTE_STREAM_BATCH_SIZE = int(os.getenv("ROUTE_STREAM_BATCH_SIZE", "5000"))
+
+def _coordinates(rows) -> str:
+    # Same encoding as the regular JSON response, without the enclosing brackets
+    return json.dumps([[longitude, latitude] for longitude, latitude, _ in rows], separators=(",", ":"))[1:-1]
+
+async def open_route_stream(
+    client_id: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    batch_size: int = ROUTE_STREAM_BATCH_SIZE
+) -> Optional[AsyncIterator[bytes]]:
+    """
+    Start streaming a client's route as a GeoJSON FeatureCollection
+
+    Rows are read through a server-side cursor in batches of batch_size and
+    encoded as they arrive, so memory does not grow with the number of
+    points and the first bytes go out before the query has finished. The
+    body has the same shape as GeoJSONResponse; the feature properties come
+    last because the end time and point count are only known at the end.
+
+    Uses its own session, since request dependencies are closed before a
+    streamed body is sent.
+
+    Returns:
+        Iterator over the encoded body, or None when the range has no locations
+    """
+    db = AsyncSessionLocal()
+    try:
+        query = select(Location.longitude, Location.latitude, Location.timestamp).where(Location.client_id == client_id)
+        if start_time:
+            query = query.where(Location.timestamp >= start_time)
+        if end_time:
+            query = query.where(Location.timestamp <= end_time)
+        result = await db.stream(query.order_by(Location.timestamp).execution_options(yield_per=batch_size))
+        batches = result.partitions()
+        first = await anext(batches, None)
+    except BaseException:
+        await db.close()
+        raise
+
+    if first is None:
+        await result.close()
+        await db.close()
+        return None
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield (
+                '{"type":"FeatureCollection","features":[{"type":"Feature",'
+                '"geometry":{"type":"LineString","coordinates":[' + _coordinates(first)
+            ).encode()
+            count = len(first)
+            last = first[-1]
+            async for batch in batches:
+                yield ("," + _coordinates(batch)).encode()
+                count += len(batch)
+                last = batch[-1]
+
+            properties = {
+                "client_id": str(client_id),
+                "start_time": first[0].timestamp.isoformat(),
+                "end_time": last.timestamp.isoformat(),
+                "point_count": count,
+                "original_point_count": count,
+                "level_tolerance_m": None
+            }
+            yield ("]},\"properties\":" + json.dumps(properties, separators=(",", ":")) + "}]}").encode()
+        finally:
+            await result.close()
+            await db.close()
+
+    return body()
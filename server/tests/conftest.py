@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+
+# Point the application at a scratch SQLite database before src.database is imported
+_tmp = tempfile.mkdtemp(prefix="goodemployers-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+os.chdir(SERVER_DIR)
+# Static files are not part of the repository; the app mounts the directory on import
+os.makedirs("src/static", exist_ok=True)
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from src.database import Base, engine, async_engine
+import src.models.models  # noqa: F401 - registers the tables
+from src.main import app
+
+Base.metadata.create_all(bind=engine)
+
+def pytest_sessionfinish(session, exitstatus):
+    # Pooled aiosqlite connections keep their threads, and the interpreter, alive
+    asyncio.run(async_engine.dispose())
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def register(client):
+    """Register a client and return (client id, authorization headers)"""
+    def register_client(name: str = "test-device"):
+        response = client.post("/api/auth/register", json={
+            "name": name,
+            "device_info": {"model": "test", "os_version": "1", "app_version": "1"}
+        })
+        assert response.status_code == 201, response.text
+        token = response.json()["access_token"]
+        return jwt.get_unverified_claims(token)["sub"], {"Authorization": f"Bearer {token}"}
+    return register_client
+
+@pytest.fixture
+def make_client():
+    """Insert a client directly into the database and return its id"""
+    from src.database import SessionLocal
+    from src.models.models import Client
+
+    def insert_client(name: str = "test-device"):
+        with SessionLocal() as db:
+            row = Client(name=name, device_info={})
+            db.add(row)
+            db.commit()
+            return row.id
+    return insert_client
+
+@pytest.fixture
+def client_id(make_client):
+    """Id of a client inserted directly into the database"""
+    return make_client()
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy import update
+
+from src.database import AsyncSessionLocal, SessionLocal
+from src.models.models import Client
+from src.services.activity_tracker import ClientActivityTracker
+
+LATER = datetime(2022, 6, 1, 12, 0, 0)
+
+@pytest.fixture
+def idle_client(make_client):
+    """Make clients last seen well before LATER, so other listings are not reordered"""
+    def insert_client():
+        client_id = make_client()
+        with SessionLocal() as db:
+            db.execute(update(Client).where(Client.id == client_id).values(last_active=datetime(2022, 1, 1)))
+            db.commit()
+        return client_id
+    return insert_client
+
+async def last_active(client_id):
+    async with AsyncSessionLocal() as db:
+        return (await db.get(Client, client_id)).last_active
+
+@pytest.mark.anyio
+async def test_touches_are_coalesced(idle_client):
+    first, second = idle_client(), idle_client()
+    tracker = ClientActivityTracker()
+    for minute in range(5):
+        tracker.touch(first, LATER + timedelta(minutes=minute))
+    tracker.touch(second, LATER)
+
+    assert await tracker.flush() == 2
+    assert await last_active(first) == LATER + timedelta(minutes=4)
+    assert await last_active(second) == LATER
+    assert await tracker.flush() == 0
+
+@pytest.mark.anyio
+async def test_last_active_never_moves_backwards(idle_client):
+    client_id = idle_client()
+    tracker = ClientActivityTracker()
+    tracker.touch(client_id, LATER)
+    await tracker.flush()
+
+    # A flush from another worker that saw the client earlier
+    tracker.touch(client_id, LATER - timedelta(hours=1))
+    await tracker.flush()
+    assert await last_active(client_id) == LATER
+
+class FailingSession:
+    """Session whose statement fails after newer activity came in for one client"""
+
+    def __init__(self, tracker, client_id):
+        self.tracker = tracker
+        self.client_id = client_id
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, *args, **kwargs):
+        self.tracker.touch(self.client_id, LATER + timedelta(hours=2))
+        raise RuntimeError("database is locked")
+
+    async def rollback(self):
+        pass
+
+@pytest.mark.anyio
+async def test_failed_flush_is_retried(idle_client):
+    first, second = idle_client(), idle_client()
+    sessions = []
+    tracker = ClientActivityTracker(session_factory=lambda: sessions.pop(0))
+    sessions += [FailingSession(tracker, second), AsyncSessionLocal()]
+    tracker.touch(first, LATER)
+    tracker.touch(second, LATER + timedelta(hours=1))
+
+    with pytest.raises(RuntimeError):
+        await tracker.flush()
+    assert await tracker.flush() == 2
+    assert await last_active(first) == LATER
+    # The newer touch that arrived during the failed flush wins
+    assert await last_active(second) == LATER + timedelta(hours=2)
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, func
+
+from src.database import AsyncSessionLocal
+from src.services import logging_service
+from src.services.log_partitions import client_log_source
+from src.services.logging_service import AuditLogWriter
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def slow_inserts(monkeypatch):
+    """Make audit inserts slow enough for stop() to arrive mid-flush; the event is set when one starts"""
+    started = asyncio.Event()
+    insert = logging_service.insert_client_logs
+
+    async def slow_insert(db, rows):
+        started.set()
+        await asyncio.sleep(0.2)
+        await insert(db, rows)
+
+    monkeypatch.setattr(logging_service, "insert_client_logs", slow_insert)
+    return started
+
+async def written(client_id):
+    async with AsyncSessionLocal() as db:
+        logs = await client_log_source(db)
+        return await db.scalar(select(func.count()).select_from(logs).where(logs.c.client_id == client_id))
+
+async def test_stop_writes_rows_of_in_flight_flush(client_id, slow_inserts):
+    writer = AuditLogWriter(flush_interval_ms=10, max_rows=2)
+    await writer.start()
+    for index in range(5):
+        assert writer.submit(client_id, "probe", {"index": index})
+    await slow_inserts.wait()
+
+    await writer.stop()
+
+    assert await written(client_id) == 5
+    assert writer._pending == []
+    assert not writer.submit(client_id, "probe")
+
+async def test_cancelled_flush_keeps_its_rows(client_id, slow_inserts):
+    writer = AuditLogWriter(flush_interval_ms=10)
+    await writer.start()
+    writer.submit(client_id, "probe")
+    await slow_inserts.wait()
+
+    writer._task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await writer._task
+    assert len(writer._pending) == 1
+
+    await writer.stop()
+    assert await written(client_id) == 1
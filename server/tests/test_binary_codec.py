@@ -0,0 +1,66 @@
+import struct
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.services.binary_codec import HEADER, MAGIC, VERSION, BinaryFormatError, decode_location_batch, encode_location_batch
+
+def locations(count=3):
+    return [
+        {
+            "latitude": 37.7749 + i * 1e-4,
+            "longitude": -122.4194 - i * 1e-4,
+            "accuracy": 5.0,
+            "altitude": 12.5 if i % 2 else None,
+            "speed": 1.5 if i == 0 else None,
+            "timestamp": datetime(2024, 1, 1) + timedelta(seconds=30 * i),
+        }
+        for i in range(count)
+    ]
+
+def batch(base, deltas):
+    """Batch of valid points with the given base timestamp and deltas"""
+    count = len(deltas)
+    bitmap = bytes((count + 7) // 8)
+    return b"".join([
+        HEADER.pack(MAGIC, VERSION, 0, 0, count, base),
+        struct.pack(f"<{count}i", *deltas),
+        struct.pack(f"<{count}i", *[0] * count),
+        struct.pack(f"<{count}i", *[0] * count),
+        struct.pack(f"<{count}f", *[1.0] * count),
+        bitmap,
+        bitmap,
+    ])
+
+def test_round_trip():
+    original = locations()
+    rows = decode_location_batch(encode_location_batch(original), "client")
+    assert [row["timestamp"] for row in rows] == [location["timestamp"] for location in original]
+    assert [row["altitude"] for row in rows] == [location["altitude"] for location in original]
+    assert [row["speed"] for row in rows] == [location["speed"] for location in original]
+    assert [row["latitude"] for row in rows] == pytest.approx([location["latitude"] for location in original])
+    assert {row["client_id"] for row in rows} == {"client"}
+
+def test_truncated_batch():
+    with pytest.raises(BinaryFormatError, match="truncated"):
+        decode_location_batch(encode_location_batch(locations())[:-3], "client")
+
+@pytest.mark.parametrize("base, deltas", [
+    (2 ** 62, [0]),
+    (-2 ** 62, [0]),
+    # In range at first, pushed past year 9999 by the deltas
+    (253402300799999 - 1000, [0, 2 ** 31 - 1]),
+])
+def test_timestamp_out_of_range(base, deltas):
+    with pytest.raises(BinaryFormatError, match="timestamp out of range"):
+        decode_location_batch(batch(base, deltas), "client")
+
+def test_out_of_range_batch_is_rejected_with_400(client, register):
+    _, headers = register()
+    response = client.post(
+        "/api/locations/batch/binary",
+        content=batch(2 ** 62, [0]),
+        headers={**headers, "Content-Type": "application/octet-stream"}
+    )
+    assert response.status_code == 400
+    assert "timestamp out of range" in response.json()["detail"]
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from src.database import AsyncSessionLocal
+from src.models.models import Location
+from src.services.ingest_service import bulk_insert_locations
+
+START = datetime(2024, 2, 1, 8, 0, 0)
+
+def rows(client_id, count, start=START):
+    return [
+        {
+            "client_id": client_id, "latitude": 48.0, "longitude": 11.0, "accuracy": 4.0,
+            "altitude": None, "speed": None, "timestamp": start + timedelta(seconds=index), "created_at": start
+        }
+        for index in range(count)
+    ]
+
+async def stored(client_id):
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Location).where(Location.client_id == client_id))
+
+@pytest.mark.anyio
+async def test_bulk_insert_spans_chunks(client_id):
+    async with AsyncSessionLocal() as db:
+        response = await bulk_insert_locations(db, client_id, rows(client_id, 25), chunk_size=7)
+    assert (response["received_count"], response["new_count"]) == (25, 25)
+    assert await stored(client_id) == 25
+
+def test_batch_writes_points_and_one_audit_row(client, register):
+    client_id, headers = register()
+    locations = [
+        {
+            "latitude": 48.0 + index * 1e-4,
+            "longitude": 11.0 - index * 1e-4,
+            "accuracy": 4.0,
+            "altitude": 500.0 if index % 2 else None,
+            "timestamp": (START + timedelta(seconds=index)).isoformat() + "Z"
+        }
+        for index in range(50)
+    ]
+    response = client.post("/api/locations/batch", json={"locations": locations}, headers=headers)
+    assert response.status_code == 201
+    assert response.json()["received_count"] == 50
+
+    stored_locations = client.get(f"/api/locations/{client_id}", params={"limit": 100}, headers=headers).json()
+    assert stored_locations["total_count"] == 50
+    assert {location["altitude"] for location in stored_locations["locations"]} == {None, 500.0}
+
+    logs = client.get(f"/api/logs/{client_id}", params={"action": "location_batch_submit"}, headers=headers).json()
+    assert logs["total_count"] == 1
+    assert logs["logs"][0]["details"]["count"] == 50
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import client_cache
+from src.services.client_cache import ClientIdentity, ClientIdentityCache, client_identity_cache
+
+def identity(client_id, name="device"):
+    return ClientIdentity(id=client_id, name=name, is_active=True)
+
+def test_entries_expire_and_are_evicted(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(client_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = ClientIdentityCache(ttl_seconds=30, max_entries=2)
+    cache.put(identity("a"))
+    cache.put(identity("b"))
+    assert cache.get("a") == identity("a")
+    cache.put(identity("c"))  # b is the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    now[0] += 31
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 1
+
+def test_disabled_cache_stores_nothing():
+    cache = ClientIdentityCache(ttl_seconds=0)
+    cache.put(identity("a"))
+    assert cache.get("a") is None
+
+@pytest.fixture
+def cached_client(client, register):
+    """Registered client whose identity is already in the cache"""
+    client_id, headers = register("before")
+    client.get(f"/api/clients/{client_id}", headers=headers)
+    hits = client_identity_cache.hits
+    assert client.get(f"/api/clients/{client_id}", headers=headers).status_code == 200
+    assert client_identity_cache.hits == hits + 1
+    return client_id, headers
+
+def test_deactivated_client_is_rejected_at_once(client, cached_client):
+    client_id, headers = cached_client
+    assert client.delete(f"/api/clients/{client_id}", headers=headers).status_code == 200
+
+    response = client.get(f"/api/clients/{client_id}", headers=headers)
+    assert response.status_code == 401
+    assert client.post("/api/locations", json={
+        "latitude": 1.0, "longitude": 2.0, "accuracy": 3.0, "timestamp": "2024-01-01T00:00:00Z"
+    }, headers=headers).status_code == 401
+
+def test_renamed_client_is_seen_at_once(client, cached_client):
+    client_id, headers = cached_client
+    assert client.put(f"/api/clients/{client_id}", json={"name": "after"}, headers=headers).status_code == 200
+
+    assert client.get(f"/api/clients/{client_id}", headers=headers).json()["name"] == "after"
+    assert client_identity_cache.get(client_id).name == "after"
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.database import AsyncSessionLocal
+from src.models.models import ClientStats
+from src.services.client_stats import estimate_count, rebuild_log_stats
+from src.services.log_partitions import (
+    client_log_source, drop_expired_partitions, insert_client_logs, month_start
+)
+
+FIRST = datetime(2024, 1, 1)
+LAST = datetime(2024, 1, 11)
+
+def test_estimate_count():
+    assert estimate_count(0, None, None) == 0
+    assert estimate_count(100, FIRST, LAST) == 100
+    assert estimate_count(100, FIRST, LAST, FIRST + timedelta(days=5)) == 50
+    assert estimate_count(100, FIRST, LAST, FIRST + timedelta(days=2), FIRST + timedelta(days=3)) == 10
+    assert estimate_count(100, FIRST, LAST, end_time=FIRST - timedelta(seconds=1)) == 0
+    assert estimate_count(100, FIRST, LAST, start_time=LAST + timedelta(seconds=1)) == 0
+    # A range wider than the rows counts them all
+    assert estimate_count(100, FIRST, LAST, FIRST - timedelta(days=30), LAST + timedelta(days=30)) == 100
+    # All rows at one instant
+    assert estimate_count(7, FIRST, FIRST, FIRST - timedelta(days=1)) == 7
+    # Aware bounds compare as the UTC instants they stand for
+    assert estimate_count(
+        100, FIRST, LAST, (FIRST + timedelta(days=5, hours=2)).replace(tzinfo=timezone(timedelta(hours=2)))
+    ) == 50
+
+async def stats(client_id):
+    async with AsyncSessionLocal() as db:
+        return await db.get(ClientStats, client_id)
+
+async def log_totals(client_id):
+    row = await stats(client_id)
+    return row.log_count, row.first_log_at, row.last_log_at
+
+def log_rows(client_id, timestamps):
+    return [{"client_id": client_id, "action": "sync", "details": None, "timestamp": timestamp} for timestamp in timestamps]
+
+def test_duplicate_locations_are_not_counted(client, register):
+    client_id, headers = register()
+    locations = [
+        {"latitude": 1.0, "longitude": 2.0, "accuracy": 5.0, "timestamp": (FIRST + timedelta(minutes=index)).isoformat()}
+        for index in range(10)
+    ]
+    client.post("/api/locations/batch", json={"locations": locations[:6]}, headers=headers)
+    client.post("/api/locations/batch", json={"locations": locations[3:] + locations[:2]}, headers=headers)
+    client.post("/api/locations", json=locations[9], headers=headers)
+
+    row = client.portal.call(stats, client_id)
+    assert (row.location_count, row.first_location_at, row.last_location_at) == (10, FIRST, FIRST + timedelta(minutes=9))
+    assert client.get(f"/api/clients/{client_id}", headers=headers).json()["location_count"] == 10
+    assert client.get(f"/api/locations/{client_id}", headers=headers).json()["total_count"] == 10
+
+@pytest.mark.anyio
+async def test_log_counts_match_a_rebuild(client_id):
+    timestamps = [FIRST + timedelta(days=index * 20) for index in range(5)]
+    async with AsyncSessionLocal() as db:
+        await insert_client_logs(db, log_rows(client_id, timestamps[2:]))
+        await insert_client_logs(db, log_rows(client_id, timestamps[:2]))
+        await db.commit()
+
+    incremental = await log_totals(client_id)
+    assert incremental == (5, timestamps[0], timestamps[-1])
+
+    async with AsyncSessionLocal() as db:
+        await rebuild_log_stats(db, await client_log_source(db))
+        await db.commit()
+    assert await log_totals(client_id) == incremental
+
+@pytest.mark.anyio
+async def test_retention_subtracts_dropped_months(make_client):
+    # Two months well outside a 12 month retention window
+    expired = [datetime(2021, 3, 5), datetime(2021, 3, 20), datetime(2021, 4, 2)]
+    recent = month_start(datetime.utcnow()) + timedelta(hours=1)
+    mixed, expired_only, recent_only = make_client(), make_client(), make_client()
+    async with AsyncSessionLocal() as db:
+        await insert_client_logs(db, log_rows(mixed, expired + [recent]))
+        await insert_client_logs(db, log_rows(expired_only, expired[:2]))
+        await insert_client_logs(db, log_rows(recent_only, [recent, recent + timedelta(minutes=1)]))
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        assert await drop_expired_partitions(db, retention_months=12) >= 2
+
+    assert await log_totals(mixed) == (1, recent, recent)
+    assert await log_totals(expired_only) == (0, None, None)
+    assert await log_totals(recent_only) == (2, recent, recent + timedelta(minutes=1))
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+from src.models.schemas import LocationColumnarBatchCreate
+from src.services.columnar_batch import MAX_TIMESTAMP_MS, columnar_location_rows
+
+def test_columnar_rows_drop_invalid_points():
+    batch = LocationColumnarBatchCreate(
+        latitudes=[10.0, 91.0, 10.0, float("nan"), 10.0],
+        longitudes=[20.0, 20.0, -181.0, 20.0, 20.0],
+        accuracies=[1.0, 1.0, 1.0, 1.0, 0.0],
+        timestamps=[1706774400000, 1706774401000, 1706774402000, 1706774403000, MAX_TIMESTAMP_MS + 1],
+        altitudes=[100.0, None, None, None, 5.0],
+        speeds=None
+    )
+    rows, rejected, errors = columnar_location_rows("client", batch)
+    assert rejected == 4
+    assert [(row["latitude"], row["longitude"], row["altitude"], row["speed"]) for row in rows] == [(10.0, 20.0, 100.0, None)]
+    assert rows[0]["timestamp"] == datetime(2024, 2, 1, 8, 0, 0)
+    assert {(error["index"], error["field"]) for error in errors} == {
+        (1, "latitudes"), (2, "longitudes"), (3, "latitudes"), (4, "accuracies"), (4, "timestamps")
+    }
+
+def test_columnar_timestamp_overflow_is_rejected():
+    batch = LocationColumnarBatchCreate(latitudes=[0.0], longitudes=[0.0], accuracies=[1.0], timestamps=[2 ** 63])
+    with pytest.raises(ValueError, match="64-bit"):
+        columnar_location_rows("client", batch)
+
+def test_columnar_batch_endpoint(client, register):
+    _, headers = register()
+    response = client.post("/api/locations/batch/columnar", json={
+        "latitudes": [10.0, 10.0, 95.0],
+        "longitudes": [20.0, 20.1, 20.0],
+        "accuracies": [1.0, 1.0, 1.0],
+        "timestamps": [1706774400000, 1706774401000, 1706774402000]
+    }, headers=headers)
+    assert response.status_code == 201
+    body = response.json()
+    assert (body["received_count"], body["new_count"], body["rejected_count"]) == (2, 2, 1)
+    assert body["errors"] == [{"index": 2, "field": "latitudes", "error": "must be between -90 and 90"}]
+
+    overflow = client.post("/api/locations/batch/columnar", json={
+        "latitudes": [0.0], "longitudes": [0.0], "accuracies": [1.0], "timestamps": [2 ** 63]
+    }, headers=headers)
+    assert overflow.status_code == 400
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from src.database import AsyncSessionLocal
+from src.models.models import Location
+from src.services.ingest_service import bulk_insert_locations
+
+START = datetime(2024, 2, 1, 8, 0, 0)
+
+def locations(count, start=START):
+    return [
+        {
+            "latitude": 48.0 + index * 1e-4,
+            "longitude": 11.0 - index * 1e-4,
+            "accuracy": 4.0,
+            "timestamp": (start + timedelta(seconds=index)).isoformat() + "Z"
+        }
+        for index in range(count)
+    ]
+
+def rows(client_id, count, start=START):
+    return [
+        {
+            "client_id": client_id, "latitude": 48.0, "longitude": 11.0, "accuracy": 4.0,
+            "altitude": None, "speed": None, "timestamp": start + timedelta(seconds=index), "created_at": start
+        }
+        for index in range(count)
+    ]
+
+def log_count(client, client_id, headers):
+    return client.get(f"/api/logs/{client_id}", params={"action": "location_batch_submit"}, headers=headers).json()["total_count"]
+
+@pytest.mark.anyio
+async def test_duplicates_across_chunks_are_counted(client_id):
+    async with AsyncSessionLocal() as db:
+        response = await bulk_insert_locations(db, client_id, rows(client_id, 25) + rows(client_id, 5), chunk_size=7)
+    assert (response["received_count"], response["new_count"], response["duplicate_count"]) == (30, 25, 5)
+    async with AsyncSessionLocal() as db:
+        assert await db.scalar(select(func.count()).select_from(Location).where(Location.client_id == client_id)) == 25
+
+def test_batch_skips_stored_and_repeated_points(client, register):
+    client_id, headers = register()
+    first = client.post("/api/locations/batch", json={"locations": locations(10)}, headers=headers).json()
+    assert (first["new_count"], first["duplicate_count"]) == (10, 0)
+
+    # The same instants again, one of them twice and with a different UTC offset
+    repeated = locations(12)
+    repeated.append({**repeated[3], "timestamp": (START + timedelta(seconds=3, hours=2)).isoformat() + "+02:00"})
+    second = client.post("/api/locations/batch", json={"locations": repeated}, headers=headers).json()
+    assert (second["received_count"], second["new_count"], second["duplicate_count"]) == (13, 2, 11)
+    assert log_count(client, client_id, headers) == 2
+
+def test_single_point_retry_returns_the_stored_id(client, register):
+    _, headers = register()
+    location = locations(1)[0]
+    first = client.post("/api/locations", json=location, headers=headers).json()
+    retry = client.post("/api/locations", json={
+        **location, "timestamp": START.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=-5))).isoformat()
+    }, headers=headers).json()
+    assert first["duplicate"] is False
+    assert retry == {**first, "duplicate": True, "received_at": retry["received_at"]}
+
+def test_idempotency_key_replays_the_first_response(client, register):
+    client_id, headers = register()
+    keyed = {**headers, "Idempotency-Key": "batch-1"}
+    first = client.post("/api/locations/batch", json={"locations": locations(5)}, headers=keyed)
+    replay = client.post("/api/locations/batch", json={"locations": locations(8)}, headers=keyed)
+    assert first.status_code == replay.status_code == 201
+    assert replay.json() == first.json()
+    assert log_count(client, client_id, headers) == 1
+
+    # Keys are per client
+    _, other_headers = register("other-device")
+    other = client.post(
+        "/api/locations/batch", json={"locations": locations(8)}, headers={**other_headers, "Idempotency-Key": "batch-1"}
+    ).json()
+    assert other["new_count"] == 8
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from src.models.schemas import (
+    ClientLogResponse, ClientLogsResponse, GeoJSONFeature, GeoJSONLineString, GeoJSONResponse,
+    LocationResponse, LocationsResponse, RoutePoint, RouteResponse
+)
+from src.services.fast_json import ModelResponse, encode_model
+
+# Floats json.dumps and orjson write differently, plus ordinary ones
+FLOATS = [0.0, 0.1, 1.0, 2.5, -122.4194, 37.774929, 1e-05, 1.5e-07, 1e16, 1.2345e+20, 123456789.125]
+
+TIMESTAMPS = [
+    datetime(2024, 3, 1, 12, 0, 0),
+    datetime(2024, 3, 1, 12, 0, 0, 123456),
+    datetime(2024, 3, 1, 12, 0, 0, tzinfo=timezone.utc),
+    datetime(2024, 3, 1, 12, 0, 0, 500, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+]
+
+def locations_payload():
+    return LocationsResponse(
+        total_count=len(FLOATS),
+        locations=[
+            LocationResponse(
+                id=index,
+                latitude=value,
+                longitude=-value,
+                accuracy=abs(value),
+                altitude=value if index % 2 else None,
+                speed=None,
+                timestamp=TIMESTAMPS[index % len(TIMESTAMPS)],
+                created_at=TIMESTAMPS[(index + 1) % len(TIMESTAMPS)]
+            )
+            for index, value in enumerate(FLOATS)
+        ],
+        next_cursor="MjAyNC0wMy0wMVQxMjowMDowMHwx"
+    )
+
+def logs_payload():
+    client_id = uuid.uuid4()
+    return ClientLogsResponse(
+        total_count=3,
+        logs=[
+            ClientLogResponse(id=1, client_id=client_id, action="login", details=None, timestamp=TIMESTAMPS[0]),
+            ClientLogResponse(
+                id=2,
+                client_id=client_id,
+                action="sync",
+                details={"batch": [1, 2.5, 1e-05], "ok": True, "note": "ünïcødé \"quoted\"", "nested": {"x": None}},
+                timestamp=TIMESTAMPS[2]
+            ),
+            ClientLogResponse(id=3, client_id=client_id, action="logout", details={}, timestamp=TIMESTAMPS[3]),
+        ]
+    )
+
+def route_payload():
+    return RouteResponse(
+        client_id=uuid.uuid4(),
+        start_time=TIMESTAMPS[0],
+        end_time=TIMESTAMPS[2],
+        points=[
+            RoutePoint(latitude=value, longitude=value / 3, timestamp=TIMESTAMPS[index % len(TIMESTAMPS)])
+            for index, value in enumerate(FLOATS)
+        ]
+    )
+
+def geojson_payload():
+    return GeoJSONResponse(features=[GeoJSONFeature(
+        geometry=GeoJSONLineString(coordinates=[[value / 7, value] for value in FLOATS]),
+        properties={
+            "client_id": str(uuid.uuid4()),
+            "start_time": TIMESTAMPS[0].isoformat(),
+            "point_count": len(FLOATS),
+            "simplified": True,
+            "tolerance_m": 2.5,
+            "level_tolerance_m": None,
+            "timestamps": [timestamp.isoformat() for timestamp in TIMESTAMPS]
+        }
+    )])
+
+PAYLOADS = {
+    "locations": locations_payload,
+    "empty_locations": lambda: LocationsResponse(total_count=0, locations=[]),
+    "logs": logs_payload,
+    "route": route_payload,
+    "geojson": geojson_payload,
+}
+
+@pytest.fixture(params=sorted(PAYLOADS))
+def payload(request):
+    return PAYLOADS[request.param]()
+
+def responses(model):
+    """Bodies of the same model served through response_model and through ModelResponse"""
+    app = FastAPI()
+
+    @app.get("/standard", response_model=type(model))
+    def standard():
+        return model
+
+    @app.get("/fast", response_model=type(model))
+    def fast():
+        return ModelResponse(model)
+
+    with TestClient(app) as client:
+        return client.get("/standard"), client.get("/fast")
+
+def test_model_response_matches_response_model(payload):
+    standard, fast = responses(payload)
+    assert standard.status_code == fast.status_code == 200
+    assert fast.headers["content-type"] == standard.headers["content-type"]
+    assert fast.content == standard.content
+
+@pytest.mark.parametrize("value", FLOATS)
+def test_floats_encode_like_json_module(value):
+    standard, fast = responses(RoutePoint(latitude=value, longitude=value, timestamp=TIMESTAMPS[0]))
+    assert fast.content == standard.content
+
+def test_encode_model_falls_back_for_large_integers():
+    model = ClientLogResponse(
+        id=2 ** 70, client_id=uuid.uuid4(), action="big", details={"n": 2 ** 80}, timestamp=TIMESTAMPS[2]
+    )
+    standard, fast = responses(model)
+    assert fast.content == standard.content == encode_model(model)
@@ -0,0 +1,35 @@
+import pytest
+
+from src.routes import auth
+
+FLEET_ENDPOINTS = [
+    "/api/logs/aggregate",
+    "/api/locations/latest",
+    "/api/fleet/snapshot",
+]
+
+@pytest.fixture
+def admin(register, monkeypatch):
+    client_id, headers = register("admin")
+    monkeypatch.setattr(auth, "ADMIN_CLIENT_IDS", {client_id})
+    return headers
+
+@pytest.mark.parametrize("path", FLEET_ENDPOINTS)
+def test_fleet_endpoints_reject_regular_clients(client, register, path):
+    _, headers = register()
+    response = client.get(path, headers=headers)
+    assert response.status_code == 403
+
+@pytest.mark.parametrize("path", FLEET_ENDPOINTS)
+def test_fleet_endpoints_allow_admin_clients(client, admin, path):
+    assert client.get(path, headers=admin).status_code == 200
+
+@pytest.mark.parametrize("path", FLEET_ENDPOINTS)
+def test_fleet_endpoints_require_authentication(client, path):
+    assert client.get(path).status_code == 401
+
+def test_map_escapes_client_names(client):
+    page = client.get("/web/map").text
+    # Names only reach HTML through escapeHtml (textContent and Leaflet titles are safe)
+    assert "${client.name}" not in page
+    assert "${escapeHtml(client.name)}" in page
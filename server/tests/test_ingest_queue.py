@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, func
+
+from src.database import AsyncSessionLocal
+from src.models.models import Location
+from src.services.ingest_queue import LocationIngestQueue
+
+pytestmark = pytest.mark.anyio
+
+class SlowQueue(LocationIngestQueue):
+    """Queue whose writes take long enough for stop() to arrive mid-flush"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writing = asyncio.Event()
+
+    async def _write(self, rows):
+        self.writing.set()
+        await asyncio.sleep(0.2)
+        return await super()._write(rows)
+
+def rows(client_id, count, start=datetime(2024, 1, 1)):
+    return [
+        {
+            "client_id": client_id, "latitude": 37.0, "longitude": -122.0, "accuracy": 5.0,
+            "altitude": None, "speed": None, "timestamp": start + timedelta(seconds=i)
+        }
+        for i in range(count)
+    ]
+
+async def stored(client_id):
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Location).where(Location.client_id == client_id))
+
+async def test_stop_finishes_in_flight_flush(client_id):
+    queue = SlowQueue(flush_interval_ms=10, max_rows=3)
+    await queue.start()
+    futures = [queue.enqueue(row) for row in rows(client_id, 5)]
+    await queue.writing.wait()
+
+    await queue.stop()
+
+    assert all(future.done() for future in futures)
+    assert [future.result()[1] for future in futures] == [True] * 5
+    assert await stored(client_id) == 5
+    assert not queue.running
+
+async def test_stop_flushes_points_queued_while_stopping(client_id):
+    queue = SlowQueue(flush_interval_ms=10, max_rows=3)
+    await queue.start()
+    first = queue.enqueue(rows(client_id, 1)[0])
+    await queue.writing.wait()
+
+    stopping = asyncio.create_task(queue.stop())
+    await asyncio.sleep(0)
+    late = queue.enqueue(rows(client_id, 1, start=datetime(2024, 1, 2))[0])
+    await stopping
+
+    assert first.result()[1] and late.result()[1]
+    assert await stored(client_id) == 2
+
+async def test_cancelled_flush_keeps_its_points(client_id):
+    queue = SlowQueue(flush_interval_ms=10)
+    await queue.start()
+    future = queue.enqueue(rows(client_id, 1)[0])
+    await queue.writing.wait()
+
+    # Cancelled from outside, e.g. by event loop teardown
+    queue._task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queue._task
+    assert not future.done()
+    assert len(queue._pending) == 1
+
+    await queue.stop()
+    assert future.result()[1]
+
+async def test_duplicate_points_resolve_to_stored_id(client_id):
+    queue = LocationIngestQueue(flush_interval_ms=10)
+    await queue.start()
+    row = rows(client_id, 1)[0]
+    first, retry = queue.enqueue(row), queue.enqueue(dict(row))
+    await queue.stop()
+
+    assert first.result() == (first.result()[0], True)
+    assert retry.result() == (first.result()[0], False)
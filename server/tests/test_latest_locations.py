@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from src.database import AsyncSessionLocal
+from src.services.latest_locations import get_fleet_latest_locations, rebuild_latest_locations
+
+NOON = datetime(2024, 5, 1, 12, 0, 0)
+
+def upload(client, headers, minutes):
+    response = client.post("/api/locations/batch", json={"locations": [
+        {"latitude": 10.0 + minute * 1e-3, "longitude": 20.0, "accuracy": 5.0, "timestamp": (NOON + timedelta(minutes=minute)).isoformat()}
+        for minute in minutes
+    ]}, headers=headers)
+    assert response.status_code == 201
+
+def latest_timestamp(client, client_id, headers):
+    return client.get(f"/api/locations/{client_id}/latest", headers=headers).json()["timestamp"]
+
+def test_older_upload_does_not_move_latest_back(client, register):
+    client_id, headers = register()
+    upload(client, headers, [5, 30, 10])
+    assert latest_timestamp(client, client_id, headers).startswith("2024-05-01T12:30:00")
+
+    # A late upload of older fixes, then a single one
+    upload(client, headers, [0, 20])
+    client.post("/api/locations", json={
+        "latitude": 1.0, "longitude": 2.0, "accuracy": 3.0, "timestamp": NOON.isoformat()
+    }, headers=headers)
+    latest = client.get(f"/api/locations/{client_id}/latest", headers=headers).json()
+    assert latest["timestamp"].startswith("2024-05-01T12:30:00")
+    assert latest["latitude"] == 10.03
+
+    upload(client, headers, [31])
+    assert latest_timestamp(client, client_id, headers).startswith("2024-05-01T12:31:00")
+
+async def fleet_latest(client_ids):
+    async with AsyncSessionLocal() as db:
+        rows = await get_fleet_latest_locations(db, active_only=False)
+    return sorted(tuple(row) for row in rows if row.client_id in client_ids)
+
+async def rebuild():
+    async with AsyncSessionLocal() as db:
+        await rebuild_latest_locations(db)
+        await db.commit()
+
+def test_rebuild_matches_incremental_table(client, register):
+    client_ids = set()
+    for name, batches in (("first", [[3, 1], [2]]), ("second", [[40], [0, 39, 41], [7]]), ("third", [[15]])):
+        client_id, headers = register(name)
+        client_ids.add(client_id)
+        for minutes in batches:
+            upload(client, headers, minutes)
+
+    incremental = client.portal.call(fleet_latest, client_ids)
+    assert len(incremental) == 3
+    client.portal.call(rebuild)
+    assert client.portal.call(fleet_latest, client_ids) == incremental
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database import AsyncSessionLocal
+from src.services import log_aggregates
+from src.services.log_aggregates import ClosedBucketCache, aggregate_client_logs, closed_bucket_cache, floor_bucket
+from src.services.log_partitions import insert_client_logs
+
+HOUR = timedelta(hours=1)
+# Spans the change of month, so the rows live in two month partitions
+MONTH_END = datetime(2023, 1, 31, 22, 0, 0)
+
+def test_floor_bucket():
+    timestamp = datetime(2023, 1, 31, 23, 59, 59, 999999)
+    assert floor_bucket(timestamp, "minute") == datetime(2023, 1, 31, 23, 59)
+    assert floor_bucket(timestamp, "hour") == datetime(2023, 1, 31, 23)
+    assert floor_bucket(timestamp, "day") == datetime(2023, 1, 31)
+
+def test_cache_extends_contiguous_ranges(monkeypatch):
+    monkeypatch.setattr(log_aggregates, "LOG_AGGREGATE_MAX_BUCKETS", 4)
+    cache = ClosedBucketCache(max_entries=2)
+    start = datetime(2023, 1, 1)
+    hours = [start + HOUR * index for index in range(8)]
+
+    cache.extend("a", "hour", hours[0], hours[2], {hours[0]: {"x": 1}})
+    cache.extend("a", "hour", hours[2], hours[3], {hours[2]: {"x": 2}})
+    assert cache.get("a") == {"start": hours[0], "end": hours[3], "counts": {hours[0]: {"x": 1}, hours[2]: {"x": 2}}}
+
+    # Growing past the bucket limit trims the oldest buckets
+    cache.extend("a", "hour", hours[3], hours[6], {hours[5]: {"x": 3}})
+    assert cache.get("a") == {"start": hours[2], "end": hours[6], "counts": {hours[2]: {"x": 2}, hours[5]: {"x": 3}}}
+
+    # A range that does not continue the entry replaces it
+    cache.extend("a", "hour", hours[7], hours[7] + HOUR, {hours[7]: {"y": 1}})
+    assert cache.get("a") == {"start": hours[7], "end": hours[7] + HOUR, "counts": {hours[7]: {"y": 1}}}
+
+def test_cache_evicts_least_recently_used():
+    cache = ClosedBucketCache(max_entries=2)
+    start = datetime(2023, 1, 1)
+    for key in ("a", "b"):
+        cache.extend(key, "hour", start, start + HOUR, {})
+    cache.get("a")
+    cache.extend("c", "hour", start, start + HOUR, {})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+    disabled = ClosedBucketCache(max_entries=0)
+    disabled.extend("a", "hour", start, start + HOUR, {})
+    assert disabled.get("a") is None
+
+async def seed(client_id):
+    """Rows every 20 minutes over four hours around the change of month, alternating actions"""
+    rows = [
+        {
+            "client_id": client_id,
+            "action": "sync" if index % 2 else "login",
+            "details": None,
+            "timestamp": MONTH_END + timedelta(minutes=20 * index)
+        }
+        for index in range(12)
+    ]
+    async with AsyncSessionLocal() as db:
+        await insert_client_logs(db, rows)
+        await db.commit()
+
+async def aggregate(client_id, bucket, start, end, action=None):
+    async with AsyncSessionLocal() as db:
+        return await aggregate_client_logs(db, client_id, bucket, start, end, action)
+
+@pytest.mark.anyio
+async def test_buckets_across_months(client_id):
+    await seed(client_id)
+
+    start, end, rows = await aggregate(client_id, "hour", MONTH_END + timedelta(minutes=30), MONTH_END + 3 * HOUR)
+    assert (start, end) == (MONTH_END, MONTH_END + 4 * HOUR)
+    assert rows == [
+        (MONTH_END + HOUR * hour, action, count)
+        for hour in range(4)
+        for action, count in (("login", 2 if hour % 2 == 0 else 1), ("sync", 1 if hour % 2 == 0 else 2))
+    ]
+
+    _, _, days = await aggregate(client_id, "day", MONTH_END, MONTH_END + 4 * HOUR)
+    assert days == [
+        (datetime(2023, 1, 31), "login", 3), (datetime(2023, 1, 31), "sync", 3),
+        (datetime(2023, 2, 1), "login", 3), (datetime(2023, 2, 1), "sync", 3),
+    ]
+
+    _, _, filtered = await aggregate(client_id, "day", MONTH_END, MONTH_END + 4 * HOUR, action="sync")
+    assert filtered == [(datetime(2023, 1, 31), "sync", 3), (datetime(2023, 2, 1), "sync", 3)]
+
+@pytest.mark.anyio
+async def test_cached_buckets_match_a_fresh_query(client_id, monkeypatch):
+    await seed(client_id)
+    queried = []
+    count_by_bucket = log_aggregates._count_by_bucket
+
+    async def recording_count(db, client_id, bucket, start, end, action):
+        queried.append((start, end))
+        return await count_by_bucket(db, client_id, bucket, start, end, action)
+
+    monkeypatch.setattr(log_aggregates, "_count_by_bucket", recording_count)
+    ranges = [
+        (MONTH_END, MONTH_END + HOUR),                                   # fills the cache
+        (MONTH_END + HOUR, MONTH_END + 2 * HOUR + timedelta(minutes=1)),  # extends it
+        (MONTH_END + timedelta(minutes=90), MONTH_END + 2 * HOUR),        # from the middle
+        (MONTH_END - 2 * HOUR, MONTH_END + HOUR),                         # starts before it
+        (MONTH_END + HOUR, MONTH_END + 5 * HOUR),                         # runs past it
+    ]
+    cached = [await aggregate(client_id, "hour", *span) for span in ranges]
+    assert queried == [
+        (MONTH_END, MONTH_END + 2 * HOUR),
+        (MONTH_END + 2 * HOUR, MONTH_END + 3 * HOUR),
+        (MONTH_END - 2 * HOUR, MONTH_END + 2 * HOUR),
+        (MONTH_END + 2 * HOUR, MONTH_END + 6 * HOUR),
+    ]
+
+    closed_bucket_cache.clear()
+    assert [await aggregate(client_id, "hour", *span) for span in ranges] == cached
+    assert len(cached[2][2]) == 4
+
+def test_too_many_buckets_is_rejected(client, register):
+    client_id, headers = register()
+    response = client.get(f"/api/logs/{client_id}/aggregate", params={
+        "bucket": "minute", "start_time": "2020-01-01T00:00:00Z", "end_time": "2024-01-01T00:00:00Z"
+    }, headers=headers)
+    assert response.status_code == 400
+    assert "buckets" in response.json()["detail"]
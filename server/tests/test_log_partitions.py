@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from src.database import AsyncSessionLocal
+from src.services.log_partitions import (
+    SQLITE_ID_BITS, add_months, client_log_source, drop_expired_partitions, insert_client_logs,
+    list_partitions, month_start
+)
+
+# Around a year boundary, far enough back for retention to drop
+MONTHS = [datetime(2022, 11, 1), datetime(2022, 12, 1), datetime(2023, 1, 1)]
+
+def log_rows(client_id, per_month=3):
+    return [
+        {
+            "client_id": client_id,
+            "action": "sync",
+            "details": {"month": month.month, "index": index},
+            "timestamp": add_months(month, 1) - timedelta(hours=per_month - index)
+        }
+        for month in MONTHS
+        for index in range(per_month)
+    ]
+
+async def insert_logs(rows):
+    async with AsyncSessionLocal() as db:
+        await insert_client_logs(db, rows)
+        await db.commit()
+
+def test_month_helpers():
+    assert month_start(datetime(2022, 12, 31, 23, 59)) == datetime(2022, 12, 1)
+    assert add_months(datetime(2022, 12, 1), 1) == datetime(2023, 1, 1)
+    assert add_months(datetime(2023, 1, 1), -13) == datetime(2021, 12, 1)
+
+@pytest.mark.anyio
+async def test_rows_roll_over_into_month_tables(client_id):
+    await insert_logs(log_rows(client_id))
+
+    async with AsyncSessionLocal() as db:
+        partitions = dict(await list_partitions(db))
+        assert {month: partitions.get(month) for month in MONTHS} == {
+            datetime(2022, 11, 1): "client_logs_2022_11",
+            datetime(2022, 12, 1): "client_logs_2022_12",
+            datetime(2023, 1, 1): "client_logs_2023_01",
+        }
+
+        source = await client_log_source(db)
+        logs = (await db.execute(
+            select(source.c.id, source.c.timestamp).where(source.c.client_id == client_id).order_by(source.c.timestamp)
+        )).all()
+    assert len(logs) == 9
+    # Ids follow time across months and carry the month in their high bits
+    assert [log.id for log in logs] == sorted(log.id for log in logs)
+    assert {log.id >> SQLITE_ID_BITS for log in logs} == {month.year * 12 + month.month - 1 for month in MONTHS}
+
+@pytest.mark.anyio
+async def test_source_only_reads_overlapping_months(client_id):
+    await insert_logs(log_rows(client_id))
+
+    async with AsyncSessionLocal() as db:
+        source = await client_log_source(db, datetime(2022, 12, 5), datetime(2022, 12, 31))
+        months = {
+            month_start(timestamp) for timestamp in
+            (await db.scalars(select(source.c.timestamp).where(source.c.client_id == client_id))).all()
+        }
+    assert months == {datetime(2022, 12, 1)}
+
+def test_cursor_walk_crosses_months(client, register):
+    client_id, headers = register()
+    client.portal.call(insert_logs, log_rows(client_id, per_month=4))
+
+    timestamps = []
+    params = {"action": "sync", "limit": 5}
+    while True:
+        page = client.get(f"/api/logs/{client_id}", params=params, headers=headers).json()
+        assert page["total_count"] == 12
+        timestamps.extend(log["timestamp"] for log in page["logs"])
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+    assert len(timestamps) == 12
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    ranged = client.get(f"/api/logs/{client_id}", params={
+        "action": "sync", "start_time": "2022-12-01T00:00:00", "end_time": "2022-12-31T23:59:59"
+    }, headers=headers).json()
+    assert ranged["total_count"] == 4
+    assert all(log["timestamp"].startswith("2022-12-") for log in ranged["logs"])
+
+@pytest.mark.anyio
+async def test_retention_drops_whole_months(client_id):
+    await insert_logs(log_rows(client_id))
+
+    async with AsyncSessionLocal() as db:
+        assert await drop_expired_partitions(db, retention_months=0) == 0
+        assert await drop_expired_partitions(db, retention_months=12) >= len(MONTHS)
+        cutoff = add_months(month_start(datetime.utcnow()), -11)
+        assert all(month >= cutoff for month, _ in await list_partitions(db))
+
+    # A dropped month is created again on the next write
+    await insert_logs(log_rows(client_id)[:1])
+    async with AsyncSessionLocal() as db:
+        assert "client_logs_2022_11" in dict(await list_partitions(db)).values()
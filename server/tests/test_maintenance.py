@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from src.database import AsyncSessionLocal
+from src.models.models import IngestIdempotencyKey, RefreshToken
+from src.services.ingest_service import IDEMPOTENCY_KEY_TTL_HOURS
+from src.services.maintenance import MaintenanceSweeper
+
+@pytest.mark.anyio
+async def test_sweep_removes_expired_rows_in_batches(client_id):
+    now = datetime.utcnow()
+    stale = now - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS, minutes=1)
+    async with AsyncSessionLocal() as db:
+        db.add_all(
+            RefreshToken(client_id=client_id, token=f"sweep-{client_id}-{index}", expires_at=now + timedelta(days=1 if index < 3 else -1))
+            for index in range(13)
+        )
+        db.add_all(
+            IngestIdempotencyKey(client_id=client_id, key=f"key-{index}", response={}, created_at=now if index < 2 else stale)
+            for index in range(11)
+        )
+        await db.commit()
+
+    sessions = []
+
+    def session_factory():
+        sessions.append(None)
+        return AsyncSessionLocal()
+
+    report = await MaintenanceSweeper(session_factory, batch_size=4, batch_pause_ms=0).run_once()
+    assert (report["refresh_tokens"], report["idempotency_keys"]) == (10, 9)
+    # Partitions, then three batches per table
+    assert len(sessions) == 7
+
+    async with AsyncSessionLocal() as db:
+        tokens = await db.scalar(select(func.count()).select_from(RefreshToken).where(RefreshToken.expires_at < now))
+        keys = await db.scalars(select(IngestIdempotencyKey.key).where(IngestIdempotencyKey.client_id == client_id))
+        assert tokens == 0
+        assert sorted(keys) == ["key-0", "key-1"]
+        assert await db.scalar(
+            select(func.count()).select_from(RefreshToken).where(RefreshToken.client_id == client_id)
+        ) == 3
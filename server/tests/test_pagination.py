@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from src.database import SessionLocal
+from src.models.models import Client
+from src.services.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+def walk(client, path, headers, limit, key):
+    """Follow next_cursor through every page and return the items"""
+    items = []
+    response = client.get(path, params={"limit": limit}, headers=headers).json()
+    while True:
+        items.extend(response[key])
+        if response["next_cursor"] is None:
+            return items
+        response = client.get(path, params={"limit": limit, "cursor": response["next_cursor"]}, headers=headers).json()
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 1, 1, 12, 30, 15, 250000)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+def test_invalid_cursor():
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not a cursor")
+
+def test_invalid_cursor_is_rejected_with_400(client, register):
+    _, headers = register()
+    assert client.get("/api/clients", params={"cursor": "garbage"}, headers=headers).status_code == 400
+    assert client.get("/api/clients", params={"cursor": encode_cursor(datetime(2024, 1, 1), "x"), "offset": 5}, headers=headers).status_code == 400
+
+def test_clients_are_listed_by_recent_activity(client, register):
+    _, headers = register()
+    ids = [register(f"active-{index}")[0] for index in range(4)]
+    with SessionLocal() as db:
+        for hours, client_id in enumerate(ids):
+            db.execute(update(Client).where(Client.id == client_id).values(last_active=datetime.utcnow() + timedelta(hours=hours + 1)))
+        db.commit()
+
+    walked = [row["id"] for row in walk(client, "/api/clients", headers, 3, "clients")]
+    assert walked[:4] == ids[::-1]
+    assert len(walked) == len(set(walked)) == client.get("/api/clients", headers=headers).json()["total_count"]
+
+def test_registered_walk_is_stable_while_clients_are_active(client, register):
+    _, headers = register()
+    for index in range(5):
+        register(f"walker-{index}")
+    params = {"order": "registered", "limit": 1000}
+    expected = [row["id"] for row in client.get("/api/clients", params=params, headers=headers).json()["clients"]]
+
+    seen = []
+    params["limit"] = 2
+    response = client.get("/api/clients", params=params, headers=headers).json()
+    while True:
+        seen.extend(row["id"] for row in response["clients"])
+        # Activity between pages must not move clients across page boundaries
+        with SessionLocal() as db:
+            db.execute(update(Client).where(Client.id.in_(expected[-3:])).values(last_active=datetime.utcnow() + timedelta(days=1)))
+            db.commit()
+        if response["next_cursor"] is None:
+            break
+        response = client.get("/api/clients", params={**params, "cursor": response["next_cursor"]}, headers=headers).json()
+
+    assert seen == expected
+
+def test_location_walk_matches_offset_listing(client, register):
+    client_id, headers = register()
+    start = datetime(2024, 1, 1)
+    locations = [
+        {"latitude": 1.0, "longitude": 2.0, "accuracy": 5.0, "timestamp": (start + timedelta(seconds=i)).isoformat()}
+        for i in range(25)
+    ]
+    assert client.post("/api/locations/batch", json={"locations": locations}, headers=headers).status_code == 201
+
+    path = f"/api/locations/{client_id}"
+    walked = walk(client, path, headers, 7, "locations")
+    listed = client.get(path, params={"limit": 100}, headers=headers).json()["locations"]
+    assert [row["id"] for row in walked] == [row["id"] for row in listed]
+    assert len(walked) == 25
+    assert walked[0]["timestamp"] > walked[-1]["timestamp"]
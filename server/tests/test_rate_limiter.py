@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.routes import locations
+from src.services import rate_limiter
+from src.services.rate_limiter import TokenBucketLimiter, single_ingest_limiter
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+def test_burst_then_refill(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=3)
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == pytest.approx(1.0)
+
+    clock.now += 0.5
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.acquire("a") == 0
+
+    # Refill never exceeds the burst
+    clock.now += 3600
+    assert [limiter.acquire("a") for _ in range(4)][-1] == pytest.approx(1.0)
+
+def test_clients_have_separate_buckets(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=1)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0
+
+def test_cost_above_available_tokens(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=120, burst=4)
+    assert limiter.acquire("a", cost=3) == 0
+    assert limiter.acquire("a", cost=3) == pytest.approx(1.0)
+
+def test_least_recently_seen_client_is_evicted(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=1, max_clients=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")  # b is now the least recently seen
+    limiter.acquire("c")
+    assert limiter.stats() == {"tracked_clients": 2}
+    # a kept its empty bucket; b starts over with a full one
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0
+
+def test_zero_rate_never_refills(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=0, burst=2)
+    assert limiter.acquire("a") == limiter.acquire("a") == 0
+    clock.now += 86400
+    assert limiter.acquire("a") == float("inf")
+
+def test_endpoint_answers_429_with_retry_after(client, register, monkeypatch):
+    monkeypatch.setattr(locations, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(single_ingest_limiter, "burst", 2)
+    monkeypatch.setattr(single_ingest_limiter, "rate", 2 / 60)
+    client_id, headers = register()
+
+    statuses = []
+    for second in range(3):
+        response = client.post("/api/locations", json={
+            "latitude": 1.0, "longitude": 2.0, "accuracy": 3.0, "timestamp": f"2024-01-01T00:00:0{second}Z"
+        }, headers=headers)
+        statuses.append(response.status_code)
+    assert statuses == [201, 201, 429]
+    assert response.json()["detail"] == "Rate limit exceeded"
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+
+    # Other clients and read endpoints are not affected
+    _, other_headers = register("other-device")
+    assert client.post("/api/locations", json={
+        "latitude": 1.0, "longitude": 2.0, "accuracy": 3.0, "timestamp": "2024-01-01T00:00:00Z"
+    }, headers=other_headers).status_code == 201
+    assert client.get(f"/api/locations/{client_id}", headers=headers).status_code == 200
+
+def test_endpoint_without_refill_omits_retry_after(client, register, monkeypatch):
+    monkeypatch.setattr(locations, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(single_ingest_limiter, "burst", 1)
+    monkeypatch.setattr(single_ingest_limiter, "rate", 0)
+    _, headers = register()
+
+    responses = [
+        client.post("/api/locations", json={
+            "latitude": 1.0, "longitude": 2.0, "accuracy": 3.0, "timestamp": f"2024-01-01T00:00:0{second}Z"
+        }, headers=headers)
+        for second in range(2)
+    ]
+    assert [response.status_code for response in responses] == [201, 429]
+    assert "Retry-After" not in responses[1].headers
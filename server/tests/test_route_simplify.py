@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from src.services.route_simplify import douglas_peucker, project, simplify_route, visvalingam_whyatt
+
+ALGORITHMS = [douglas_peucker, visvalingam_whyatt]
+
+def noisy_drive(count=5000, noise_m=4.0, seed=7):
+    """Projected points of a winding drive with GPS noise"""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 20, count)
+    points = np.column_stack((t * 500, np.sin(t) * 800 + np.sin(t * 7) * 60))
+    return points + rng.normal(0, noise_m, points.shape)
+
+def segment_distances(points, kept):
+    """Distance of every point to the simplified line between its surrounding kept points"""
+    distances = np.zeros(len(points))
+    for start, end in zip(kept[:-1], kept[1:]):
+        a, b = points[start], points[end]
+        direction = b - a
+        length_squared = direction @ direction
+        between = points[start:end + 1] - a
+        t = np.clip(between @ direction / length_squared, 0, 1) if length_squared else np.zeros(len(between))
+        distances[start:end + 1] = np.hypot(*(between - t[:, None] * direction).T)
+    return distances
+
+def triangle_areas(points):
+    previous, current, following = points[:-2], points[1:-1], points[2:]
+    return 0.5 * np.abs(
+        (current[:, 0] - previous[:, 0]) * (following[:, 1] - previous[:, 1])
+        - (following[:, 0] - previous[:, 0]) * (current[:, 1] - previous[:, 1])
+    )
+
+@pytest.mark.parametrize("tolerance", [1.0, 5.0, 50.0])
+def test_douglas_peucker_stays_within_tolerance(tolerance):
+    points = noisy_drive()
+    kept = douglas_peucker(points, tolerance)
+    assert segment_distances(points, kept).max() <= tolerance + 1e-9
+    assert len(kept) < len(points)
+
+@pytest.mark.parametrize("tolerance", [1.0, 5.0, 50.0])
+def test_visvalingam_whyatt_leaves_no_area_below_tolerance(tolerance):
+    points = noisy_drive()
+    kept = visvalingam_whyatt(points, tolerance)
+    assert triangle_areas(points[kept]).min() >= tolerance * tolerance
+    assert len(kept) < len(points)
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+@pytest.mark.parametrize("max_points", [2, 3, 10, 200, 4999])
+def test_budget_is_respected(algorithm, max_points):
+    points = noisy_drive()
+    kept = algorithm(points, 0.0, max_points)
+    assert 2 <= len(kept) <= max_points
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_endpoints_are_kept_and_indices_sorted(algorithm):
+    points = noisy_drive()
+    for tolerance, max_points in ((5.0, None), (0.0, 50), (1e9, None)):
+        kept = algorithm(points, tolerance, max_points)
+        assert kept[0] == 0 and kept[-1] == len(points) - 1
+        assert np.all(np.diff(kept) > 0)
+
+def test_douglas_peucker_budget_keeps_the_largest_corner():
+    points = np.array([[0, 0], [1, 0.2], [2, 0], [3, 50], [4, 0], [5, -0.1], [6, 0]], dtype=float)
+    assert douglas_peucker(points, 0.0, 3).tolist() == [0, 3, 6]
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+@pytest.mark.parametrize("points", [
+    np.zeros((0, 2)),
+    np.array([[1.0, 2.0]]),
+    np.array([[1.0, 2.0], [3.0, 4.0]]),
+])
+def test_short_input_is_returned_whole(algorithm, points):
+    assert algorithm(points, 5.0).tolist() == list(range(len(points)))
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_degenerate_tracks_reduce_to_endpoints(algorithm):
+    # A device standing still, and a perfectly straight line
+    stationary = np.tile([[10.0, 20.0]], (100, 1))
+    straight = np.column_stack((np.arange(100.0), np.arange(100.0) * 2))
+    for points in (stationary, straight):
+        assert algorithm(points, 1.0).tolist() == [0, 99]
+
+def test_simplify_route_projects_degrees():
+    latitudes = np.linspace(52.0, 52.01, 500)
+    longitudes = np.full(500, 13.0)
+    longitudes[250] += 0.001  # About 68 m east at this latitude
+    assert 250 in simplify_route(latitudes, longitudes, tolerance_m=50).tolist()
+    assert 250 not in simplify_route(latitudes, longitudes, tolerance_m=100).tolist()
+    assert np.ptp(project([0.0, 0.0], [179.9999, -179.9999])[:, 0]) < 30
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import json
+import math
+
+import pytest
+
+from src.routes import routes
+from src.services.route_levels import ROUTE_LEVEL_TOLERANCES_M, RouteLevelBuilder
+
+START = datetime(2024, 5, 1, 22, 0, 0)
+
+def post_track(client, headers, count, start=START):
+    """Upload a zigzag track spanning two UTC days, so no point is redundant"""
+    locations = [
+        {
+            "latitude": 52.0 + index * 0.001,
+            "longitude": 13.0 + (0.002 if index % 2 else 0.0) + 0.0001 * math.sin(index),
+            "accuracy": 5.0,
+            "timestamp": (start + timedelta(minutes=index * 5)).isoformat() + "Z"
+        }
+        for index in range(count)
+    ]
+    response = client.post("/api/locations/batch", json={"locations": locations}, headers=headers)
+    assert response.status_code == 201, response.text
+
+def rebuild_levels(client):
+    builder = RouteLevelBuilder()
+    while client.portal.call(builder.flush):
+        pass
+
+def route(client, client_id, headers, **params):
+    response = client.get(f"/api/routes/{client_id}", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_streamed_route_matches_buffered_route(client, register):
+    client_id, headers = register()
+    post_track(client, headers, 40)
+
+    buffered = route(client, client_id, headers, simplify="false")
+    response = client.get(f"/api/routes/{client_id}", params={"stream": "true"}, headers=headers)
+    assert response.status_code == 200
+    assert json.loads(response.content) == buffered
+    assert buffered["features"][0]["properties"]["level_tolerance_m"] is None
+
+def test_max_points_covering_the_range_reads_raw_points(client, register):
+    client_id, headers = register()
+    post_track(client, headers, 40)
+    rebuild_levels(client)
+
+    raw = route(client, client_id, headers, simplify="false")["features"][0]
+    for max_points in (40, 1000):
+        feature = route(client, client_id, headers, max_points=max_points)["features"][0]
+        assert feature["properties"]["level_tolerance_m"] is None
+        assert feature["geometry"]["coordinates"] == raw["geometry"]["coordinates"]
+
+def test_max_points_below_the_range_reads_a_level(client, register):
+    client_id, headers = register()
+    post_track(client, headers, 40)
+    rebuild_levels(client)
+
+    for max_points in (10, 39):
+        properties = route(client, client_id, headers, max_points=max_points)["features"][0]["properties"]
+        assert properties["level_tolerance_m"] in ROUTE_LEVEL_TOLERANCES_M
+        assert 2 <= properties["point_count"] <= max_points
+        assert properties["original_point_count"] == 40
+
+def test_levels_include_locations_not_rebuilt_yet(client, register):
+    client_id, headers = register()
+    post_track(client, headers, 40)
+    rebuild_levels(client)
+    post_track(client, headers, 20, start=START + timedelta(days=1))
+
+    properties = route(client, client_id, headers, zoom=3)["features"][0]["properties"]
+    assert properties["level_tolerance_m"] in ROUTE_LEVEL_TOLERANCES_M
+    assert properties["original_point_count"] == 60
+    assert properties["end_time"] == (START + timedelta(days=1, minutes=19 * 5)).isoformat()
+
+def test_default_request_is_bounded(client, register, monkeypatch):
+    monkeypatch.setattr(routes, "ROUTE_SIMPLIFY_MAX_POINTS", 15)
+    client_id, headers = register()
+    post_track(client, headers, 60)
+
+    properties = route(client, client_id, headers)["features"][0]["properties"]
+    assert properties["point_count"] == 15
+    assert properties["original_point_count"] == 60
+    # An explicit tolerance is not capped
+    assert route(client, client_id, headers, tolerance_m=1)["features"][0]["properties"]["point_count"] > 15
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+import gzip
+import json
+import zlib
+
+import pytest
+from sqlalchemy import func, select
+
+from src.database import AsyncSessionLocal
+from src.models.models import Location
+from src.services import ingest_service
+from src.services.ingest_service import LineTooLongError, iter_ndjson_lines, stream_insert_locations
+
+START = datetime(2024, 3, 1, 6, 0, 0)
+
+def ndjson(count, start=START):
+    return b"".join(
+        json.dumps({
+            "latitude": 40.0 + index * 1e-4,
+            "longitude": -3.0,
+            "accuracy": 6.0,
+            "timestamp": (start + timedelta(seconds=index)).isoformat() + "Z"
+        }).encode() + b"\n"
+        for index in range(count)
+    )
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+async def collect(lines):
+    return [line async for line in lines]
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size", [1, 7, 4096])
+async def test_lines_are_split_across_chunks(size):
+    body = b'{"a": 1}\n\n  \n{"b": 2}\r\n{"c": 3}'
+    assert await collect(iter_ndjson_lines(chunked(body, size))) == [b'{"a": 1}', b'{"b": 2}\r', b'{"c": 3}']
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size", [5, 64, 100000])
+async def test_gzip_body_matches_plain_body(size):
+    body = ndjson(500)
+    plain = await collect(iter_ndjson_lines(chunked(body, 4096)))
+    assert await collect(iter_ndjson_lines(chunked(gzip.compress(body), size), gzip=True)) == plain
+    assert len(plain) == 500
+
+@pytest.mark.anyio
+async def test_long_line_is_rejected():
+    with pytest.raises(LineTooLongError):
+        await collect(iter_ndjson_lines(chunked(b"x" * 50 + b"\n", 8), max_line_bytes=40))
+    # Also without ever seeing a newline
+    with pytest.raises(LineTooLongError):
+        await collect(iter_ndjson_lines(chunked(b"x" * 50, 8), max_line_bytes=40))
+
+@pytest.mark.anyio
+async def test_truncated_gzip_is_rejected():
+    with pytest.raises(zlib.error):
+        await collect(iter_ndjson_lines(chunked(gzip.compress(ndjson(50))[:-20], 64), gzip=True))
+
+@pytest.mark.anyio
+async def test_chunks_are_committed_separately(client_id, monkeypatch):
+    batches = []
+    insert = ingest_service.insert_locations_ignore_duplicates
+
+    async def recording_insert(db, rows):
+        # Every earlier chunk is already committed
+        async with AsyncSessionLocal() as other:
+            batches.append((len(rows), await other.scalar(
+                select(func.count()).select_from(Location).where(Location.client_id == client_id)
+            )))
+        return await insert(db, rows)
+
+    monkeypatch.setattr(ingest_service, "insert_locations_ignore_duplicates", recording_insert)
+    async with AsyncSessionLocal() as db:
+        result = await stream_insert_locations(db, client_id, iter_ndjson_lines(chunked(ndjson(10), 100)), chunk_size=3)
+
+    assert batches == [(3, 0), (3, 3), (3, 6), (1, 9)]
+    assert (result["accepted_count"], result["new_count"], result["rejected_count"]) == (10, 10, 0)
+
+def test_invalid_lines_are_reported_by_number(client, register):
+    _, headers = register()
+    lines = ndjson(4).splitlines()
+    lines.insert(1, b'{"latitude": 95, "longitude": 0, "accuracy": 1, "timestamp": "2024-03-01T00:00:00Z"}')
+    lines.insert(3, b"not json")
+    lines.append(lines[0])
+    response = client.post("/api/locations/stream", content=b"\n".join(lines), headers=headers)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert (body["accepted_count"], body["new_count"], body["duplicate_count"], body["rejected_count"]) == (5, 4, 1, 2)
+    assert [error["line"] for error in body["errors"]] == [2, 4]
+    assert body["errors"][0]["error"].startswith("latitude:")
+
+def test_gzip_upload(client, register):
+    client_id, headers = register()
+    response = client.post(
+        "/api/locations/stream", content=gzip.compress(ndjson(300)), headers={**headers, "Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 201
+    assert response.json()["new_count"] == 300
+    assert client.get(f"/api/locations/{client_id}", headers=headers).json()["total_count"] == 300
+
+def test_broken_bodies_return_400(client, register):
+    _, headers = register()
+    truncated = client.post(
+        "/api/locations/stream", content=gzip.compress(ndjson(300))[:-40], headers={**headers, "Content-Encoding": "gzip"}
+    )
+    assert truncated.status_code == 400
+    assert "Truncated gzip stream" in truncated.json()["detail"]["message"]
+
+    limit = ingest_service.STREAM_MAX_LINE_BYTES
+    too_long = client.post(
+        "/api/locations/stream", content=ndjson(2) + b"x" * (limit + 1) + b"\n", headers=headers
+    )
+    assert too_long.status_code == 400
+    assert too_long.json()["detail"]["message"].startswith("Line 3:")
+    assert too_long.json()["detail"]["accepted_count"] == 2
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.models.models import UTCDateTime
+
+NAIVE = datetime(2024, 3, 1, 12, 0)
+EASTERN = timezone(timedelta(hours=-5))
+
+def test_postgresql_binds_aware_utc():
+    # asyncpg would read a naive value in the host's local time zone
+    bound = UTCDateTime().process_bind_param(NAIVE, postgresql.dialect())
+    assert bound == NAIVE.replace(tzinfo=timezone.utc)
+    assert bound.tzinfo is timezone.utc
+
+def test_aware_values_are_converted_to_utc():
+    value = datetime(2024, 3, 1, 7, 0, tzinfo=EASTERN)
+    assert UTCDateTime().process_bind_param(value, postgresql.dialect()) == NAIVE.replace(tzinfo=timezone.utc)
+    assert UTCDateTime().process_bind_param(value, sqlite.dialect()) == NAIVE
+
+def test_sqlite_binds_naive():
+    assert UTCDateTime().process_bind_param(NAIVE, sqlite.dialect()) == NAIVE
+
+def test_results_are_naive_utc():
+    value = datetime(2024, 3, 1, 7, 0, tzinfo=EASTERN)
+    assert UTCDateTime().process_result_value(value, postgresql.dialect()) == NAIVE
+    assert UTCDateTime().process_result_value(NAIVE, sqlite.dialect()) == NAIVE
+    assert UTCDateTime().process_bind_param(None, postgresql.dialect()) is None